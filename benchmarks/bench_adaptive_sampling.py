@@ -0,0 +1,96 @@
+"""
+Messages and bytes per vehicle-hour sent by lab1's agent at a fixed rate
+compared with AdaptiveSampler, for lab1's CSV recording (looped) and for a
+synthetic smooth road with rare bumps. Also checks that every anomaly (a reading
+off its window mean by more than the anomaly threshold) is sent as a raw reading.
+
+    python -m benchmarks.bench_adaptive_sampling --rate 10
+"""
+import argparse
+import os
+from datetime import datetime, timedelta
+from time import perf_counter
+
+import numpy as np
+
+from benchmarks.harness import ROOT
+from lab1.src.adaptive_sampler import AdaptiveSampler
+from lab1.src.domain.accelerometer import Accelerometer
+from lab1.src.domain.aggregated_data import AggregatedData
+from lab1.src.domain.aggregated_window import AggregatedWindow
+from lab1.src.domain.gps import Gps
+from lab1.src.shema.fast_serializer import dumps_aggregated_data, dumps_window
+
+
+def csv_profile(count: int) -> np.ndarray:
+    rows = np.loadtxt(os.path.join(ROOT, "lab1", "accelerometer.csv"), delimiter=",", skiprows=1)
+    return np.resize(rows, (count, 3))
+
+
+def smooth_profile(count: int) -> np.ndarray:
+    rng = np.random.default_rng(42)
+    rows = rng.normal((0.0, 0.0, 16384.0), 300.0, (count, 3))
+    # A bump or pothole about once a minute at 10 Hz
+    for start in rng.choice(count - 10, count // 600, replace=False):
+        rows[start:start + 5, 2] += rng.normal(0, 8000, 5)
+    return rows
+
+
+def readings(rows: np.ndarray, rate: float):
+    start = datetime(2024, 1, 1)
+    gps = Gps(longitude=30.52, latitude=50.45)
+    return [
+        AggregatedData(Accelerometer(x, y, z), gps, start + timedelta(seconds=i / rate))
+        for i, (x, y, z) in enumerate(rows.tolist())
+    ]
+
+
+def anomalies(rows: np.ndarray, window_size: int, threshold: float) -> set:
+    found = set()
+    for start in range(0, len(rows), window_size):
+        window = rows[start:start + window_size]
+        deviation = np.abs(window - window.mean(axis=0)).max(axis=1)
+        found.update((start + np.flatnonzero(deviation > threshold)).tolist())
+    return found
+
+
+def run(name: str, rows: np.ndarray, rate: float, sampler: AdaptiveSampler):
+    data = readings(rows, rate)
+    fixed_bytes = sum(len(dumps_aggregated_data(item, 1)) for item in data)
+    start = perf_counter()
+    messages = []
+    for item in data:
+        messages.extend(sampler.add(item))
+    messages.extend(sampler.flush())
+    elapsed = perf_counter() - start
+
+    raw = [message for message in messages if isinstance(message, AggregatedData)]
+    summaries = [message for message in messages if isinstance(message, AggregatedWindow)]
+    adaptive_bytes = sum(len(dumps_aggregated_data(message, 1)) for message in raw)
+    adaptive_bytes += sum(len(dumps_window(message, 1)) for message in summaries)
+    index = {id(item): i for i, item in enumerate(data)}
+    sent = {index[id(message)] for message in raw}
+    expected = anomalies(rows, sampler.window_size, sampler.anomaly_threshold)
+
+    print(f"{name:<10}{len(data):>10}{len(messages):>10}{len(raw):>8}{len(summaries):>8}"
+          f"{len(data) / max(len(messages), 1):>8.1f}x{fixed_bytes / max(adaptive_bytes, 1):>8.1f}x"
+          f"{len(expected & sent):>7}/{len(expected):<6}{len(data) / elapsed:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=10.0, help="readings per second (lab1 DELAY 0.1)")
+    parser.add_argument("--window-size", type=int, default=20)
+    parser.add_argument("--hold-windows", type=int, default=2)
+    args = parser.parse_args()
+
+    count = int(args.rate * 3600)
+    print(f"{'profile':<10}{'readings':>10}{'messages':>10}{'raw':>8}{'windows':>8}"
+          f"{'msgs':>9}{'bytes':>9}{'anomalies':>14}{'readings/s':>12}")
+    for name, rows in (("csv", csv_profile(count)), ("smooth", smooth_profile(count))):
+        sampler = AdaptiveSampler(window_size=args.window_size, hold_windows=args.hold_windows)
+        run(name, rows, args.rate, sampler)
+
+
+if __name__ == "__main__":
+    main()
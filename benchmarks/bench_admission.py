@@ -0,0 +1,197 @@
+"""
+Admission control of the hub (lab3) under a flood: one vehicle publishing far
+above its limit next to well-behaved ones, replayed in virtual time through the
+hub's on_message (fakeredis; delivery to the store is switched off, so the
+buffer only grows, as it does while the store is down).
+
+For each configuration: readings of the well-behaved and the flooding vehicles
+that were buffered, shed counts per reason (hub_shed_total), sampled readings,
+the buffer length at the end and the cost of on_message per reading.
+
+RedisTokenBucket refills with the server's clock, so it is checked apart, in
+real time: readings offered to it at --bucket-offered per second for
+--bucket-seconds against the Redis at --redis-url (fakeredis running the Lua
+script if not given). Expected admitted: burst + rate * seconds. A refund must
+give back exactly one token.
+
+    python -m benchmarks.bench_admission --seconds 10 --flood-rate 2000 --vehicles 10 --vehicle-rate 10
+    python -m benchmarks.bench_admission --redis-url redis://localhost:6379/15
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta
+from time import perf_counter
+from types import SimpleNamespace
+from unittest import mock
+
+import fakeredis
+import redis.asyncio
+
+from benchmarks.harness import lab_modules
+from common.entities import ProcessedAgentData
+from common.metrics import REGISTRY
+
+
+def messages(args):
+    """(virtual time, user_id, payload) of every reading, in time order"""
+    rates = {user_id: args.vehicle_rate for user_id in range(1, args.vehicles + 1)}
+    flooder = args.vehicles + 1
+    rates[flooder] = args.flood_rate
+    start = datetime(2024, 1, 1)
+    events = []
+    for user_id, rate in rates.items():
+        for i in range(int(args.seconds * rate)):
+            at = i / rate
+            payload = ProcessedAgentData.model_validate({
+                "road_state": "normal",
+                "agent_data": {
+                    "user_id": user_id, "accelerometer": {"x": 0.0, "y": 0.0, "z": 1.0},
+                    "gps": {"latitude": 50.45, "longitude": 30.52},
+                    "timestamp": start + timedelta(seconds=at), "sequence": 0,
+                },
+            }).model_dump_json().encode()
+            events.append((at, user_id, payload))
+    events.sort(key=lambda event: event[0])
+    return events, flooder
+
+
+def shed_counts() -> Counter:
+    return Counter({
+        reason: REGISTRY.counter("hub_shed_total", "", labels={"reason": reason}).value
+        for reason in ("vehicle_rate", "global_rate", "buffer_full")
+    })
+
+
+def run(label: str, environ: dict, events, flooder: int, workdir: str):
+    environ = dict(environ, LOG_FILE=os.path.join(workdir, "hub.log"), LOG_LEVEL="ERROR", DEDUP_TTL=0)
+    with lab_modules("lab3", **environ), \
+            mock.patch.object(redis.asyncio, "Redis", fakeredis.FakeAsyncRedis), \
+            mock.patch.object(redis.asyncio, "BlockingConnectionPool", lambda **kwargs: None):
+        hub = importlib.import_module("main")
+        hub.startup()
+    # Store down: nothing leaves the buffer
+    hub.schedule_flush = lambda: None
+    now = [0.0]
+    for limiter in (hub.vehicle_limiter, hub.global_limiter):
+        if limiter is not None:
+            limiter.clock = lambda: now[0]
+    shed_before = shed_counts()
+    sampled_before = REGISTRY.counter("hub_sampled_total", "").value
+
+    async def replay():
+        start = perf_counter()
+        for at, _, payload in events:
+            now[0] = at
+            await hub.on_message(SimpleNamespace(payload=payload))
+        elapsed = perf_counter() - start
+        length = await hub.buffer.length()
+        items = await hub.buffer.read_batch(length) if length else []
+        return elapsed, items
+
+    elapsed, items = asyncio.run(replay())
+    buffered = Counter("flood" if item.agent_data.user_id == flooder else "others" for _, item in items)
+    sent = Counter("flood" if user_id == flooder else "others" for _, user_id, _ in events)
+    shed = shed_counts() - shed_before
+    return {
+        "label": label,
+        "others": f"{buffered['others']}/{sent['others']}",
+        "flood": f"{buffered['flood']}/{sent['flood']}",
+        "shed": ", ".join(f"{reason} {count:.0f}" for reason, count in shed.items() if count) or "-",
+        "sampled": REGISTRY.counter("hub_sampled_total", "").value - sampled_before,
+        "buffer": len(items),
+        "us": elapsed / len(events) * 1e6,
+    }
+
+
+def redis_bucket(args):
+    """Admitted readings, the expected number, the refund check and the cost of acquire of RedisTokenBucket"""
+    with lab_modules("lab3"):
+        from app.adapters.redis_token_bucket import RedisTokenBucket
+    client = redis.asyncio.Redis.from_url(args.redis_url) if args.redis_url else fakeredis.FakeAsyncRedis()
+    rate, burst = args.limit, 2 * args.limit
+
+    async def check():
+        try:
+            return await measure()
+        finally:
+            await client.aclose()
+
+    async def measure():
+        prefix = f"bench:rate:{os.getpid()}"
+        bucket = RedisTokenBucket(client, rate, burst, prefix=prefix)
+        admitted = 0
+        offered = int(args.bucket_seconds * args.bucket_offered)
+        spent = 0.0
+        start = perf_counter()
+        for i in range(offered):
+            # Paced in real time: the script refills with the server's clock
+            delay = start + i / args.bucket_offered - perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            before = perf_counter()
+            admitted += await bucket.acquire("flood")
+            spent += perf_counter() - before
+        elapsed = perf_counter() - start
+        # Empty bucket: one refund admits exactly one more reading
+        refund = RedisTokenBucket(client, 0.001, 3, prefix=prefix)
+        drained = [await refund.acquire("refund") for _ in range(4)]
+        await refund.refund("refund")
+        refunded = [await refund.acquire("refund") for _ in range(2)]
+        await client.delete(*await client.keys(f"{prefix}:*"))
+        return {
+            "backend": args.redis_url or "fakeredis",
+            "offered": offered, "admitted": admitted, "expected": burst + rate * elapsed,
+            "refund ok": drained == [True, True, True, False] and refunded == [True, False],
+            "us": spent / offered * 1e6,
+        }
+
+    return asyncio.run(check())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--vehicles", type=int, default=10, help="well-behaved vehicles")
+    parser.add_argument("--vehicle-rate", type=float, default=10, help="readings per second of each")
+    parser.add_argument("--flood-rate", type=float, default=2000, help="readings per second of the flooding vehicle")
+    parser.add_argument("--limit", type=float, default=50, help="RATE_LIMIT_PER_VEHICLE")
+    parser.add_argument("--global-limit", type=float, default=300, help="RATE_LIMIT_GLOBAL")
+    parser.add_argument("--max-length", type=int, default=2000, help="BUFFER_MAX_LENGTH")
+    parser.add_argument("--redis-url", default="", help="Redis for the RedisTokenBucket check; fakeredis if empty")
+    parser.add_argument("--bucket-seconds", type=float, default=3)
+    parser.add_argument("--bucket-offered", type=float, default=500, help="readings per second")
+    args = parser.parse_args()
+
+    events, flooder = messages(args)
+    limits = dict(RATE_LIMIT_PER_VEHICLE=args.limit, RATE_LIMIT_GLOBAL=args.global_limit)
+    configurations = [
+        ("no admission control", dict(BUFFER_MAX_LENGTH=0)),
+        ("buffer bound only", dict(BUFFER_MAX_LENGTH=args.max_length)),
+        ("rate limits, shed", dict(limits, BUFFER_MAX_LENGTH=args.max_length)),
+        ("rate limits, sample 1/10", dict(limits, BUFFER_MAX_LENGTH=args.max_length,
+                                         RATE_LIMIT_POLICY="sample", RATE_LIMIT_SAMPLE_EVERY=10)),
+    ]
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run(label, environ, events, flooder, workdir) for label, environ in configurations]
+
+    print(f"{args.seconds:.0f} s: {args.vehicles} vehicles at {args.vehicle_rate:.0f}/s, one at {args.flood_rate:.0f}/s; "
+          f"limits {args.limit:.0f}/s per vehicle, {args.global_limit:.0f}/s global, buffer {args.max_length}")
+    print(f"{'configuration':<26}{'others buffered':>17}{'flood buffered':>16}{'sampled':>9}{'buffer':>8}"
+          f"{'us/msg':>8}   shed")
+    for result in results:
+        print(f"{result['label']:<26}{result['others']:>17}{result['flood']:>16}{result['sampled']:>9.0f}"
+              f"{result['buffer']:>8}{result['us']:>8.1f}   {result['shed']}")
+
+    bucket = redis_bucket(args)
+    print(f"\nRedisTokenBucket on {bucket['backend']}: {args.limit:.0f}/s, burst {2 * args.limit:.0f}, "
+          f"offered {bucket['offered']} in {args.bucket_seconds:.0f} s: admitted {bucket['admitted']}, "
+          f"expected {bucket['expected']:.0f}; refund {'ok' if bucket['refund ok'] else 'WRONG'}; "
+          f"{bucket['us']:.0f} us/acquire")
+
+
+if __name__ == "__main__":
+    main()
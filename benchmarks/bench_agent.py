@@ -0,0 +1,104 @@
+"""
+Agent (lab1) cost per message: reading + serialization, without MQTT.
+
+    model           - FileDatasource.read + common.entities.AgentData + model_dump_json
+    fast            - FileDatasource.read + dumps_aggregated_data (the same JSON without a model)
+    batch           - FileDatasource.read_batch + dumps_batch
+
+Memory is the tracemalloc size of N readings kept as records vs one batch.
+
+    python -m benchmarks.bench_agent --messages 50000
+"""
+import argparse
+import os
+import tracemalloc
+from time import perf_counter
+
+from benchmarks.harness import ROOT
+from common.entities import AccelerometerData, AgentData, GpsData
+from lab1.src.file_datasource import FileDatasource
+from lab1.src.shema.fast_serializer import dumps_aggregated_data, dumps_batch
+
+BATCH_SIZE = 500
+USER_ID = 1
+
+
+def datasource() -> FileDatasource:
+    source = FileDatasource(
+        os.path.join(ROOT, "lab1", "accelerometer.csv"),
+        os.path.join(ROOT, "lab1", "gps.csv"),
+    )
+    source.startReading()
+    return source
+
+
+def run_model(messages: int):
+    source = datasource()
+    for _ in range(messages):
+        data = source.read()
+        AgentData(
+            user_id=USER_ID,
+            accelerometer=AccelerometerData(x=data.accelerometer.x, y=data.accelerometer.y, z=data.accelerometer.z),
+            gps=GpsData(latitude=data.gps.latitude, longitude=data.gps.longitude),
+            timestamp=data.time,
+        ).model_dump_json()
+    source.stopReading()
+
+
+def run_fast(messages: int):
+    source = datasource()
+    for _ in range(messages):
+        dumps_aggregated_data(source.read(), USER_ID)
+    source.stopReading()
+
+
+def run_batch(messages: int):
+    source = datasource()
+    for _ in range(messages // BATCH_SIZE):
+        dumps_batch(source.read_batch(BATCH_SIZE), USER_ID)
+    source.stopReading()
+
+
+def retained_bytes(factory, messages: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = factory(messages)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return size / messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50000)
+    args = parser.parse_args()
+
+    rates = {}
+    for name, function in (("model", run_model), ("fast", run_fast), ("batch", run_batch)):
+        start = perf_counter()
+        function(args.messages)
+        rates[name] = args.messages / (perf_counter() - start)
+
+    def records(count):
+        source = datasource()
+        kept = [source.read() for _ in range(count)]
+        source.stopReading()
+        return kept
+
+    def batch(count):
+        source = datasource()
+        kept = source.read_batch(count)
+        source.stopReading()
+        return kept
+
+    memory = {"records": retained_bytes(records, 10000), "batch": retained_bytes(batch, 10000)}
+
+    print(f"{'path':<14}{'msgs/s':>12}{'vs model':>12}")
+    for name, rate in rates.items():
+        print(f"{name:<14}{rate:>12.0f}{rate / rates['model']:>11.2f}x")
+    print(f"memory per reading: records {memory['records']:.0f} B, batch {memory['batch']:.0f} B")
+
+
+if __name__ == "__main__":
+    main()
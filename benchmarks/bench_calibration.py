@@ -0,0 +1,93 @@
+"""
+Throughput of lab4's calibration stage (scale/offset, gravity low-pass, levelling,
+gravity removal) on lab1's raw accelerometer counts:
+
+    scalar          - the same math per reading in plain Python
+    arrays/N        - Calibrator.calibrate on NumPy micro-batches of N readings
+    agent_data/N    - Calibrator.calibrate_batch on AgentData micro-batches of N (the edge path)
+
+    python -m benchmarks.bench_calibration --readings 200000
+"""
+import argparse
+import math
+import os
+from datetime import datetime
+from time import perf_counter
+
+import numpy as np
+
+from benchmarks.harness import ROOT, lab_modules
+
+with lab_modules("lab4"):
+    from app.entities.agent_data import AgentData
+    from app.usecases.calibration import COUNTS_PER_G, GRAVITY_ALPHA, Calibrator
+
+BATCH_SIZES = (1, 10, 100, 1000)
+
+
+def calibrate_scalar(rows):
+    scale, beta = 1.0 / COUNTS_PER_G, 1.0 - GRAVITY_ALPHA
+    gravity = None
+    result = []
+    for raw_x, raw_y, raw_z in rows:
+        x, y, z = raw_x * scale, raw_y * scale, raw_z * scale
+        if gravity is None:
+            gravity = (x, y, z)
+        gravity = tuple(beta * g + GRAVITY_ALPHA * a for g, a in zip(gravity, (x, y, z)))
+        norm = math.sqrt(sum(g * g for g in gravity))
+        ux, uy, uz = (g / norm for g in gravity)
+        vx, vy = uy, -ux
+        # v x a, then v x (v x a)
+        cx, cy, cz = vy * z, -vx * z, vx * y - vy * x
+        dx, dy, dz = vy * cz, -vx * cz, vx * cy - vy * cx
+        result.append((x + cx + dx / (1 + uz), y + cy + dy / (1 + uz), z + cz + dz / (1 + uz) - norm))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readings", type=int, default=200_000)
+    args = parser.parse_args()
+
+    source = np.loadtxt(os.path.join(ROOT, "lab1", "accelerometer.csv"), delimiter=",", skiprows=1)
+    rows = np.resize(source, (args.readings, 3))
+    user_ids = np.ones(args.readings, dtype=np.int64)
+    now = datetime.now()
+    agent_data = [
+        AgentData.model_validate({
+            "user_id": 1,
+            "accelerometer": {"x": x, "y": y, "z": z},
+            "gps": {"latitude": 50.45, "longitude": 30.52},
+            "timestamp": now,
+        })
+        for x, y, z in rows.tolist()
+    ]
+
+    rates = {}
+    start = perf_counter()
+    scalar = calibrate_scalar(rows.tolist())
+    rates["scalar"] = args.readings / (perf_counter() - start)
+
+    for size in BATCH_SIZES:
+        calibrator = Calibrator()
+        start = perf_counter()
+        vectorized = np.vstack([
+            calibrator.calibrate(user_ids[i:i + size], rows[i:i + size]) for i in range(0, args.readings, size)
+        ])
+        rates[f"arrays/{size}"] = args.readings / (perf_counter() - start)
+        assert np.allclose(vectorized, scalar), "vectorized and scalar calibration differ"
+
+    for size in BATCH_SIZES:
+        calibrator = Calibrator()
+        start = perf_counter()
+        for i in range(0, args.readings, size):
+            calibrator.calibrate_batch(agent_data[i:i + size])
+        rates[f"agent_data/{size}"] = args.readings / (perf_counter() - start)
+
+    print(f"{'path':<18}{'readings/s':>14}{'vs scalar':>12}")
+    for name, rate in rates.items():
+        print(f"{name:<18}{rate:>14.0f}{rate / rates['scalar']:>11.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Consumers of lab2 that want new rows: polling GET /processed_agent_data/ (the
+whole table every time) compared with the change feed (GET /changes/?since=),
+which returns only the events after the consumer's last sequence number.
+Also reports how soon a long-polling consumer (timeout=) sees a new reading,
+and what recording the events costs the writes.
+
+    python -m benchmarks.bench_change_feed --rows 50000 --delta 100 --polls 5
+"""
+import argparse
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from time import perf_counter
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from benchmarks.harness import percentile
+
+
+def rows(start: int, count: int):
+    base = datetime.now() - timedelta(days=1)
+    return [
+        {
+            "road_state": "normal", "x": 0.0, "y": 0.0, "z": float(i % 100) / 10,
+            "latitude": 50.45, "longitude": 30.52, "timestamp": base + timedelta(milliseconds=i),
+            "user_id": 1, "reading_key": f"bench-{i}",
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def reading(i: int) -> dict:
+    return {
+        "road_state": "normal",
+        "agent_data": {
+            "user_id": 1, "accelerometer": {"x": 0.0, "y": 0.0, "z": 1.0},
+            "gps": {"latitude": 50.45, "longitude": 30.52},
+            "timestamp": datetime.now().isoformat(), "sequence": i,
+        },
+        "reading_key": f"live-{i}",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000, help="rows in the table")
+    parser.add_argument("--delta", type=int, default=100, help="new rows between two polls")
+    parser.add_argument("--polls", type=int, default=5)
+    parser.add_argument("--deliveries", type=int, default=20, help="long-poll deliveries timed")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        environ = {
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'store.db')}",
+            "HOT_STORE_ENABLED": "false",
+            "ARCHIVE_ENABLED": "false",
+        }
+        with mock.patch.dict(os.environ, environ):
+            from lab2.src import main as store_app
+        store_app.init_db()
+        feed = store_app.change_feed
+
+        # Write cost: batches with and without the change log, alternated
+        write_times = {"with change log": 0.0, "without": 0.0}
+        write_rows = {label: 0 for label in write_times}
+        written = 0
+        while written < args.rows:
+            for label in write_times:
+                count = min(args.batch_size, args.rows - written)
+                if count <= 0:
+                    break
+                store_app.change_feed = feed if label == "with change log" else None
+                db = store_app.SessionLocal()
+                try:
+                    start = perf_counter()
+                    store_app.insert_readings(db, rows(written, count))
+                    write_times[label] += perf_counter() - start
+                finally:
+                    db.close()
+                write_rows[label] += count
+                written += count
+        store_app.change_feed = feed
+
+        results = []
+        with TestClient(store_app.app) as client:
+            cursor = feed.last_seq
+            full, delta = [], []
+            for poll in range(args.polls):
+                db = store_app.SessionLocal()
+                try:
+                    store_app.insert_readings(db, rows(args.rows + poll * args.delta, args.delta))
+                finally:
+                    db.close()
+                start = perf_counter()
+                response = client.get("/processed_agent_data/")
+                full.append((perf_counter() - start, len(response.content)))
+                start = perf_counter()
+                response = client.get("/changes/", params={"since": cursor, "limit": 10000})
+                delta.append((perf_counter() - start, len(response.content)))
+                body = response.json()
+                assert len(body["changes"]) == args.delta, len(body["changes"])
+                cursor = body["last_seq"]
+            results.append(("GET /processed_agent_data/ (whole table)", full))
+            results.append((f"GET /changes/?since= ({args.delta} new rows)", delta))
+
+            # Long poll: time from the POST until the waiting consumer has the event
+            latencies = []
+            for i in range(args.deliveries):
+                received = {}
+
+                def consume(since=cursor):
+                    response = client.get("/changes/", params={"since": since, "timeout": 10})
+                    received["at"] = perf_counter()
+                    received["body"] = response.json()
+
+                consumer = threading.Thread(target=consume)
+                consumer.start()
+                # Give the consumer time to start waiting
+                consumer.join(0.05)
+                posted_at = perf_counter()
+                client.post("/processed_agent_data/", json=reading(i))
+                consumer.join()
+                latencies.append(received["at"] - posted_at)
+                cursor = received["body"]["last_seq"]
+
+    total_rows = args.rows + args.polls * args.delta
+    print(f"{total_rows} rows (SQLite), {args.delta} new rows per poll, {args.polls} polls")
+    print(f"{'poll':<48}{'bytes':>12}{'p50 ms':>10}{'max ms':>10}")
+    for label, samples in results:
+        durations = [duration for duration, _ in samples]
+        size = samples[-1][1]
+        print(f"{label:<48}{size:>12}{percentile(durations, 50) * 1000:>10.2f}{max(durations) * 1000:>10.2f}")
+    print(f"long poll delivery (POST -> consumer), {args.deliveries} readings: "
+          f"p50 {percentile(latencies, 50) * 1000:.2f} ms, p99 {percentile(latencies, 99) * 1000:.2f} ms")
+    print(f"insert_readings, batches of {args.batch_size}: " + ", ".join(
+        f"{label} {write_rows[label] / seconds:.0f} rows/s" for label, seconds in write_times.items()
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Road classification cost per message in lab4 (model_validate_json excluded):
+
+    inline          - the previous process_agent_data with thresholds in the function body,
+                      plus the reading key that every path now computes
+    registry        - process_agent_data with a ClassifierRegistry of --vehicles entries
+    reloading       - the same through ReloadingClassifierRegistry (mtime check every 5 s)
+    batch           - process_agent_data_batch over --batch-size readings
+    decision_tree   - process_agent_data with the window-feature tree from classifiers.json
+
+    python -m benchmarks.bench_classifier --messages 200000 --vehicles 1000
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import tempfile
+from datetime import datetime
+from time import perf_counter
+
+from benchmarks.harness import ROOT, lab_modules
+from common.reading_key import reading_key
+
+with lab_modules("lab4"):
+    from app.entities.agent_data import AgentData
+    from app.entities.processed_agent_data import ProcessedAgentData
+    from app.usecases.data_processing import process_agent_data, process_agent_data_batch
+    from app.usecases.road_classifiers import ClassifierRegistry, ReloadingClassifierRegistry
+
+
+def process_inline(agent_data: AgentData) -> ProcessedAgentData:
+    POTHOLE_THRESHOLD = 1.8
+    BUMP_THRESHOLD = 1.5
+    road_state = "normal"
+    if abs(agent_data.accelerometer.y) > POTHOLE_THRESHOLD:
+        road_state = "pothole"
+    elif abs(agent_data.accelerometer.z) > BUMP_THRESHOLD:
+        road_state = "bump"
+    return ProcessedAgentData(
+        road_state=road_state,
+        agent_data=agent_data,
+        reading_key=reading_key(agent_data.user_id, agent_data.timestamp, agent_data.sequence),
+    )
+
+
+def readings(count: int, vehicles: int):
+    rng = random.Random(42)
+    now = datetime.now()
+    return [
+        AgentData.model_validate({
+            "user_id": rng.randrange(vehicles),
+            "accelerometer": {"x": rng.gauss(0, 0.5), "y": rng.gauss(0, 0.8), "z": rng.gauss(1, 0.5)},
+            "gps": {"latitude": 50.45, "longitude": 30.52},
+            "timestamp": now,
+        })
+        for _ in range(count)
+    ]
+
+
+def registry_config(vehicles: int, model: str = "stiff-suspension"):
+    with open(os.path.join(ROOT, "lab4", "classifiers.json")) as config_file:
+        config = json.load(config_file)
+    config["vehicles"] = {str(user_id): model for user_id in range(0, vehicles, 2)}
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--vehicles", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    data = readings(args.messages, args.vehicles)
+    registry = ClassifierRegistry.from_config(registry_config(args.vehicles))
+    tree_registry = ClassifierRegistry.from_config(registry_config(args.vehicles, "window-tree"))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "classifiers.json")
+        with open(path, "w") as config_file:
+            json.dump(registry_config(args.vehicles), config_file)
+        reloading = ReloadingClassifierRegistry(path, reload_interval=5.0)
+
+        def run_batch():
+            processed = []
+            for i in range(0, len(data), args.batch_size):
+                processed.extend(process_agent_data_batch(data[i:i + args.batch_size], registry))
+            return processed
+
+        paths = {
+            "inline": lambda: [process_inline(item) for item in data],
+            "registry": lambda: [process_agent_data(item, registry) for item in data],
+            "reloading": lambda: [process_agent_data(item, reloading) for item in data],
+            "batch": run_batch,
+            "decision_tree": lambda: [process_agent_data(item, tree_registry) for item in data],
+        }
+        rates = {}
+        for name, function in paths.items():
+            # Results are dropped and collected so one path does not pay for another's garbage
+            function()
+            gc.collect()
+            start = perf_counter()
+            function()
+            rates[name] = args.messages / (perf_counter() - start)
+            gc.collect()
+
+    print(f"{'path':<16}{'msgs/s':>12}{'vs inline':>12}")
+    for name, rate in rates.items():
+        print(f"{name:<16}{rate:>12.0f}{rate / rates['inline']:>11.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Per-reading conversion cost of every hop, with the schema defined once in
+common.entities and encoded by common.codecs, against the conversions it replaced:
+
+    agent -> edge   before: lab1 {accelerometer, gps, time} JSON, re-shaped by a
+                            bridge (json.loads + json.dumps), edge validation
+                    after:  dumps_aggregated_data (AgentData JSON), edge validation
+    hub -> store    before: model_dump + ISO -> Unix seconds per item + json.dumps,
+                            store validation of its own models (int timestamp) + row
+                    after:  dumps_batch_json, store validation of the shared models + to_row
+    hub buffer      JSON (model_dump_json / model_validate_json) vs binary (pack / unpack)
+
+The store side is measured the way FastAPI runs it: json.loads of the body and
+validation of the Python objects.
+
+    python -m benchmarks.bench_codecs --items 20000 --batch-size 100
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+from time import perf_counter
+from typing import List, Optional
+
+from pydantic import BaseModel, TypeAdapter
+
+from benchmarks.harness import ROOT
+from common import codecs
+from common.entities import AgentData, ProcessedAgentData, ProcessedAgentDataBatch
+from common.reading_key import reading_key
+from lab1.src.file_datasource import FileDatasource
+from lab1.src.shema.fast_serializer import dumps_aggregated_data
+
+USER_ID = 1
+
+
+# The definitions the shared schema replaced
+class LegacyAccelerometer(BaseModel):
+    x: float
+    y: float
+    z: float
+
+
+class LegacyGps(BaseModel):
+    latitude: float
+    longitude: float
+
+
+class LegacyAgentData(BaseModel):
+    user_id: Optional[int] = None
+    accelerometer: LegacyAccelerometer
+    gps: LegacyGps
+    timestamp: int
+
+
+class LegacyProcessedAgentData(BaseModel):
+    road_state: str
+    agent_data: LegacyAgentData
+    reading_key: Optional[str] = None
+
+
+LegacyBatch = TypeAdapter(List[LegacyProcessedAgentData])
+
+
+def legacy_agent_json(data) -> str:
+    accelerometer, gps = data.accelerometer, data.gps
+    return (
+        f'{{"accelerometer": {{"x": {codecs.json_number(accelerometer.x)}, "y": {codecs.json_number(accelerometer.y)}, '
+        f'"z": {codecs.json_number(accelerometer.z)}}}, '
+        f'"gps": {{"longitude": {codecs.json_number(gps.longitude)}, "latitude": {codecs.json_number(gps.latitude)}}}, '
+        f'"time": "{data.time.isoformat()}"}}'
+    )
+
+
+def legacy_bridge(payload: str) -> str:
+    data = json.loads(payload)
+    return json.dumps({
+        "user_id": USER_ID, "accelerometer": data["accelerometer"], "gps": data["gps"], "timestamp": data["time"],
+    })
+
+
+def legacy_store_item(item: ProcessedAgentData) -> dict:
+    data = item.model_dump(mode="json")
+    timestamp = data["agent_data"]["timestamp"]
+    data["agent_data"]["timestamp"] = int(datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp())
+    return data
+
+
+def legacy_row(data: LegacyProcessedAgentData) -> dict:
+    return {
+        "road_state": data.road_state,
+        "x": data.agent_data.accelerometer.x,
+        "y": data.agent_data.accelerometer.y,
+        "z": data.agent_data.accelerometer.z,
+        "latitude": data.agent_data.gps.latitude,
+        "longitude": data.agent_data.gps.longitude,
+        "timestamp": datetime.fromtimestamp(data.agent_data.timestamp),
+        "user_id": data.agent_data.user_id,
+        "reading_key": data.reading_key,
+    }
+
+
+def readings(count: int):
+    source = FileDatasource(os.path.join(ROOT, "lab1", "accelerometer.csv"), os.path.join(ROOT, "lab1", "gps.csv"))
+    source.startReading()
+    try:
+        return [source.read() for _ in range(count)]
+    finally:
+        source.stopReading()
+
+
+def measure(function, items: int) -> float:
+    """Microseconds per reading."""
+    start = perf_counter()
+    function()
+    return (perf_counter() - start) / items * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    data = readings(args.items)
+    processed = [
+        ProcessedAgentData(
+            road_state="normal",
+            agent_data=AgentData.model_validate_json(dumps_aggregated_data(item, USER_ID), strict=True),
+            reading_key=reading_key(USER_ID, item.time),
+        )
+        for item in data
+    ]
+    batches = [processed[i:i + args.batch_size] for i in range(0, len(processed), args.batch_size)]
+    results = []
+
+    # agent -> edge
+    def agent_before():
+        for item in data:
+            AgentData.model_validate_json(legacy_bridge(legacy_agent_json(item)), strict=True)
+
+    def agent_after():
+        for item in data:
+            AgentData.model_validate_json(dumps_aggregated_data(item, USER_ID), strict=True)
+
+    sizes = sum(len(legacy_bridge(legacy_agent_json(item))) for item in data) / len(data)
+    results.append(("agent -> edge", "before", measure(agent_before, len(data)), sizes))
+    sizes = sum(len(dumps_aggregated_data(item, USER_ID)) for item in data) / len(data)
+    results.append(("agent -> edge", "after", measure(agent_after, len(data)), sizes))
+
+    # hub -> store, per batch: hub encodes the body, the store decodes it and builds the rows
+    def store_before():
+        for batch in batches:
+            body = json.dumps([legacy_store_item(item) for item in batch]).encode()
+            [legacy_row(item) for item in LegacyBatch.validate_python(json.loads(body))]
+
+    def store_after():
+        for batch in batches:
+            body = codecs.dumps_batch_json(batch)
+            [codecs.to_row(item) for item in ProcessedAgentDataBatch.validate_python(json.loads(body))]
+
+    sizes = sum(len(json.dumps([legacy_store_item(item) for item in batch])) for batch in batches) / len(processed)
+    results.append(("hub -> store", "before", measure(store_before, len(processed)), sizes))
+    sizes = sum(len(codecs.dumps_batch_json(batch)) for batch in batches) / len(processed)
+    results.append(("hub -> store", "after", measure(store_after, len(processed)), sizes))
+
+    # hub buffer: push + read back
+    def buffer_json():
+        for item in processed:
+            ProcessedAgentData.model_validate_json(item.model_dump_json())
+
+    def buffer_binary():
+        for item in processed:
+            codecs.unpack(codecs.pack(item))
+
+    sizes = sum(len(item.model_dump_json()) for item in processed) / len(processed)
+    results.append(("hub buffer", "json", measure(buffer_json, len(processed)), sizes))
+    sizes = sum(len(codecs.pack(item)) for item in processed) / len(processed)
+    results.append(("hub buffer", "binary", measure(buffer_binary, len(processed)), sizes))
+
+    print(f"{args.items} readings, batches of {args.batch_size}")
+    print(f"{'hop':<16}{'path':<10}{'us/reading':>12}{'bytes/reading':>15}")
+    for hop, path, duration, size in results:
+        print(f"{hop:<16}{path:<10}{duration:>12.2f}{size:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Memory and query latency of lab2's in-memory HotStore compared with the
+same time window + bbox query through the ORM on SQLite.
+
+    python -m benchmarks.bench_hot_store --readings 1000000 --db-rows 200000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from time import perf_counter
+from unittest import mock
+
+import numpy as np
+
+from benchmarks.harness import percentile
+from lab2.src.hot_store import HotStore
+
+WINDOW = timedelta(minutes=15)
+QUERY = dict(min_lat=50.44, max_lat=50.46, min_lon=30.50, max_lon=30.54)
+
+
+def synthetic_columns(count: int, now: float):
+    rng = np.random.default_rng(42)
+    return (
+        np.sort(rng.uniform(now - WINDOW.total_seconds(), now, count)),
+        rng.normal(0, 300, count),
+        rng.normal(0, 300, count),
+        rng.normal(16500, 300, count),
+        rng.uniform(50.40, 50.50, count),
+        rng.uniform(30.45, 30.60, count),
+        rng.choice(np.array(["normal", "bump", "pothole"]), count, p=[0.9, 0.07, 0.03]),
+    )
+
+
+def time_query(function, repeat: int):
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = perf_counter()
+        result = function()
+        durations.append(perf_counter() - start)
+    return durations, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readings", type=int, default=1_000_000)
+    parser.add_argument("--db-rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    now = time.time()
+    timestamps, x, y, z, latitude, longitude, road_state = synthetic_columns(args.readings, now)
+
+    store = HotStore(capacity=args.readings)
+    start = perf_counter()
+    for i in range(args.readings):
+        store.append(i + 1, road_state[i], x[i], y[i], z[i], latitude[i], longitude[i],
+                     datetime.fromtimestamp(timestamps[i]))
+    fill_seconds = perf_counter() - start
+    store.coverage_start = now - WINDOW.total_seconds()
+
+    last_5_minutes = datetime.fromtimestamp(now) - timedelta(minutes=5)
+    memory_durations, memory_rows = time_query(lambda: store.query(last_5_minutes, **QUERY), args.repeat)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        environ = {
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'store.db')}",
+            "HOT_STORE_ENABLED": "false",
+            "ARCHIVE_ENABLED": "false",
+        }
+        with mock.patch.dict(os.environ, environ):
+            from lab2.src import main as store_app
+        store_app.init_db()
+        model = store_app.ProcessedAgentDataInDB
+        rows = args.db_rows
+        offset = args.readings - rows
+        with store_app.engine.begin() as connection:
+            connection.execute(model.__table__.insert(), [
+                {
+                    "road_state": str(road_state[offset + i]),
+                    "x": float(x[offset + i]), "y": float(y[offset + i]), "z": float(z[offset + i]),
+                    "latitude": float(latitude[offset + i]), "longitude": float(longitude[offset + i]),
+                    "timestamp": datetime.fromtimestamp(timestamps[offset + i]),
+                }
+                for i in range(rows)
+            ])
+
+        def db_query():
+            session = store_app.SessionLocal()
+            try:
+                return session.query(model).filter(
+                    model.timestamp >= last_5_minutes,
+                    model.latitude >= QUERY["min_lat"], model.latitude <= QUERY["max_lat"],
+                    model.longitude >= QUERY["min_lon"], model.longitude <= QUERY["max_lon"],
+                ).order_by(model.timestamp).all()
+            finally:
+                session.close()
+
+        db_durations, db_rows = time_query(db_query, max(1, args.repeat // 4))
+
+    print(f"HotStore: {store.nbytes / args.readings:.0f} bytes/reading, "
+          f"{store.nbytes / args.readings * 1_000_000 / 2 ** 20:.1f} MiB per million readings, "
+          f"append {args.readings / fill_seconds:.0f} readings/s")
+    print(f"{'query (last 5 min + bbox)':<30}{'rows':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    print(f"{f'memory ({args.readings} readings)':<30}{memory_rows:>8}"
+          f"{percentile(memory_durations, 50) * 1000:>10.2f}{percentile(memory_durations, 99) * 1000:>10.2f}")
+    print(f"{f'sqlite ORM ({rows} rows)':<30}{db_rows:>8}"
+          f"{percentile(db_durations, 50) * 1000:>10.2f}{percentile(db_durations, 99) * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
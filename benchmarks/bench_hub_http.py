@@ -0,0 +1,183 @@
+"""
+Requests per second of the hub's POST /processed_agent_data/ under concurrent load,
+and items per second delivered to the store until the hub's buffer has drained.
+
+The hub (lab3) runs in its own uvicorn process against a fakeredis TCP server
+and benchmarks.store_stub, which answers after --store-latency milliseconds;
+MQTT points at a closed port, so the hub keeps reconnecting in the background.
+
+    python -m benchmarks.bench_hub_http --concurrency 50 --requests 5000 --store-latency 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from time import perf_counter
+from urllib.parse import urlsplit
+
+import httpx
+
+from benchmarks.harness import ROOT, percentile
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Nothing is listening on port {port}")
+
+
+def wait_until_drained(store_port: int, quiet: float = 1.0, timeout: float = 120.0):
+    """
+    Wait until the hub has stopped delivering (no new items for `quiet` seconds).
+    Returns the stored count and the monotonic time it last changed.
+    """
+    deadline = time.monotonic() + timeout
+    stored, changed_at = -1, time.monotonic()
+    while time.monotonic() < deadline and time.monotonic() - changed_at < quiet:
+        current = httpx.get(f"http://127.0.0.1:{store_port}/stored").json()["stored"]
+        if current != stored:
+            stored, changed_at = current, time.monotonic()
+        time.sleep(0.05)
+    return stored, changed_at
+
+
+def payload(i: int) -> dict:
+    return {
+        "road_state": "normal",
+        "agent_data": {
+            "user_id": 1,
+            "accelerometer": {"x": 0.01 * (i % 7), "y": 0.02, "z": 0.98},
+            "gps": {"latitude": 50.45, "longitude": 30.52},
+            "timestamp": datetime.now().isoformat(),
+        },
+    }
+
+
+async def post_json(reader, writer, host: str, path: str, body: bytes) -> int:
+    """One request on a keep-alive HTTP/1.1 connection; returns the status code."""
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def load(url: str, requests: int, concurrency: int):
+    """
+    concurrency workers, each with its own keep-alive connection. A minimal client
+    instead of httpx: on a small machine the load generator shares the CPU with the
+    hub, and httpx's connection pool costs more CPU per request than the hub itself.
+    """
+    parts = urlsplit(url)
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+        try:
+            for i in counter:
+                body = json.dumps(payload(i)).encode()
+                start = perf_counter()
+                status = await post_json(reader, writer, parts.netloc, parts.path, body)
+                latencies.append(perf_counter() - start)
+                if status != 200:
+                    errors += 1
+        finally:
+            writer.close()
+
+    start = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = perf_counter() - start
+    return elapsed, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--store-latency", type=float, default=5.0, help="milliseconds")
+    parser.add_argument("--batch-size", type=int, default=10)
+    args = parser.parse_args()
+
+    redis_port, store_port, hub_port, mqtt_port = free_port(), free_port(), free_port(), free_port()
+    environ = dict(os.environ, PYTHONPATH=ROOT)
+    processes = []
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            processes.append(subprocess.Popen(
+                [sys.executable, "-c",
+                 # socketserver listens with a backlog of 5; Redis uses 511 (tcp-backlog)
+                 "from fakeredis import TcpFakeServer; TcpFakeServer.request_queue_size = 511; "
+                 f"TcpFakeServer(('127.0.0.1', {redis_port})).serve_forever()"],
+                env=environ,
+            ))
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "benchmarks.store_stub:app",
+                 "--port", str(store_port), "--log-level", "warning"],
+                cwd=ROOT, env=dict(environ, STORE_STUB_LATENCY=str(args.store_latency / 1000)),
+            ))
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(hub_port), "--log-level", "warning"],
+                cwd=os.path.join(ROOT, "lab3"),
+                env=dict(
+                    environ,
+                    REDIS_HOST="127.0.0.1", REDIS_PORT=str(redis_port),
+                    STORE_API_HOST="127.0.0.1", STORE_API_PORT=str(store_port),
+                    MQTT_BROKER_HOST="127.0.0.1", MQTT_BROKER_PORT=str(mqtt_port),
+                    BATCH_SIZE=str(args.batch_size), LOG_LEVEL="ERROR", LOG_FILE=os.path.join(workdir, "hub.log"),
+                ),
+            ))
+            for port in (redis_port, store_port, hub_port):
+                wait_for_port(port)
+
+            url = f"http://127.0.0.1:{hub_port}/processed_agent_data/"
+            asyncio.run(load(url, min(200, args.requests), args.concurrency))
+            stored_before, _ = wait_until_drained(store_port)
+            started = time.monotonic()
+            elapsed, latencies, errors = asyncio.run(load(url, args.requests, args.concurrency))
+            stored, stored_at = wait_until_drained(store_port)
+            stored -= stored_before
+            # Items are delivered after the requests are answered; stored/s counts until the last one
+            delivered_in = max(elapsed, stored_at - started)
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait()
+
+    print(f"hub POST /processed_agent_data/: {args.requests} requests, concurrency {args.concurrency}, "
+          f"store latency {args.store_latency:.0f} ms, batch size {args.batch_size}")
+    print(f"{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'stored':>8}{'stored/s':>10}")
+    print(f"{args.requests / elapsed:>10.0f}{percentile(latencies, 50) * 1000:>10.2f}"
+          f"{percentile(latencies, 99) * 1000:>10.2f}{errors:>8}{stored:>8}{stored / delivered_in:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Hub throughput with per-message logging: synchronous handlers vs the
+queue-based pipeline from common.logging_config.
+
+Every message goes through the hub hot path (ProcessedAgentData validation)
+and emits one INFO record, as the hub did per saved row.
+
+    python -m benchmarks.bench_logging --messages 20000
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from common.logging_config import setup_logging, stop_logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lab3"))
+
+from app.entities.processed_agent_data import ProcessedAgentData  # noqa: E402
+
+PAYLOAD = (
+    '{"road_state": "normal", "agent_data": {"user_id": 1, '
+    '"accelerometer": {"x": -17.0, "y": 4.0, "z": 16516.0}, '
+    '"gps": {"latitude": 50.45, "longitude": 30.52}, "timestamp": "2024-01-01T00:00:00"}}'
+)
+
+MODES = {
+    "sync": dict(async_mode=False, rate_limit=0),
+    "async": dict(async_mode=True, rate_limit=0),
+    "async+rate_limit": dict(async_mode=True, rate_limit=10),
+    "async+json+rate_limit": dict(async_mode=True, rate_limit=10, json_format=True),
+}
+
+
+def run(mode: str, messages: int, log_dir: str) -> float:
+    setup_logging(log_file=os.path.join(log_dir, f"{mode}.log"), **MODES[mode])
+    start = time.perf_counter()
+    for _ in range(messages):
+        ProcessedAgentData.model_validate_json(PAYLOAD)
+        logging.info("Successfully saved item to Store API")
+    elapsed = time.perf_counter() - start
+    # Drain the queue so the next mode starts clean
+    stop_logging()
+    return messages / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+
+    stderr = sys.stderr
+    results = {}
+    with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, "w") as devnull:
+        # Console output goes to /dev/null so the terminal speed does not skew the numbers
+        sys.stderr = devnull
+        try:
+            for mode in MODES:
+                results[mode] = run(mode, args.messages, log_dir)
+        finally:
+            sys.stderr = stderr
+            logging.getLogger().handlers.clear()
+
+    baseline = results["sync"]
+    print(f"{'mode':<24}{'msgs/s':>12}{'vs sync':>10}")
+    for mode, rate in results.items():
+        print(f"{mode:<24}{rate:>12.0f}{rate / baseline:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
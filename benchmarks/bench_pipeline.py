@@ -0,0 +1,99 @@
+"""
+End-to-end pipeline benchmark (agent -> edge -> hub -> store) without Docker.
+
+Reports messages per second, p50/p99 latency and net memory per stage, plus
+end-to-end figures. Stage times are exclusive: the hub time does not include
+the store call it makes.
+
+    python -m benchmarks.bench_pipeline --messages 5000 --output baseline.json
+"""
+import argparse
+import json
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+from benchmarks.harness import Pipeline, percentile
+
+
+def stage_report(pipeline: Pipeline) -> dict:
+    report = {}
+    for name, stats in pipeline.timer.stages.items():
+        durations = stats.durations
+        if not durations:
+            continue
+        total = sum(durations)
+        report[name] = {
+            "calls": len(durations),
+            "msgs_per_s": len(durations) / total if total else 0.0,
+            "p50_ms": percentile(durations, 50) * 1000,
+            "p99_ms": percentile(durations, 99) * 1000,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--memory-messages", type=int, default=1000,
+                        help="messages in the separate tracemalloc pass (0 skips it)")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        pipeline = Pipeline(workdir, batch_size=args.batch_size)
+        pipeline.run(args.warmup)
+        pipeline.timer.reset()
+
+        start = perf_counter()
+        latencies = pipeline.run(args.messages)
+        elapsed = perf_counter() - start
+        stages = stage_report(pipeline)
+
+        memory = {}
+        peak_kib = None
+        if args.memory_messages:
+            pipeline.timer.reset()
+            tracemalloc.start()
+            pipeline.run(args.memory_messages)
+            peak_kib = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+            for name, stats in pipeline.timer.stages.items():
+                memory[name] = stats.net_allocated / 1024 / args.memory_messages * 1000
+
+        results = {
+            "messages": args.messages,
+            "batch_size": args.batch_size,
+            "end_to_end": {
+                "msgs_per_s": args.messages / elapsed,
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+                "tracemalloc_peak_kib": peak_kib,
+            },
+            "stages": {
+                name: dict(values, net_kib_per_1k_msgs=memory.get(name)) for name, values in stages.items()
+            },
+            "stored_rows": pipeline.stored_rows(),
+        }
+
+    print(f"{'stage':<16}{'calls':>8}{'msgs/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'KiB/1k':>10}")
+    for name, values in results["stages"].items():
+        kib = values["net_kib_per_1k_msgs"]
+        print(
+            f"{name:<16}{values['calls']:>8}{values['msgs_per_s']:>12.0f}"
+            f"{values['p50_ms']:>10.3f}{values['p99_ms']:>10.3f}{'' if kib is None else f'{kib:.1f}':>10}"
+        )
+    e2e = results["end_to_end"]
+    print(f"{'end-to-end':<16}{args.messages:>8}{e2e['msgs_per_s']:>12.0f}{e2e['p50_ms']:>10.3f}{e2e['p99_ms']:>10.3f}")
+    if peak_kib is not None:
+        print(f"tracemalloc peak: {peak_kib:.0f} KiB, rows stored: {results['stored_rows']}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
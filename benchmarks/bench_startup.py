@@ -0,0 +1,199 @@
+"""
+Cold start of the store (lab2), hub (lab3) and edge (lab4): import time of each
+service module from `python -X importtime`, with the packages that take most of
+it, and time to first message, from spawning a fresh interpreter until the
+service has handled its first reading:
+
+    store   lifespan startup, then POST /processed_agent_data/ (SQLite)
+    hub     lifespan startup, then POST /processed_agent_data/ buffered in Redis
+            (a fakeredis TCP server; MQTT points at a closed port)
+    edge    adapters wired as in main(), one reading published to the agent
+            topic and received, classified, on the hub topic (in-process broker)
+
+The ASGI apps are driven directly, so neither uvicorn nor an HTTP client is
+part of the measurement.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs the app's lifespan startup and one POST in the child, then prints the seconds since BENCH_START
+ASGI_DRIVER = """
+import asyncio, os, sys, time
+sys.path.insert(0, os.getcwd())
+from {module} import app
+
+async def drive(body):
+    startup = asyncio.Queue()
+    await startup.put({{"type": "lifespan.startup"}})
+    sent = asyncio.Queue()
+    asyncio.create_task(app({{"type": "lifespan", "asgi": {{"version": "3.0"}}}}, startup.get, sent.put))
+    message = await sent.get()
+    assert message["type"] == "lifespan.startup.complete", message
+    path = "/processed_agent_data/"
+    scope = {{
+        "type": "http", "asgi": {{"version": "3.0"}}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }}
+    request = asyncio.Queue()
+    await request.put({{"type": "http.request", "body": body, "more_body": False}})
+    response = asyncio.Queue()
+    await app(scope, request.get, response.put)
+    status = (await response.get())["status"]
+    assert status == 200, (await response.get())["body"]
+
+asyncio.run(drive({body!r}))
+print(time.time() - float(os.environ["BENCH_START"]), flush=True)
+os._exit(0)
+"""
+
+EDGE_DRIVER = """
+import os, sys, time
+import paho.mqtt.client
+from benchmarks.mqtt_shim import InMemoryBroker
+
+broker = InMemoryBroker()
+paho.mqtt.client.Client = broker.client_factory()
+sys.path.insert(0, os.getcwd())
+import main
+
+hub_adapter = main.create_hub_adapter()
+hub_adapter.connect()
+agent_adapter = main.create_agent_adapter(hub_adapter, main.create_calibrator())
+agent_adapter.connect()
+agent_adapter.start()
+received = []
+sink = broker.client_factory()()
+sink.on_message = lambda client, userdata, message: received.append(message)
+sink.subscribe(main.HUB_MQTT_TOPIC)
+broker.publish(main.MQTT_TOPIC, {body!r})
+broker.pump()
+assert received, "no reading reached the hub topic"
+print(time.time() - float(os.environ["BENCH_START"]), flush=True)
+os._exit(0)
+"""
+
+
+def reading(road_state=None) -> dict:
+    agent_data = {
+        "user_id": 1,
+        "accelerometer": {"x": 0.1, "y": 0.2, "z": 16500.0},
+        "gps": {"latitude": 50.45, "longitude": 30.52},
+        "timestamp": datetime.now().isoformat(),
+        "sequence": 0,
+    }
+    return {"road_state": road_state, "agent_data": agent_data} if road_state else agent_data
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Nothing is listening on port {port}")
+
+
+def import_profile(module: str, cwd: str, environ: dict, top: int):
+    """Cumulative import time of the module and the top packages by self time, in seconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import sys, os; sys.path.insert(0, os.getcwd()); import {module}"],
+        cwd=cwd, env=environ, capture_output=True, text=True, check=True,
+    )
+    packages, total = Counter(), 0
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \| *(\S+)", line)
+        if not match:
+            continue
+        self_us, cumulative_us, name = int(match.group(1)), int(match.group(2)), match.group(3)
+        packages[name.split(".")[0]] += self_us / 1e6
+        if name == module:
+            total = cumulative_us / 1e6
+    return total, packages.most_common(top)
+
+
+def first_message(code: str, cwd: str, environ: dict) -> float:
+    """Seconds from spawning the interpreter until the child has handled its first reading."""
+    start = time.time()
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=cwd, env=dict(environ, BENCH_START=repr(start)),
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="packages listed per service")
+    args = parser.parse_args()
+
+    redis_port, mqtt_port = free_port(), free_port()
+    environ = dict(os.environ, PYTHONPATH=ROOT, METRICS_PORT="0", LOG_LEVEL="ERROR")
+    with tempfile.TemporaryDirectory() as workdir:
+        redis_server = subprocess.Popen(
+            [sys.executable, "-c",
+             f"from fakeredis import TcpFakeServer; TcpFakeServer(('127.0.0.1', {redis_port})).serve_forever()"],
+            env=environ,
+        )
+        try:
+            wait_for_port(redis_port)
+            services = [
+                ("store", "lab2.src.main", ROOT, dict(
+                    environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'store.db')}",
+                    ARCHIVE_DIR=os.path.join(workdir, "archive"),
+                ), ASGI_DRIVER.format(module="lab2.src.main", body=json.dumps(reading("normal")).encode())),
+                ("hub", "main", os.path.join(ROOT, "lab3"), dict(
+                    environ, REDIS_HOST="127.0.0.1", REDIS_PORT=str(redis_port),
+                    MQTT_BROKER_HOST="127.0.0.1", MQTT_BROKER_PORT=str(mqtt_port),
+                    LOG_FILE=os.path.join(workdir, "hub.log"),
+                ), ASGI_DRIVER.format(module="main", body=json.dumps(reading("normal")).encode())),
+                ("edge", "main", os.path.join(ROOT, "lab4"), dict(
+                    environ, EDGE_BATCH_SIZE="1", LOG_FILE=os.path.join(workdir, "edge.log"),
+                ), EDGE_DRIVER.format(body=json.dumps(reading()))),
+            ]
+            results = []
+            for name, module, cwd, service_environ, code in services:
+                imports, packages = import_profile(module, cwd, service_environ, args.top)
+                # The first run also warms the OS file cache for the rest
+                first_message(code, cwd, service_environ)
+                durations = [first_message(code, cwd, service_environ) for _ in range(args.runs)]
+                results.append((name, imports, packages, durations))
+        finally:
+            redis_server.terminate()
+            redis_server.wait()
+
+    print(f"{args.runs} cold starts per service, Python {sys.version.split()[0]}")
+    print(f"{'service':<10}{'import ms':>12}{'first msg p50 ms':>18}{'min ms':>10}   top imports (self ms)")
+    for name, imports, packages, durations in results:
+        top = ", ".join(f"{package} {seconds * 1000:.0f}" for package, seconds in packages)
+        print(f"{name:<10}{imports * 1000:>12.0f}{statistics.median(durations) * 1000:>18.0f}"
+              f"{min(durations) * 1000:>10.0f}   {top}")
+
+
+if __name__ == "__main__":
+    main()
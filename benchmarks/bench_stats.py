@@ -0,0 +1,120 @@
+"""
+Road quality statistics of lab2 computed in the database (/stats/*) compared
+with pulling every row (GET /processed_agent_data/) and aggregating on the
+client: response size and latency, cold and from the closed-range cache.
+
+    python -m benchmarks.bench_stats --rows 200000 --days 7
+"""
+import argparse
+import math
+import os
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from time import perf_counter
+from unittest import mock
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from benchmarks.harness import percentile
+
+
+def synthetic_rows(count: int, days: int, end: float):
+    rng = np.random.default_rng(42)
+    timestamps = np.sort(rng.uniform(end - days * 86400, end, count))
+    z = rng.normal(0, 0.3, count)
+    latitude = rng.uniform(50.40, 50.50, count)
+    longitude = rng.uniform(30.45, 30.60, count)
+    road_state = rng.choice(np.array(["normal", "bump", "pothole"]), count, p=[0.9, 0.07, 0.03])
+    user_id = rng.integers(1, 11, count)
+    return [
+        {
+            "road_state": str(road_state[i]), "x": 0.0, "y": 0.0, "z": float(z[i]),
+            "latitude": float(latitude[i]), "longitude": float(longitude[i]),
+            "timestamp": datetime.fromtimestamp(timestamps[i]), "user_id": int(user_id[i]),
+        }
+        for i in range(count)
+    ]
+
+
+def client_side_stats(rows):
+    """What a consumer had to do before: counts, |z| histogram and hourly series from all rows."""
+    counts = Counter(row["road_state"] for row in rows)
+    histogram = Counter(min(int(abs(row["z"]) / 0.1), 49) for row in rows if row["z"] is not None)
+    hourly = Counter(row["timestamp"][:13] for row in rows)
+    return counts, histogram, hourly
+
+
+def timed_get(client, url: str, params=None, repeat: int = 1):
+    durations, size = [], 0
+    for _ in range(repeat):
+        start = perf_counter()
+        response = client.get(url, params=params)
+        response.raise_for_status()
+        durations.append(perf_counter() - start)
+        size = len(response.content)
+    return durations, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    # Whole hours, so that the range is closed and cacheable
+    end = math.floor(time.time() / 3600) * 3600 - 3600
+    closed_range = {
+        "start": datetime.fromtimestamp(end - args.days * 86400).isoformat(),
+        "end": datetime.fromtimestamp(end).isoformat(),
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        environ = {
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'store.db')}",
+            "HOT_STORE_ENABLED": "false",
+            "ARCHIVE_ENABLED": "false",
+        }
+        with mock.patch.dict(os.environ, environ):
+            from lab2.src import main as store_app
+        store_app.init_db()
+        with store_app.engine.begin() as connection:
+            connection.execute(store_app.ProcessedAgentDataInDB.__table__.insert(),
+                               synthetic_rows(args.rows, args.days, end))
+        client = TestClient(store_app.app)
+
+        results = []
+        start = perf_counter()
+        response = client.get("/processed_agent_data/")
+        client_side_stats(response.json())
+        results.append(("all rows + client-side stats", [perf_counter() - start], len(response.content)))
+
+        queries = [
+            ("/stats/road_state", {}),
+            ("/stats/z_histogram", {"bin_width": 0.1, "bins": 50}),
+            ("/stats/timeseries", {"interval": "hour"}),
+            ("/stats/timeseries", {"interval": "day"}),
+            ("/stats/road_state", {"user_id": 3}),
+        ]
+        for url, params in queries:
+            label = url + "".join(f" {key}={value}" for key, value in params.items())
+            # Open range: computed every time
+            durations, size = timed_get(client, url, params, args.repeat)
+            results.append((label, durations, size))
+            # Closed range: computed once, then served from the cache
+            store_app.stats.cache.invalidate()
+            cold, _ = timed_get(client, url, {**params, **closed_range})
+            cached, size = timed_get(client, url, {**params, **closed_range}, args.repeat)
+            results.append((f"{label} (closed, cold)", cold, size))
+            results.append((f"{label} (closed, cached)", cached, size))
+
+    print(f"{args.rows} rows over {args.days} days, SQLite")
+    print(f"{'query':<58}{'bytes':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for label, durations, size in results:
+        print(f"{label:<58}{size:>12}{percentile(durations, 50) * 1000:>10.2f}{percentile(durations, 99) * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Load test of the store (lab2) as deployed by src.serve: concurrent single-row
+POST /processed_agent_data/ against a real server, for each combination of
+worker processes (STORE_WORKERS) and coalescing window (WRITE_COALESCE_WINDOW,
+0 commits every request on its own).
+
+Rows per second are the rows stored over the run; commits are counted in the
+change log, where the events of one commit share their created_at. A fresh
+SQLite file per run by default; with --database-url every run writes to that
+database (e.g. Postgres, where writers also serialize on the change feed's
+advisory lock until commit).
+
+With --write-path the same database is also written without HTTP: the store's
+own write_readings from --writers threads, one row or --batch rows per commit,
+with the change feed on and off. It shows the commit rate the database allows
+with that lock, which more workers cannot exceed.
+
+    python -m benchmarks.bench_store_workers --requests 3000 --concurrency 64 --workers 1 4 --windows 0 0.005
+    python -m benchmarks.bench_store_workers --database-url postgresql+psycopg2://postgres@/postgres?host=/tmp/pg \
+        --write-path --writers 1 4 16
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from time import perf_counter
+
+import httpx
+from sqlalchemy import create_engine, text
+
+from benchmarks.bench_startup import free_port, wait_for_port
+from benchmarks.harness import ROOT, percentile
+from common.codecs import to_row
+from common.entities import ProcessedAgentData
+
+
+def reading(i: int, run: str) -> dict:
+    return {
+        "road_state": "normal",
+        "reading_key": f"bench-{run}-{i}",
+        "agent_data": {
+            "user_id": 1, "accelerometer": {"x": 0.0, "y": 0.0, "z": float(i % 100) / 10},
+            "gps": {"latitude": 50.45, "longitude": 30.52},
+            "timestamp": (datetime.now() + timedelta(milliseconds=i)).isoformat(), "sequence": 0,
+        },
+    }
+
+
+async def load(port: int, requests: int, concurrency: int, offset: int, run: str):
+    latencies, errors = [], 0
+    next_request = iter(range(offset, offset + requests))
+
+    async def worker(client):
+        nonlocal errors
+        for i in next_request:
+            start = perf_counter()
+            try:
+                response = await client.post("/processed_agent_data/", json=reading(i, run))
+                response.raise_for_status()
+                latencies.append(perf_counter() - start)
+            except httpx.HTTPError:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        start = perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        return perf_counter() - start, latencies, errors
+
+
+def count_writes(database_url: str):
+    engine = create_engine(database_url)
+    try:
+        with engine.connect() as connection:
+            rows = connection.execute(text("SELECT count(*) FROM processed_agent_data")).scalar()
+            commits = connection.execute(text(
+                "SELECT count(DISTINCT created_at) FROM processed_agent_data_changes WHERE op = 'insert'"
+            )).scalar()
+    finally:
+        engine.dispose()
+    return rows, commits
+
+
+def run(workers: int, window: float, args, workdir: str):
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, f'store-{workers}-{window}.db')}"
+    # Reading keys unique to the run, so runs sharing a database do not see each other's rows as duplicates
+    name = f"{workers}-{window}-{os.getpid()}"
+    port = free_port()
+    environ = dict(
+        os.environ, PYTHONPATH=ROOT, DATABASE_URL=database_url, STORE_HOST="127.0.0.1",
+        STORE_PORT=str(port), STORE_WORKERS=str(workers), WRITE_COALESCE_WINDOW=str(window),
+        ARCHIVE_ENABLED="false",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "lab2.src.serve"], cwd=ROOT, env=environ,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(port)
+        # Warm-up: every worker has started and the connections are open
+        asyncio.run(load(port, args.concurrency * 4, args.concurrency, offset=10 ** 7, run=name))
+        rows_before, commits_before = count_writes(database_url)
+        elapsed, latencies, errors = asyncio.run(load(port, args.requests, args.concurrency, offset=0, run=name))
+        rows, commits = count_writes(database_url)
+    finally:
+        server.terminate()
+        server.wait()
+    rows, commits = rows - rows_before, commits - commits_before
+    return {
+        "workers": workers, "window": window, "rows/s": rows / elapsed, "commits/s": commits / elapsed,
+        "rows/commit": rows / commits if commits else 0.0,
+        "p50": percentile(latencies, 50) if latencies else 0.0,
+        "p99": percentile(latencies, 99) if latencies else 0.0,
+        "errors": errors,
+    }
+
+
+def write_path(database_url: str, change_feed: bool, writers: int, batch: int, rows: int):
+    """rows/s and commits/s of write_readings called from `writers` threads, in a process of its own"""
+    environ = dict(
+        os.environ, PYTHONPATH=ROOT, DATABASE_URL=database_url, CHANGE_FEED_ENABLED=str(change_feed).lower(),
+        HOT_STORE_ENABLED="false", ARCHIVE_ENABLED="false",
+    )
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_store_workers", "--write-path-run", str(writers), str(batch), str(rows)],
+        cwd=ROOT, env=environ, check=True, capture_output=True, text=True,
+    ).stdout.split()
+    elapsed = float(output[-1])
+    return {"feed": change_feed, "writers": writers, "rows/commit": batch,
+            "rows/s": rows / elapsed, "commits/s": rows / batch / elapsed}
+
+
+def run_write_path(writers: int, batch: int, rows: int) -> None:
+    from lab2.src import main as store
+
+    store.init_db()
+    name = f"write-path-{os.getpid()}"
+    commits = iter(range(rows // batch))
+    lock = threading.Lock()
+
+    def writer():
+        while True:
+            with lock:
+                commit = next(commits, None)
+            if commit is None:
+                return
+            store.write_readings([
+                to_row(ProcessedAgentData.model_validate(reading(commit * batch + i, name)))
+                for i in range(batch)
+            ])
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    start = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 0.005], help="seconds")
+    parser.add_argument("--database-url", default="", help="shared by all runs; a SQLite file per run if empty")
+    parser.add_argument("--write-path", action="store_true", help="also measure write_readings without HTTP")
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--batch", type=int, default=50, help="rows per commit of the batched write path")
+    parser.add_argument("--write-path-run", type=int, nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.write_path_run:
+        run_write_path(*args.write_path_run)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run(workers, window, args, workdir) for workers in args.workers for window in args.windows]
+
+    database = create_engine(args.database_url).dialect.name if args.database_url else "sqlite"
+    print(f"{args.requests} single-row POSTs, concurrency {args.concurrency}, {database}, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8}{'window ms':>11}{'rows/s':>9}{'commits/s':>11}{'rows/commit':>13}"
+          f"{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for result in results:
+        print(f"{result['workers']:>8}{result['window'] * 1000:>11.1f}{result['rows/s']:>9.0f}"
+              f"{result['commits/s']:>11.0f}{result['rows/commit']:>13.1f}{result['p50'] * 1000:>9.1f}"
+              f"{result['p99'] * 1000:>9.1f}{result['errors']:>8}")
+    if not args.write_path:
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'write-path.db')}"
+        write_results = [
+            write_path(database_url, change_feed, writers, batch, max(args.requests, batch * writers))
+            for change_feed in (True, False) for batch in (1, args.batch) for writers in args.writers
+        ]
+    print("\nwrite_readings without HTTP")
+    print(f"{'feed':>6}{'writers':>9}{'rows/commit':>13}{'rows/s':>9}{'commits/s':>11}")
+    for result in write_results:
+        print(f"{'on' if result['feed'] else 'off':>6}{result['writers']:>9}{result['rows/commit']:>13}"
+              f"{result['rows/s']:>9.0f}{result['commits/s']:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+In-process wiring of the whole pipeline for benchmarks:
+
+    lab1 FileDatasource/DataAggregator -> lab4 AgentMQTTAdapter (calibration + classification)
+    -> lab4 HubMqttAdapter -> lab3 hub (buffer + StoreApiAdapter) -> lab2 store (SQLite)
+
+MQTT is replaced by benchmarks.mqtt_shim, Redis by fakeredis and Postgres by
+SQLite; the service code itself runs unchanged. The asyncio hub runs on an
+event loop owned by the pipeline, driven message by message from the shim.
+"""
+import asyncio
+import importlib
+import os
+import sys
+import tracemalloc
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Awaitable, Callable, Dict, List, Optional
+from unittest import mock
+
+import fakeredis
+import httpx
+import paho.mqtt.client as paho_client
+import redis.asyncio
+
+from benchmarks.mqtt_shim import InMemoryBroker
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Top-level module names that lab3 and lab4 both define
+LAB_MODULES = ("app", "config", "main")
+
+AGENT_TOPIC = "agent_data_topic"
+HUB_TOPIC = "processed_data_topic"
+
+
+def _is_lab_module(name: str) -> bool:
+    return name.split(".")[0] in LAB_MODULES
+
+
+@contextmanager
+def lab_modules(lab: str, **environ):
+    """
+    Import modules of lab3/lab4 (which use top-level `app` and `config`) side by side.
+    Modules imported inside the block keep working after it; only sys.modules is restored.
+    """
+    path = os.path.join(ROOT, lab)
+    saved = {name: module for name, module in sys.modules.items() if _is_lab_module(name)}
+    for name in saved:
+        del sys.modules[name]
+    sys.path.insert(0, path)
+    try:
+        with mock.patch.dict(os.environ, {key: str(value) for key, value in environ.items()}):
+            yield
+    finally:
+        sys.path.remove(path)
+        for name in [name for name in sys.modules if _is_lab_module(name)]:
+            del sys.modules[name]
+        sys.modules.update(saved)
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.durations: List[float] = []
+        self.net_allocated = 0
+
+    def reset(self):
+        self.durations = []
+        self.net_allocated = 0
+
+
+class StageTimer:
+    """
+    Wraps callables and records their exclusive wall time (time spent in nested
+    wrapped stages is subtracted) and, while tracemalloc is tracing, net allocated memory.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, StageStats] = {}
+        self._stack: List[List[float]] = []
+
+    @contextmanager
+    def _measure(self, stats: StageStats):
+        stack = self._stack
+        tracing = tracemalloc.is_tracing()
+        memory_before = tracemalloc.get_traced_memory()[0] if tracing else 0
+        # frame: [nested time, nested memory]
+        frame = [0.0, 0]
+        stack.append(frame)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - start
+            memory = tracemalloc.get_traced_memory()[0] - memory_before if tracing else 0
+            stack.pop()
+            stats.durations.append(elapsed - frame[0])
+            stats.net_allocated += memory - frame[1]
+            if stack:
+                stack[-1][0] += elapsed
+                stack[-1][1] += memory
+
+    def wrap(self, name: str, function: Callable) -> Callable:
+        stats = self.stages.setdefault(name, StageStats(name))
+
+        def wrapper(*args, **kwargs):
+            with self._measure(stats):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    def wrap_async(self, name: str, function: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        """Same for a coroutine function; calls must not overlap (the pipeline awaits them one at a time)."""
+        stats = self.stages.setdefault(name, StageStats(name))
+
+        async def wrapper(*args, **kwargs):
+            with self._measure(stats):
+                return await function(*args, **kwargs)
+
+        return wrapper
+
+    def reset(self):
+        for stats in self.stages.values():
+            stats.reset()
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class Pipeline:
+    def __init__(self, workdir: str, batch_size: int = 10, user_id: int = 1, hub_environ: Optional[dict] = None):
+        self.workdir = workdir
+        self.batch_size = batch_size
+        self.user_id = user_id
+        self.hub_environ = hub_environ or {}
+        self.broker = InMemoryBroker()
+        self.timer = StageTimer()
+        self._client_patch = mock.patch.object(paho_client, "Client", self.broker.client_factory())
+        with self._client_patch:
+            self._setup_store()
+            self._setup_hub()
+            self._setup_edge()
+            self._setup_agent()
+
+    def _setup_store(self):
+        database_url = f"sqlite:///{os.path.join(self.workdir, 'store.db')}"
+        with mock.patch.dict(os.environ, {"DATABASE_URL": database_url}):
+            # The settings are read on import: both modules are imported again with this environment
+            sys.modules.pop("lab2.src.main", None)
+            sys.modules.pop("lab2.src.config", None)
+            self.store = importlib.import_module("lab2.src.main")
+        # Startup hooks do not run without a server
+        self.store.init_db()
+
+    def _setup_hub(self):
+        environ = dict(
+            BATCH_SIZE=self.batch_size,
+            MQTT_TOPIC=HUB_TOPIC,
+            LOG_FILE=os.path.join(self.workdir, "hub.log"),
+            LOG_LEVEL="WARNING",
+        )
+        environ.update(self.hub_environ)
+        with lab_modules("lab3", **environ), \
+                mock.patch.object(redis.asyncio, "Redis", fakeredis.FakeAsyncRedis), \
+                mock.patch.object(redis.asyncio, "BlockingConnectionPool", lambda **kwargs: None):
+            self.hub = importlib.import_module("main")
+            # Connections and adapters are created by the FastAPI lifespan, which does not run here
+            self.hub.startup()
+        self.loop = asyncio.new_event_loop()
+        # The hub's store calls go to the lab2 app in-process
+        store_api_adapter = self.hub.store_api_adapter
+        store_api_adapter.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=self.store.app))
+        store_api_adapter.save_data = self.timer.wrap_async("store", store_api_adapter.save_data)
+        # The hub's own MQTT client is not started: messages are delivered by this subscriber
+        subscriber = self.broker.client_factory()()
+        subscriber.on_message = self.timer.wrap("hub", self._deliver_to_hub)
+        subscriber.subscribe(HUB_TOPIC)
+
+    def _deliver_to_hub(self, client, userdata, msg):
+        self.loop.run_until_complete(self.hub.on_message(msg))
+        # Batches are delivered by background tasks; finish them inside the hub stage
+        while self.hub.flush_tasks:
+            self.loop.run_until_complete(asyncio.gather(*list(self.hub.flush_tasks)))
+
+    def _setup_edge(self):
+        with lab_modules("lab4", MQTT_TOPIC=AGENT_TOPIC, HUB_MQTT_TOPIC=HUB_TOPIC):
+            agent_mqtt_adapter = importlib.import_module("app.adapters.agent_mqtt_adapter")
+            hub_mqtt_adapter = importlib.import_module("app.adapters.hub_mqtt_adapter")
+            calibration = importlib.import_module("app.usecases.calibration")
+            hub_adapter = hub_mqtt_adapter.HubMqttAdapter(broker="in-process", port=1883, topic=HUB_TOPIC)
+            hub_adapter.connect()
+            self.edge = agent_mqtt_adapter.AgentMQTTAdapter(
+                "in-process", 1883, AGENT_TOPIC, hub_gateway=hub_adapter, batch_size=self.batch_size,
+                # Partial batches are left for the next message instead of a flush thread racing the pump
+                calibrator=calibration.Calibrator(), batch_timeout=0,
+            )
+            self.edge.connect()
+            self.edge.start()
+        self.edge.client.on_message = self.timer.wrap("edge", self.edge.on_message)
+
+    def _setup_agent(self):
+        from lab1.src.file_datasource import FileDatasource
+        from lab1.src.main import DataAggregator
+
+        self.datasource = FileDatasource(
+            os.path.join(ROOT, "lab1", "accelerometer.csv"),
+            os.path.join(ROOT, "lab1", "gps.csv"),
+        )
+        # lab1 publishes the shared AgentData schema, which the edge reads as is
+        self.aggregator = DataAggregator("in-process", 1883, AGENT_TOPIC, user_id=self.user_id)
+        self.aggregator.connect_to_broker()
+        self.read = self.timer.wrap("agent.read", self.datasource.read)
+        self.publish = self.timer.wrap("agent.publish", self.aggregator.publish_data)
+
+    def run(self, messages: int) -> List[float]:
+        """Push messages through the pipeline one by one; returns end-to-end latencies."""
+        latencies = []
+        self.datasource.startReading()
+        try:
+            for _ in range(messages):
+                start = perf_counter()
+                self.publish(self.read())
+                self.broker.pump()
+                latencies.append(perf_counter() - start)
+        finally:
+            self.datasource.stopReading()
+        return latencies
+
+    def stored_rows(self) -> int:
+        session = self.store.SessionLocal()
+        try:
+            return session.query(self.store.ProcessedAgentDataInDB).count()
+        finally:
+            session.close()
@@ -0,0 +1,143 @@
+"""
+In-process stand-in for an MQTT broker and the parts of the paho client API
+the services use (connect, subscribe, publish, loop_start/stop, callbacks with
+paho's callback API version 2).
+
+Published messages are queued and delivered by InMemoryBroker.pump(), so
+every subscriber callback runs on its own and can be timed as a separate stage.
+"""
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, List, Tuple
+
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.reasoncodes import ReasonCode
+
+MQTT_ERR_SUCCESS = 0
+
+
+class InMemoryMessage:
+    __slots__ = ("topic", "payload", "qos", "retain")
+
+    def __init__(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+
+
+class PublishResult:
+    """Mimics paho MQTTMessageInfo: result.rc and result[0] are the return code."""
+
+    __slots__ = ("rc", "mid")
+
+    def __init__(self, rc: int, mid: int):
+        self.rc = rc
+        self.mid = mid
+
+    def __getitem__(self, index):
+        return (self.rc, self.mid)[index]
+
+    def wait_for_publish(self, timeout=None):
+        return None
+
+    def is_published(self) -> bool:
+        return True
+
+
+class InMemoryBroker:
+    def __init__(self):
+        self.subscriptions: Dict[str, List["InMemoryMqttClient"]] = defaultdict(list)
+        self.queue: Deque[Tuple[str, bytes]] = deque()
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, topic: str, client: "InMemoryMqttClient"):
+        if client not in self.subscriptions[topic]:
+            self.subscriptions[topic].append(client)
+
+    def publish(self, topic: str, payload) -> None:
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        self.published += 1
+        self.queue.append((topic, payload))
+
+    def pump(self) -> int:
+        """Deliver queued messages (including ones published while delivering)."""
+        delivered = 0
+        while self.queue:
+            topic, payload = self.queue.popleft()
+            for client in self.subscriptions.get(topic, ()):
+                client.deliver(InMemoryMessage(topic, payload))
+                delivered += 1
+        self.delivered += delivered
+        return delivered
+
+    def client_factory(self) -> Callable[..., "InMemoryMqttClient"]:
+        """Drop-in replacement for paho.mqtt.client.Client bound to this broker."""
+        broker = self
+
+        def factory(*args, **kwargs):
+            return InMemoryMqttClient(broker)
+
+        return factory
+
+
+class InMemoryMqttClient:
+    def __init__(self, broker: InMemoryBroker):
+        self.broker = broker
+        self.on_connect = None
+        self.on_message = None
+        self.on_publish = None
+        self.on_disconnect = None
+        self.userdata = None
+        self._mid = 0
+
+    def connect(self, host, port=1883, keepalive=60, *args, **kwargs):
+        if self.on_connect is not None:
+            self.on_connect(self, self.userdata, {}, ReasonCode(PacketTypes.CONNACK, "Success"), None)
+        return MQTT_ERR_SUCCESS
+
+    def connect_async(self, host, port=1883, keepalive=60, *args, **kwargs):
+        return self.connect(host, port, keepalive)
+
+    def reconnect(self):
+        return self.connect(None)
+
+    def disconnect(self, *args, **kwargs):
+        if self.on_disconnect is not None:
+            self.on_disconnect(self, self.userdata, {}, ReasonCode(PacketTypes.DISCONNECT, "Normal disconnection"), None)
+        return MQTT_ERR_SUCCESS
+
+    def subscribe(self, topic, qos=0, *args, **kwargs):
+        if isinstance(topic, (list, tuple)):
+            for item in topic:
+                self.broker.subscribe(item[0] if isinstance(item, tuple) else item, self)
+        else:
+            self.broker.subscribe(topic, self)
+        return (MQTT_ERR_SUCCESS, 1)
+
+    def publish(self, topic, payload=None, qos=0, retain=False, *args, **kwargs):
+        self._mid += 1
+        self.broker.publish(topic, payload if payload is not None else b"")
+        if self.on_publish is not None:
+            self.on_publish(self, self.userdata, self._mid, ReasonCode(PacketTypes.PUBACK, "Success"), None)
+        return PublishResult(MQTT_ERR_SUCCESS, self._mid)
+
+    def deliver(self, message: InMemoryMessage):
+        if self.on_message is not None:
+            self.on_message(self, self.userdata, message)
+
+    def loop_start(self):
+        return MQTT_ERR_SUCCESS
+
+    def loop_stop(self, *args, **kwargs):
+        return MQTT_ERR_SUCCESS
+
+    def is_connected(self) -> bool:
+        return True
+
+    def __getattr__(self, name):
+        # Tuning calls (max_inflight_messages_set, reconnect_delay_set, ...) are no-ops here
+        if name.endswith("_set") or name.startswith("enable_"):
+            return lambda *args, **kwargs: None
+        raise AttributeError(name)
@@ -0,0 +1,41 @@
+"""
+Stand-in for the lab2 Store API used by bench_hub_http: accepts processed
+agent data (one item or a batch per request) after STORE_STUB_LATENCY seconds
+and counts the stored items.
+
+    STORE_STUB_LATENCY=0.005 uvicorn benchmarks.store_stub:app --port 8001
+"""
+import asyncio
+import os
+
+from fastapi import FastAPI, Request
+
+LATENCY = float(os.environ.get("STORE_STUB_LATENCY") or 0.005)
+
+app = FastAPI()
+stored = 0
+
+
+# Both paths: older hub versions post without the trailing slash, which lab2 redirects
+@app.post("/processed_agent_data")
+@app.post("/processed_agent_data/")
+async def create_data(request: Request):
+    global stored
+    await request.body()
+    await asyncio.sleep(LATENCY)
+    stored += 1
+    return {"status": "ok"}
+
+
+@app.post("/processed_agent_data/batch")
+async def create_data_batch(request: Request):
+    global stored
+    items = await request.json()
+    await asyncio.sleep(LATENCY)
+    stored += len(items)
+    return {"stored": len(items), "duplicates": 0}
+
+
+@app.get("/stored")
+async def get_stored():
+    return {"stored": stored}
@@ -0,0 +1,168 @@
+"""
+Codecs of the shared reading schema (common.entities) for every representation
+it takes on the way from the agent to the database:
+
+- JSON: pydantic-core for models and whole batches, and dumps_agent_data for
+  producers that hold plain values (no model is built per reading)
+- binary: fixed little-endian header + length-prefixed strings, 65 bytes plus
+  road_state and reading_key (about half the JSON size, at similar CPU cost)
+- DB row: the columns of lab2's processed_agent_data
+"""
+import struct
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from common.entities import ProcessedAgentData, ProcessedAgentDataBatch
+from common.reading_key import reading_key
+
+_INFINITY = float("inf")
+
+
+def json_number(value: float) -> str:
+    # repr is the shortest exact representation; NaN and Infinity are not valid JSON
+    if value != value or value == _INFINITY or value == -_INFINITY:
+        return "null"
+    return repr(float(value))
+
+
+def dumps_agent_data(
+    user_id: int,
+    x: float,
+    y: float,
+    z: float,
+    latitude: float,
+    longitude: float,
+    timestamp: str,
+    sequence: int = 0,
+) -> str:
+    """
+    AgentData JSON from plain values, without building a model; the same text as
+    AgentData.model_dump_json() for finite numbers. timestamp is ISO 8601.
+    """
+    return (
+        f'{{"user_id":{int(user_id)},'
+        f'"accelerometer":{{"x":{json_number(x)},"y":{json_number(y)},"z":{json_number(z)}}},'
+        f'"gps":{{"latitude":{json_number(latitude)},"longitude":{json_number(longitude)}}},'
+        f'"timestamp":"{timestamp}","sequence":{int(sequence)}}}'
+    )
+
+
+def dumps_batch_json(items: List[ProcessedAgentData]) -> bytes:
+    return ProcessedAgentDataBatch.dump_json(items)
+
+
+def loads_batch_json(data) -> List[ProcessedAgentData]:
+    return ProcessedAgentDataBatch.validate_json(data)
+
+
+# Binary: version, user_id, wall clock microseconds since 1970-01-01, UTC offset
+# in seconds (NAIVE for naive timestamps), sequence, x, y, z, latitude, longitude
+BINARY_VERSION = 1
+_HEADER = struct.Struct("<BqqiI5d")
+_NAIVE = -2 ** 31
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_VERSION_BYTE = bytes((BINARY_VERSION,))
+
+
+def _pack_string(value: Optional[str]) -> bytes:
+    # Length 0 is None; an empty string is not a valid road_state or reading key
+    encoded = value.encode() if value else b""
+    if len(encoded) > 255:
+        raise ValueError(f"String longer than 255 bytes cannot be packed: {value[:32]!r}...")
+    return bytes((len(encoded),)) + encoded
+
+
+def pack(item: ProcessedAgentData) -> bytes:
+    agent_data = item.agent_data
+    timestamp = agent_data.timestamp
+    offset = timestamp.utcoffset()
+    accelerometer = agent_data.accelerometer
+    gps = agent_data.gps
+    header = _HEADER.pack(
+        BINARY_VERSION,
+        agent_data.user_id,
+        (timestamp.replace(tzinfo=None) - _EPOCH) // _MICROSECOND,
+        _NAIVE if offset is None else int(offset.total_seconds()),
+        agent_data.sequence,
+        accelerometer.x, accelerometer.y, accelerometer.z,
+        gps.latitude, gps.longitude,
+    )
+    return header + _pack_string(item.road_state) + _pack_string(item.reading_key)
+
+
+def _unpack_from(data: bytes, position: int):
+    _, user_id, micros, offset, sequence, x, y, z, latitude, longitude = _HEADER.unpack_from(data, position)
+    position += _HEADER.size
+    strings = []
+    for _ in range(2):
+        length = data[position]
+        strings.append(data[position + 1:position + 1 + length].decode() if length else None)
+        position += 1 + length
+    timestamp = _EPOCH + timedelta(microseconds=micros)
+    if offset != _NAIVE:
+        timestamp = timestamp.replace(tzinfo=timezone.utc if offset == 0 else timezone(timedelta(seconds=offset)))
+    fields = {
+        "road_state": strings[0],
+        "agent_data": {
+            "user_id": user_id,
+            "accelerometer": {"x": x, "y": y, "z": z},
+            "gps": {"latitude": latitude, "longitude": longitude},
+            "timestamp": timestamp,
+            "sequence": sequence,
+        },
+        "reading_key": strings[1],
+    }
+    return fields, position
+
+
+def unpack(data: bytes) -> ProcessedAgentData:
+    """Decode pack() output; JSON (the format used before) is accepted too. Raises ValueError if malformed."""
+    if data[:1] != _VERSION_BYTE:
+        return ProcessedAgentData.model_validate_json(data)
+    try:
+        fields = _unpack_from(data, 0)[0]
+    except (struct.error, IndexError) as e:
+        raise ValueError(f"Truncated binary reading: {e}") from e
+    # One pydantic-core call builds the nested models, cheaper than model_construct per model
+    return ProcessedAgentData.model_validate(fields)
+
+
+def pack_batch(items: List[ProcessedAgentData]) -> bytes:
+    return b"".join(pack(item) for item in items)
+
+
+def unpack_batch(data: bytes) -> List[ProcessedAgentData]:
+    items = []
+    position = 0
+    try:
+        while position < len(data):
+            fields, position = _unpack_from(data, position)
+            items.append(fields)
+    except (struct.error, IndexError) as e:
+        raise ValueError(f"Truncated binary batch: {e}") from e
+    return ProcessedAgentDataBatch.validate_python(items)
+
+
+def to_local_naive(value: datetime) -> datetime:
+    # The store keeps timestamps as naive local time
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+
+
+def to_row(item: ProcessedAgentData) -> Dict[str, Any]:
+    """Columns of the reading; a reading posted without a key gets it from common.reading_key, as in the hub"""
+    agent_data = item.agent_data
+    accelerometer = agent_data.accelerometer
+    gps = agent_data.gps
+    return {
+        "road_state": item.road_state,
+        "x": accelerometer.x,
+        "y": accelerometer.y,
+        "z": accelerometer.z,
+        "latitude": gps.latitude,
+        "longitude": gps.longitude,
+        "timestamp": to_local_naive(agent_data.timestamp),
+        "user_id": agent_data.user_id,
+        "reading_key": item.reading_key or reading_key(agent_data.user_id, agent_data.timestamp, agent_data.sequence),
+    }
+
@@ -0,0 +1,92 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
+
+# Limits of the binary codec (common.codecs): user_id is an int64, sequence a uint32
+# and strings have a one-byte length prefix. Checked here, so a reading the codec can
+# not pack is refused on input instead of failing in the hub's buffer.
+MAX_SEQUENCE = 2 ** 32 - 1
+MAX_STRING_BYTES = 255
+
+
+class AccelerometerData(BaseModel):
+    x: float
+    y: float
+    z: float
+
+
+class GpsData(BaseModel):
+    latitude: float
+    longitude: float
+
+
+class AgentData(BaseModel):
+    """
+    One reading of a vehicle, as published by the agent (lab1), classified by the
+    edge (lab4), buffered by the hub (lab3) and stored by the store (lab2).
+    """
+    user_id: int = Field(ge=-2 ** 63, lt=2 ** 63)
+    accelerometer: AccelerometerData
+    gps: GpsData
+    # ISO 8601 in JSON; Unix seconds are accepted outside strict mode
+    timestamp: datetime
+    # Tells apart readings of one vehicle with the same timestamp (part of the reading key)
+    sequence: int = Field(0, ge=0, le=MAX_SEQUENCE)
+
+
+class WindowBounds(BaseModel):
+    start: datetime
+    end: datetime
+    count: int
+
+
+class AccelerometerSummary(BaseModel):
+    min: AccelerometerData
+    max: AccelerometerData
+    mean: AccelerometerData
+
+
+class AgentWindow(BaseModel):
+    """
+    Summary of a window of quiet readings, published by the agent's adaptive
+    sampler (lab1) on the summary topic instead of the readings themselves.
+    """
+    user_id: int
+    window: WindowBounds
+    accelerometer: AccelerometerSummary
+    # Last position in the window
+    gps: GpsData
+
+    def to_agent_data(self) -> AgentData:
+        """
+        The reading that stands for the window downstream: the mean acceleration at
+        the end of the window. Sequence 1 sets it apart from an anomaly at the end of
+        the window, which is sent as a reading of its own with the same timestamp.
+        """
+        return AgentData(
+            user_id=self.user_id,
+            accelerometer=self.accelerometer.mean,
+            gps=self.gps,
+            timestamp=self.window.end,
+            sequence=1,
+        )
+
+
+class ProcessedAgentData(BaseModel):
+    road_state: str = Field(min_length=1)
+    agent_data: AgentData
+    # Deterministic key of the reading (common.reading_key), set by the edge or the
+    # client; the hub and the store drop readings whose key they have already seen
+    reading_key: Optional[str] = None
+
+    @field_validator("road_state", "reading_key")
+    @classmethod
+    def fits_length_prefix(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None and len(value.encode()) > MAX_STRING_BYTES:
+            raise ValueError(f"must be at most {MAX_STRING_BYTES} bytes in UTF-8")
+        return value
+
+
+# Validation and serialization of a whole batch in one pydantic-core call
+ProcessedAgentDataBatch = TypeAdapter(List[ProcessedAgentData])
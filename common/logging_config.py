@@ -0,0 +1,141 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional, Union
+
+TEXT_FORMAT = "[%(asctime)s] [%(levelname)s] [%(module)s] %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, ready for log shippers."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "message": record.getMessage(),
+        }
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most `rate` records per call site (file and line) every
+    `interval` seconds. The number of dropped records is attached to the next
+    record that passes, as record.suppressed. Records above max_level are never dropped.
+    """
+
+    def __init__(self, rate: int = 10, interval: float = 1.0, max_level: int = logging.ERROR, clock=time.monotonic):
+        super().__init__()
+        self.rate = rate
+        self.interval = interval
+        self.max_level = max_level
+        self.clock = clock
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # The same record may pass several handlers sharing this filter
+        decision = getattr(record, "_rate_limit_decision", None)
+        if decision is not None:
+            return decision
+        decision = self._decide(record)
+        record._rate_limit_decision = decision
+        return decision
+
+    def _decide(self, record: logging.LogRecord) -> bool:
+        if self.rate <= 0 or record.levelno > self.max_level:
+            return True
+        key = (record.pathname, record.lineno)
+        now = self.clock()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.rate:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                return False
+        if suppressed:
+            record.suppressed = suppressed
+            record.msg = f"{record.msg} (suppressed {suppressed} similar messages)"
+        return True
+
+
+def setup_logging(
+    level: Union[int, str] = logging.INFO,
+    log_file: Optional[str] = "app.log",
+    json_format: bool = False,
+    async_mode: bool = True,
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    rate_limit: int = 10,
+    rate_interval: float = 1.0,
+) -> Optional[QueueListener]:
+    """
+    Configure the root logger.
+
+    With async_mode the caller only puts records on an in-memory queue; console
+    and file output are done by a QueueListener thread, so disk I/O is off the
+    hot path. Files are rotated at max_bytes. rate_limit caps records per call
+    site per rate_interval seconds (0 disables the limit).
+    Calling it again replaces the previous configuration.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+    formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(level)
+
+    rate_filter = RateLimitFilter(rate=rate_limit, interval=rate_interval)
+    if async_mode:
+        queue_handler = QueueHandler(queue.SimpleQueue())
+        queue_handler.addFilter(rate_filter)
+        root.addHandler(queue_handler)
+        _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+    else:
+        for handler in handlers:
+            handler.addFilter(rate_filter)
+            root.addHandler(handler)
+    return _listener
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,314 @@
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class _CellOwner:
+    """Held in a thread's local storage only: it is released when the thread ends"""
+
+    __slots__ = ("__weakref__",)
+
+
+class _ThreadCells:
+    """
+    Per-thread accumulators. Every thread only writes its own cell, so the hot
+    path needs no lock; readers sum all cells. The lock is taken once per thread,
+    when its cell is created, and once more when the thread ends: its values are
+    then folded into a base cell, so short-lived threads (a thread per request or
+    per scrape) do not leave a cell behind each.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._local = threading.local()
+        self._cells: List[List[float]] = []
+        # Totals of the threads that have ended
+        self._base = [0.0] * size
+        self._lock = threading.Lock()
+
+    def cell(self) -> List[float]:
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = [0.0] * self.size
+            owner = _CellOwner()
+            with self._lock:
+                self._cells.append(cell)
+            weakref.finalize(owner, self._retire, cell)
+            self._local.owner = owner
+            self._local.cell = cell
+            return cell
+
+    def _retire(self, cell: List[float]) -> None:
+        # The thread has ended, nothing writes the cell any more
+        with self._lock:
+            for i, value in enumerate(cell):
+                self._base[i] += value
+            for i, live in enumerate(self._cells):
+                if live is cell:
+                    del self._cells[i]
+                    break
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            cells = list(self._cells)
+            totals = list(self._base)
+        for cell in cells:
+            for i, value in enumerate(cell):
+                totals[i] += value
+        return totals
+
+
+def _format_labels(labels: Dict[str, str], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels.items())
+    if extra is not None:
+        items.append(extra)
+    if not items:
+        return ""
+    body = ",".join(f'{key}="{value}"' for key, value in items)
+    return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels or {}
+        self._cells = _ThreadCells(1)
+
+    def inc(self, amount: float = 1) -> None:
+        self._cells.cell()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._cells.totals()[0]
+
+    def samples(self) -> Iterable[str]:
+        yield f"{self.name}{_format_labels(self.labels)} {_format_value(self.value)}"
+
+
+class Gauge:
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels or {}
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the value from function at scrape time, e.g. a queue length."""
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            try:
+                return float(self._function())
+            except Exception:
+                return float("nan")
+        return self._value
+
+    def samples(self) -> Iterable[str]:
+        yield f"{self.name}{_format_labels(self.labels)} {_format_value(self.value)}"
+
+
+class Histogram:
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Optional[Dict[str, str]] = None,
+        buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels or {}
+        self.buckets = tuple(sorted(buckets))
+        # Cell layout: one slot per bucket, +Inf slot, sum, count
+        self._cells = _ThreadCells(len(self.buckets) + 3)
+
+    def observe(self, value: float) -> None:
+        cell = self._cells.cell()
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    @property
+    def count(self) -> float:
+        return self._cells.totals()[-1]
+
+    @property
+    def sum(self) -> float:
+        return self._cells.totals()[-2]
+
+    def samples(self) -> Iterable[str]:
+        totals = self._cells.totals()
+        cumulative = 0.0
+        for i, bound in enumerate(self.buckets + (float("inf"),)):
+            cumulative += totals[i]
+            yield (
+                f"{self.name}_bucket{_format_labels(self.labels, ('le', _format_value(bound)))} "
+                f"{_format_value(cumulative)}"
+            )
+        yield f"{self.name}_sum{_format_labels(self.labels)} {_format_value(totals[-2])}"
+        yield f"{self.name}_count{_format_labels(self.labels)} {_format_value(totals[-1])}"
+
+
+class MetricsRegistry:
+    """Keeps metrics by name and label set and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_class, name, documentation, labels, **kwargs):
+        key = (name, tuple(sorted((labels or {}).items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = metric_class(name, documentation, labels=labels, **kwargs)
+                    self._metrics[key] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Optional[Dict[str, str]] = None) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labels)
+
+    def gauge(self, name: str, documentation: str, labels: Optional[Dict[str, str]] = None) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labels)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Optional[Dict[str, str]] = None,
+        buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labels, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.items(), key=lambda item: item[0])
+        lines = []
+        described = set()
+        for (name, _), metric in metrics:
+            if name not in described:
+                lines.append(f"# HELP {name} {metric.documentation}")
+                lines.append(f"# TYPE {name} {metric.type_name}")
+                described.add(name)
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# Default registry shared by the whole process
+REGISTRY = MetricsRegistry()
+
+
+class RateLimitedReporter:
+    """
+    Replacement for per-message console output: emits one summary line
+    at most once every interval seconds.
+    """
+
+    def __init__(self, interval: float = 10.0, emit: Callable[[str], None] = print, clock=time.monotonic):
+        self.interval = interval
+        self.emit = emit
+        self.clock = clock
+        self._last_report = clock()
+        self._lock = threading.Lock()
+
+    def maybe_report(self, summary: Callable[[float], str]) -> bool:
+        """
+        Call summary(elapsed_seconds) and emit its result if the interval has passed.
+        summary is not called at all otherwise, so building the message costs nothing.
+        """
+        now = self.clock()
+        if now - self._last_report < self.interval:
+            return False
+        with self._lock:
+            elapsed = now - self._last_report
+            if elapsed < self.interval:
+                return False
+            self._last_report = now
+        self.emit(summary(elapsed))
+        return True
+
+
+class CounterRate:
+    """Reports how much a counter grew since the previous call."""
+
+    def __init__(self, counter: Counter):
+        self.counter = counter
+        self._previous = counter.value
+
+    def delta(self) -> float:
+        current = self.counter.value
+        delta, self._previous = current - self._previous, current
+        return delta
+
+
+def start_http_server(port: int, host: str = "0.0.0.0", registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve registry on http://host:port/metrics from a daemon thread (for services without FastAPI)."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    return server
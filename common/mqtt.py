@@ -0,0 +1,179 @@
+import logging
+from typing import Callable, Dict, Optional, Union
+
+import paho.mqtt.client as mqtt
+
+from common.metrics import REGISTRY
+
+
+def parse_qos(spec: Optional[str]) -> Dict[str, int]:
+    """Parse "topic=1,other/#=0" into {topic filter: QoS}."""
+    qos = {}
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        topic, _, value = item.rpartition("=")
+        if not topic or value not in ("0", "1", "2"):
+            raise ValueError(f"Invalid MQTT QoS setting {item!r}, expected topic=0|1|2")
+        qos[topic] = int(value)
+    return qos
+
+
+class TopicQos:
+    """QoS per topic filter with a default for other topics; lookups are cached per topic."""
+
+    def __init__(self, default_qos: int = 1, qos: Union[str, Dict[str, int], None] = None):
+        self.default_qos = default_qos
+        self.qos = parse_qos(qos) if isinstance(qos, str) else (qos or {})
+        self._cache: Dict[str, int] = {}
+
+    def __call__(self, topic: str) -> int:
+        qos = self._cache.get(topic)
+        if qos is None:
+            qos = self.default_qos
+            for topic_filter, value in self.qos.items():
+                if topic_filter == topic or mqtt.topic_matches_sub(topic_filter, topic):
+                    qos = value
+                    break
+            self._cache[topic] = qos
+        return qos
+
+
+class ClientMetrics:
+    """mqtt_* metrics of one client, shared by the threaded and the asyncio client."""
+
+    def __init__(self, name: str):
+        labels = {"client": name}
+        self.published = REGISTRY.counter("mqtt_messages_published_total", "Messages accepted for publishing", labels)
+        self.publish_failures = REGISTRY.counter(
+            "mqtt_publish_failures_total", "Publishes rejected (queue full or connection error)", labels
+        )
+        self.received = REGISTRY.counter("mqtt_messages_received_total", "Messages received", labels)
+        self.connects = REGISTRY.counter("mqtt_connects_total", "Successful connects and reconnects", labels)
+        self.connected = REGISTRY.gauge("mqtt_connected", "1 if the client is connected", labels)
+
+
+class MqttClient:
+    """
+    paho client (callback API v2) with the settings every service uses:
+
+    - QoS per topic filter (qos, a dict or "topic=1,other/#=0") with default_qos
+      for other topics, for both publish and subscribe
+    - at most max_inflight unacknowledged QoS>0 messages and max_queued waiting
+      ones; further publishes fail instead of growing memory without limit
+    - connect_async + loop_start: a failed first connect and every lost
+      connection are retried with exponential backoff between
+      reconnect_min_delay and reconnect_max_delay seconds, and all
+      subscriptions are renewed on every connect
+    - no retained messages unless asked for
+    - a persistent session (broker keeps QoS>0 messages while disconnected)
+      when client_id is given, a clean one otherwise
+    - mqtt_* metrics labelled with name
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 1883,
+        name: str = "mqtt",
+        client_id: str = "",
+        keepalive: int = 60,
+        default_qos: int = 1,
+        qos: Union[str, Dict[str, int], None] = None,
+        max_inflight: int = 20,
+        max_queued: int = 10000,
+        reconnect_min_delay: float = 1,
+        reconnect_max_delay: float = 60,
+    ):
+        self.host = host
+        self.port = port
+        self.name = name
+        self.keepalive = keepalive
+        self.qos_for = TopicQos(default_qos, qos)
+        self.subscriptions: Dict[str, int] = {}
+        self._on_message: Optional[Callable] = None
+        self.on_connected: Optional[Callable[["MqttClient"], None]] = None
+
+        self.metrics = ClientMetrics(name)
+
+        self.client = mqtt.Client(
+            mqtt.CallbackAPIVersion.VERSION2,
+            client_id=client_id,
+            clean_session=not client_id,
+        )
+        self.client.max_inflight_messages_set(max_inflight)
+        self.client.max_queued_messages_set(max_queued)
+        self.client.reconnect_delay_set(min_delay=reconnect_min_delay, max_delay=reconnect_max_delay)
+        self.client.on_connect = self._handle_connect
+        self.client.on_connect_fail = self._handle_connect_fail
+        self.client.on_disconnect = self._handle_disconnect
+        self.client.on_message = self._handle_message
+
+    @property
+    def on_message(self) -> Optional[Callable]:
+        return self._on_message
+
+    @on_message.setter
+    def on_message(self, callback: Callable) -> None:
+        """callback(client, userdata, message), the same for both paho callback API versions"""
+        self._on_message = callback
+
+    def connect(self) -> None:
+        """Start connecting in the background; never raises on an unreachable broker."""
+        logging.info(f"MQTT {self.name}: connecting to {self.host}:{self.port}")
+        self.client.connect_async(self.host, self.port, self.keepalive)
+        self.client.loop_start()
+
+    def stop(self) -> None:
+        self.client.disconnect()
+        self.client.loop_stop()
+        self.metrics.connected.set(0)
+
+    def is_connected(self) -> bool:
+        return self.client.is_connected()
+
+    def subscribe(self, topic: str, qos: Optional[int] = None) -> None:
+        """Subscribe now if connected and again after every reconnect."""
+        self.subscriptions[topic] = self.qos_for(topic) if qos is None else qos
+        if self.client.is_connected():
+            self.client.subscribe(topic, self.subscriptions[topic])
+
+    def publish(self, topic: str, payload, qos: Optional[int] = None, retain: bool = False) -> bool:
+        """
+        Returns True if the message was sent or queued. QoS>0 messages published
+        while disconnected are queued (up to max_queued) and sent after reconnect.
+        """
+        qos = self.qos_for(topic) if qos is None else qos
+        result = self.client.publish(topic, payload, qos=qos, retain=retain)
+        if result.rc == mqtt.MQTT_ERR_SUCCESS or (result.rc == mqtt.MQTT_ERR_NO_CONN and qos > 0):
+            self.metrics.published.inc()
+            return True
+        self.metrics.publish_failures.inc()
+        return False
+
+    def _handle_connect(self, client, userdata, flags, reason_code, properties=None):
+        if reason_code.is_failure:
+            # paho keeps retrying with backoff
+            logging.error(f"MQTT {self.name}: failed to connect to {self.host}:{self.port}: {reason_code}")
+            return
+        logging.info(f"MQTT {self.name}: connected to {self.host}:{self.port}")
+        self.metrics.connects.inc()
+        self.metrics.connected.set(1)
+        if self.subscriptions:
+            client.subscribe([(topic, qos) for topic, qos in self.subscriptions.items()])
+        if self.on_connected is not None:
+            self.on_connected(self)
+
+    def _handle_connect_fail(self, client, userdata):
+        logging.warning(f"MQTT {self.name}: {self.host}:{self.port} is unreachable, retrying")
+
+    def _handle_disconnect(self, client, userdata, flags, reason_code, properties=None):
+        self.metrics.connected.set(0)
+        if reason_code != 0:
+            logging.warning(f"MQTT {self.name}: connection lost ({reason_code}), reconnecting")
+
+    def _handle_message(self, client, userdata, message):
+        self.metrics.received.inc()
+        if self._on_message is not None:
+            self._on_message(client, userdata, message)
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Union
+
+import aiomqtt
+
+from common.mqtt import ClientMetrics, TopicQos
+
+
+class AsyncMqttClient:
+    """
+    asyncio counterpart of common.mqtt.MqttClient on aiomqtt, for services that
+    run everything on one event loop. Same settings and mqtt_* metrics:
+
+    - QoS per topic filter with default_qos for other topics
+    - at most max_inflight unacknowledged and max_queued waiting outgoing messages
+    - run() reconnects with exponential backoff between reconnect_min_delay and
+      reconnect_max_delay seconds and renews all subscriptions on every connect
+    - a persistent session when client_id is given
+
+    Received messages are passed to on_message(message) one at a time, in order.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 1883,
+        name: str = "mqtt",
+        client_id: str = "",
+        keepalive: int = 60,
+        default_qos: int = 1,
+        qos: Union[str, Dict[str, int], None] = None,
+        max_inflight: int = 20,
+        max_queued: int = 10000,
+        reconnect_min_delay: float = 1,
+        reconnect_max_delay: float = 60,
+    ):
+        self.host = host
+        self.port = port
+        self.name = name
+        self.client_id = client_id
+        self.keepalive = keepalive
+        self.qos_for = TopicQos(default_qos, qos)
+        self.max_inflight = max_inflight
+        self.max_queued = max_queued
+        self.reconnect_min_delay = reconnect_min_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.subscriptions: Dict[str, int] = {}
+        self.on_message: Optional[Callable[[aiomqtt.Message], Awaitable[None]]] = None
+        self.metrics = ClientMetrics(name)
+        self._client: Optional[aiomqtt.Client] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def is_connected(self) -> bool:
+        return self._client is not None
+
+    def subscribe(self, topic: str, qos: Optional[int] = None) -> None:
+        """Subscribe on the next connect and after every reconnect."""
+        self.subscriptions[topic] = self.qos_for(topic) if qos is None else qos
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run(), name=f"mqtt-{self.name}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def publish(self, topic: str, payload, qos: Optional[int] = None, retain: bool = False) -> bool:
+        """Returns True once the broker has the message (QoS>0) or it was sent (QoS 0)."""
+        client = self._client
+        if client is None:
+            self.metrics.publish_failures.inc()
+            return False
+        try:
+            await client.publish(topic, payload, qos=self.qos_for(topic) if qos is None else qos, retain=retain)
+        except aiomqtt.MqttError as e:
+            logging.error(f"MQTT {self.name}: failed to publish to {topic}: {e}")
+            self.metrics.publish_failures.inc()
+            return False
+        self.metrics.published.inc()
+        return True
+
+    async def run(self) -> None:
+        delay = self.reconnect_min_delay
+        while True:
+            client = aiomqtt.Client(
+                self.host,
+                self.port,
+                identifier=self.client_id or None,
+                clean_session=not self.client_id,
+                keepalive=self.keepalive,
+                max_inflight_messages=self.max_inflight,
+                max_queued_outgoing_messages=self.max_queued,
+            )
+            try:
+                async with client:
+                    logging.info(f"MQTT {self.name}: connected to {self.host}:{self.port}")
+                    self.metrics.connects.inc()
+                    self.metrics.connected.set(1)
+                    delay = self.reconnect_min_delay
+                    if self.subscriptions:
+                        await client.subscribe([(topic, qos) for topic, qos in self.subscriptions.items()])
+                    self._client = client
+                    async for message in client.messages:
+                        self.metrics.received.inc()
+                        if self.on_message is None:
+                            continue
+                        try:
+                            await self.on_message(message)
+                        except Exception as e:
+                            logging.error(f"MQTT {self.name}: error handling message from {message.topic}: {e}")
+            except aiomqtt.MqttError as e:
+                logging.warning(f"MQTT {self.name}: {self.host}:{self.port} unavailable ({e}), retrying in {delay:.0f}s")
+            finally:
+                self._client = None
+                self.metrics.connected.set(0)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.reconnect_max_delay)
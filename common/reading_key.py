@@ -0,0 +1,17 @@
+from datetime import datetime, timedelta, timezone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def reading_key(user_id: int, timestamp: datetime, sequence: int = 0) -> str:
+    """
+    Deterministic key of a reading, "<user_id>:<microseconds since the epoch>:<sequence>".
+    The same reading always gets the same key, so every stage can retry a delivery
+    and the store drops the copies. sequence tells apart readings of one vehicle
+    with the same timestamp. Naive timestamps are taken as UTC, so the key does not
+    depend on the time zone of the service computing it.
+    """
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return f"{user_id}:{(timestamp - EPOCH) // ONE_MICROSECOND}:{sequence}"
@@ -0,0 +1,121 @@
+from typing import List, Union
+
+from lab1.src.domain.accelerometer import Accelerometer
+from lab1.src.domain.aggregated_data import AggregatedData
+from lab1.src.domain.aggregated_window import AggregatedWindow
+
+# Дисперсія (сума по осях) вікна, вище якої дорога вважається нерівною, у відліках² (1g ≈ 16384 відліки)
+VARIANCE_THRESHOLD = 1_000_000.0
+# Відхилення показу від середнього вікна по будь-якій осі, яке вважається аномалією, у відліках
+ANOMALY_THRESHOLD = 4000.0
+
+
+class AdaptiveSampler:
+    """
+    Адаптивна частота відправки показів.
+
+    Покази групуються у вікна по window_size. Поки дорога спокійна, покази вікна
+    накопичуються і замість них відправляється одне зведення (AggregatedWindow);
+    покази, що відхиляються від середнього вікна більше ніж на anomaly_threshold,
+    відправляються окремо. Якщо дисперсія вікна перевищує variance_threshold,
+    відправляються всі покази цього вікна, а наступні відправляються одразу,
+    доки hold_windows вікон поспіль не будуть спокійними.
+    """
+
+    def __init__(
+        self,
+        window_size: int = 20,
+        variance_threshold: float = VARIANCE_THRESHOLD,
+        anomaly_threshold: float = ANOMALY_THRESHOLD,
+        hold_windows: int = 2,
+    ):
+        self.window_size = window_size
+        self.variance_threshold = variance_threshold
+        self.anomaly_threshold = anomaly_threshold
+        self.hold_windows = hold_windows
+        # Кількість вікон, які ще відправляються повністю після нерівного
+        self.raw_windows_left = 0
+        self.window: List[AggregatedData] = []
+        self._reset_stats()
+
+    @property
+    def raw_mode(self) -> bool:
+        return self.raw_windows_left > 0
+
+    def _reset_stats(self):
+        self.count = 0
+        self.sums = [0.0, 0.0, 0.0]
+        self.squares = [0.0, 0.0, 0.0]
+        self.minimum = [float("inf")] * 3
+        self.maximum = [float("-inf")] * 3
+        self.first = None
+        self.last = None
+
+    def add(self, data: AggregatedData) -> List[Union[AggregatedData, AggregatedWindow]]:
+        """Додає показ; повертає повідомлення, які потрібно відправити зараз"""
+        accelerometer = data.accelerometer
+        sums, squares, minimum, maximum = self.sums, self.squares, self.minimum, self.maximum
+        for axis, value in enumerate((accelerometer.x, accelerometer.y, accelerometer.z)):
+            sums[axis] += value
+            squares[axis] += value * value
+            if value < minimum[axis]:
+                minimum[axis] = value
+            if value > maximum[axis]:
+                maximum[axis] = value
+        self.count += 1
+        if self.first is None:
+            self.first = data
+        self.last = data
+
+        if self.raw_mode:
+            messages = [data]
+        else:
+            self.window.append(data)
+            messages = []
+        if self.count >= self.window_size:
+            messages.extend(self._close_window())
+        return messages
+
+    def flush(self) -> List[Union[AggregatedData, AggregatedWindow]]:
+        """Закриває неповне вікно, наприклад перед зупинкою"""
+        if self.count == 0:
+            return []
+        return self._close_window()
+
+    def _close_window(self) -> List[Union[AggregatedData, AggregatedWindow]]:
+        count = self.count
+        mean = [total / count for total in self.sums]
+        variance = sum(
+            max(square / count - average * average, 0.0) for square, average in zip(self.squares, mean)
+        )
+        noisy = variance > self.variance_threshold
+        window, self.window = self.window, []
+        messages: List[Union[AggregatedData, AggregatedWindow]] = []
+
+        if noisy and not self.raw_mode:
+            # Вікно виявилось нерівним: відправляємо всі накопичені покази
+            messages = window
+        elif window:
+            # Спокійне вікно: зведення та аномальні покази
+            messages = [
+                data for data in window
+                if abs(data.accelerometer.x - mean[0]) > self.anomaly_threshold
+                or abs(data.accelerometer.y - mean[1]) > self.anomaly_threshold
+                or abs(data.accelerometer.z - mean[2]) > self.anomaly_threshold
+            ]
+            messages.append(AggregatedWindow(
+                start=self.first.time,
+                end=self.last.time,
+                count=count,
+                minimum=Accelerometer(*self.minimum),
+                maximum=Accelerometer(*self.maximum),
+                mean=Accelerometer(*mean),
+                gps=self.last.gps,
+            ))
+
+        if noisy:
+            self.raw_windows_left = self.hold_windows
+        elif self.raw_windows_left:
+            self.raw_windows_left -= 1
+        self._reset_stats()
+        return messages
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Accelerometer:
-    x: int
-    y: int
-    z: int
\ No newline at end of file
+    x: float
+    y: float
+    z: float
@@ -5,8 +5,8 @@ from lab1.src.domain.accelerometer import Accelerometer
 from lab1.src.domain.gps import Gps
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class AggregatedData:
     accelerometer: Accelerometer
     gps: Gps
-    time: datetime
\ No newline at end of file
+    time: datetime
@@ -0,0 +1,51 @@
+from array import array
+from datetime import datetime
+
+from lab1.src.domain.accelerometer import Accelerometer
+from lab1.src.domain.aggregated_data import AggregatedData
+from lab1.src.domain.gps import Gps
+
+
+class AggregatedDataBatch:
+    """
+    Пакет показів у вигляді колонок (struct-of-arrays): кожне поле зберігається
+    в окремому масиві double, тож один показ займає 48 байт замість трьох об'єктів та datetime.
+    """
+
+    __slots__ = ("x", "y", "z", "longitude", "latitude", "time")
+
+    def __init__(self):
+        self.x = array("d")
+        self.y = array("d")
+        self.z = array("d")
+        self.longitude = array("d")
+        self.latitude = array("d")
+        # Unix timestamp у секундах
+        self.time = array("d")
+
+    def append(self, x: float, y: float, z: float, longitude: float, latitude: float, time: float) -> None:
+        self.x.append(x)
+        self.y.append(y)
+        self.z.append(z)
+        self.longitude.append(longitude)
+        self.latitude.append(latitude)
+        self.time.append(time)
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def __getitem__(self, index: int) -> AggregatedData:
+        return AggregatedData(
+            accelerometer=Accelerometer(x=self.x[index], y=self.y[index], z=self.z[index]),
+            gps=Gps(longitude=self.longitude[index], latitude=self.latitude[index]),
+            time=datetime.fromtimestamp(self.time[index]),
+        )
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.itemsize * len(column) for column in (
+            self.x, self.y, self.z, self.longitude, self.latitude, self.time
+        ))
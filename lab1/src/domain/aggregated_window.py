@@ -0,0 +1,17 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from lab1.src.domain.accelerometer import Accelerometer
+from lab1.src.domain.gps import Gps
+
+
+@dataclass(frozen=True, slots=True)
+class AggregatedWindow:
+    """Зведення вікна спокійних показів: min/max/mean по кожній осі та остання позиція GPS"""
+    start: datetime
+    end: datetime
+    count: int
+    minimum: Accelerometer
+    maximum: Accelerometer
+    mean: Accelerometer
+    gps: Gps
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Gps:
     longitude: float
-    latitude: float
\ No newline at end of file
+    latitude: float
@@ -1,8 +1,10 @@
 from csv import reader
 from datetime import datetime
+from time import time
 
 from lab1.src.domain.accelerometer import Accelerometer
 from lab1.src.domain.aggregated_data import AggregatedData
+from lab1.src.domain.aggregated_data_batch import AggregatedDataBatch
 from lab1.src.domain.gps import Gps
 
 
@@ -57,6 +59,35 @@ class FileDatasource:
             # Рекурсивно викликаємо метод знову для читання першого рядка
             return self.read()
 
+    def read_batch(self, size: int) -> AggregatedDataBatch:
+        """
+        Метод повертає пакет з size показів у колонковому вигляді без створення
+        проміжних об'єктів для кожного показу.
+        Якщо досягнуто кінця файлу, файл починає читатись заново з початку.
+
+        Returns:
+            AggregatedDataBatch: пакет агрегованих даних з датчиків
+        """
+        if self.accelerometer_reader is None or self.gps_reader is None:
+            raise ValueError("Спочатку викличте startReading() перед читанням даних")
+
+        batch = AggregatedDataBatch()
+        # Спільний час показів пакета; dumps_batch розрізняє їх номером у пакеті (sequence)
+        now = time()
+        while len(batch) < size:
+            try:
+                accel_row = next(self.accelerometer_reader)
+                gps_row = next(self.gps_reader)
+            except StopIteration:
+                self.stopReading()
+                self.startReading()
+                continue
+            batch.append(
+                float(accel_row[0]), float(accel_row[1]), float(accel_row[2]),
+                float(gps_row[1]), float(gps_row[0]), now,
+            )
+        return batch
+
     def startReading(self, *args, **kwargs):
         """
         Метод повинен викликатись перед початком читання даних.
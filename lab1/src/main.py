@@ -1,34 +1,96 @@
 import os
 import time
-import json
+from common.metrics import REGISTRY, CounterRate, RateLimitedReporter, start_http_server
+from common.mqtt import MqttClient
+from lab1.src.adaptive_sampler import ANOMALY_THRESHOLD, VARIANCE_THRESHOLD, AdaptiveSampler
 from lab1.src.domain.aggregated_data import AggregatedData
+from lab1.src.domain.aggregated_data_batch import AggregatedDataBatch
+from lab1.src.domain.aggregated_window import AggregatedWindow
 from lab1.src.file_datasource import FileDatasource
-from lab1.src.shema.aggregated_data_schema import AggregatedDataSchema
-import paho.mqtt.client as mqtt
+from lab1.src.shema.fast_serializer import dumps_aggregated_data, dumps_batch, dumps_window
 
 # Конфігурація змінних середовища
 MQTT_BROKER_HOST = os.getenv("MQTT_BROKER_HOST", "localhost")
 MQTT_BROKER_PORT = int(os.getenv("MQTT_BROKER_PORT", 1883))
 MQTT_TOPIC = os.getenv("MQTT_TOPIC", "agent_data_topic")
+# Ідентифікатор транспортного засобу (user_id спільної схеми AgentData)
+USER_ID = int(os.getenv("USER_ID", 1))
 DELAY = float(os.getenv("DELAY", 0.1))
+# Порт для /metrics (0 - вимкнено) та інтервал зведення в консолі, секунд
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9100))
+REPORT_INTERVAL = float(os.getenv("REPORT_INTERVAL", 10))
+# Адаптивна відправка: зведення вікон спокійних показів у MQTT_SUMMARY_TOPIC,
+# сирі покази при перевищенні порогу дисперсії та всі аномалії.
+# Edge (lab4) передає кожне зведення далі як один показ (середнє вікна), тому
+# окремі спокійні покази до сховища не доходять
+ADAPTIVE_SAMPLING = os.getenv("ADAPTIVE_SAMPLING", "false").lower() == "true"
+ADAPTIVE_WINDOW_SIZE = int(os.getenv("ADAPTIVE_WINDOW_SIZE", 20))
+ADAPTIVE_VARIANCE_THRESHOLD = float(os.getenv("ADAPTIVE_VARIANCE_THRESHOLD", VARIANCE_THRESHOLD))
+ADAPTIVE_ANOMALY_THRESHOLD = float(os.getenv("ADAPTIVE_ANOMALY_THRESHOLD", ANOMALY_THRESHOLD))
+ADAPTIVE_HOLD_WINDOWS = int(os.getenv("ADAPTIVE_HOLD_WINDOWS", 2))
+MQTT_SUMMARY_TOPIC = os.getenv("MQTT_SUMMARY_TOPIC", f"{MQTT_TOPIC}/summary")
+# Налаштування MQTT клієнта (common.mqtt.MqttClient): QoS по топіках у вигляді "topic=1,other/#=0"
+# (MQTT_DEFAULT_QOS для решти), ліміти неопублікованих QoS>0 повідомлень та затримки перепідключення, секунд.
+# Непорожній MQTT_CLIENT_ID дає постійну сесію
+MQTT_CLIENT_ID = os.getenv("MQTT_CLIENT_ID", "")
+MQTT_CLIENT_SETTINGS = dict(
+    keepalive=int(os.getenv("MQTT_KEEPALIVE", 60)),
+    default_qos=int(os.getenv("MQTT_DEFAULT_QOS", 1)),
+    qos=os.getenv("MQTT_QOS", ""),
+    max_inflight=int(os.getenv("MQTT_MAX_INFLIGHT", 20)),
+    max_queued=int(os.getenv("MQTT_MAX_QUEUED", 10000)),
+    reconnect_min_delay=float(os.getenv("MQTT_RECONNECT_MIN_DELAY", 1)),
+    reconnect_max_delay=float(os.getenv("MQTT_RECONNECT_MAX_DELAY", 60)),
+)
+
+# Метрики агента
+MESSAGES_OUT = REGISTRY.counter("agent_messages_out_total", "Messages published to MQTT")
+ERRORS = REGISTRY.counter("agent_errors_total", "Failed reads and publishes")
+READINGS = REGISTRY.counter("agent_readings_total", "Readings passed to the adaptive sampler")
+SUMMARIES_OUT = REGISTRY.counter("agent_summaries_out_total", "Window summaries published instead of raw readings")
+RAW_MODE = REGISTRY.gauge("agent_raw_mode", "1 if the adaptive sampler sends every reading")
+READ_LATENCY = REGISTRY.histogram(
+    "agent_stage_latency_seconds", "Latency of a pipeline stage", labels={"stage": "read"}
+)
+SERIALIZE_LATENCY = REGISTRY.histogram(
+    "agent_stage_latency_seconds", "Latency of a pipeline stage", labels={"stage": "serialize"}
+)
+PUBLISH_LATENCY = REGISTRY.histogram(
+    "agent_stage_latency_seconds", "Latency of a pipeline stage", labels={"stage": "publish"}
+)
 
 
 class DataAggregator:
-    def __init__(self, broker_host, broker_port, topic):
-        # Налаштування MQTT клієнта
-        self.mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    def __init__(self, broker_host, broker_port, topic, sampler: AdaptiveSampler = None, summary_topic=None,
+                 client_id="", mqtt_settings=None, user_id: int = 1):
+        # Налаштування MQTT клієнта: QoS, ліміти черги, перепідключення з backoff та метрики mqtt_*
+        self.mqtt_client = MqttClient(
+            broker_host, broker_port, name="agent", client_id=client_id, **(mqtt_settings or {})
+        )
         self.broker_host = broker_host
         self.broker_port = broker_port
         self.topic = topic
-        self.schema = AggregatedDataSchema()
+        # Покази публікуються у спільній схемі AgentData (common.entities) з user_id цього агента
+        self.user_id = user_id
+        # Покази з однаковим часом нумеруються (sequence), щоб кожен мав власний reading_key
+        self.last_time = None
+        self.last_sequence = 0
+        # Адаптивна відправка (publish_sampled), зведення йдуть в окремий топік
+        self.sampler = sampler
+        self.summary_topic = summary_topic or f"{topic}/summary"
         self.is_connected = False
+        # Зведення в консоль замість виводу кожного повідомлення
+        self.reporter = RateLimitedReporter(REPORT_INTERVAL)
+        self.published_rate = CounterRate(MESSAGES_OUT)
+        self.errors_rate = CounterRate(ERRORS)
 
     def connect_to_broker(self):
+        # Підключення у фоні: недоступний брокер не зупиняє агента, клієнт перепідключається сам,
+        # а QoS>0 повідомлення чекають у черзі
         try:
-            self.mqtt_client.connect(self.broker_host, self.broker_port, 60)
-            self.mqtt_client.loop_start()
+            self.mqtt_client.connect()
             self.is_connected = True
-            print(f"Підключено до MQTT брокера {self.broker_host}:{self.broker_port}")
+            print(f"Підключення до MQTT брокера {self.broker_host}:{self.broker_port}")
             return True
         except Exception as e:
             print(f"Помилка підключення до MQTT брокера: {e}")
@@ -37,35 +99,92 @@ class DataAggregator:
 
     def publish_data(self, data: AggregatedData):
         if not self.is_connected:
-            print("MQTT клієнт не підключено, дані не опубліковано")
+            # Дані не опубліковано - враховуємо в зведенні замість виводу на кожне повідомлення
+            ERRORS.inc()
+            self.report()
             return False
 
-        # Серіалізуємо дані в JSON
-        json_data = self.schema.dumps(data)
-
-        # Виведення даних у зручному для читання форматі
-        parsed_data = json.loads(json_data)
-        print(f"Час: {parsed_data.get('time', 'невідомо')}")
-        print("Акселерометр:")
-        accel = parsed_data.get('accelerometer', {})
-        print(f"  X: {accel.get('x', 'невідомо')}")
-        print(f"  Y: {accel.get('y', 'невідомо')}")
-        print(f"  Z: {accel.get('z', 'невідомо')}")
-        print("GPS:")
-        gps = parsed_data.get('gps', {})
-        print(f"  Довгота: {gps.get('longitude', 'невідомо')}")
-        print(f"  Широта: {gps.get('latitude', 'невідомо')}")
-        print("--------------------------------------\n")
+        # Серіалізуємо дані в JSON напряму, без створення моделі
+        with SERIALIZE_LATENCY.time():
+            json_data = dumps_aggregated_data(data, self.user_id, self.next_sequence(data.time))
+
+        return self._publish(json_data)
+
+    def next_sequence(self, time) -> int:
+        """Номер показу серед опублікованих поспіль показів з тим самим часом"""
+        if time == self.last_time:
+            self.last_sequence += 1
+        else:
+            self.last_time = time
+            self.last_sequence = 0
+        return self.last_sequence
+
+    def publish_batch(self, batch: AggregatedDataBatch):
+        """Публікує кожен показ пакета окремим повідомленням; повертає кількість опублікованих"""
+        if not self.is_connected:
+            ERRORS.inc(len(batch))
+            self.report()
+            return 0
+
+        with SERIALIZE_LATENCY.time():
+            messages = dumps_batch(batch, self.user_id)
+
+        return sum(self._publish(json_data) for json_data in messages)
 
+    def publish_sampled(self, data: AggregatedData) -> int:
+        """Передає показ адаптивному семплеру та публікує те, що він повернув; повертає кількість опублікованих"""
+        READINGS.inc()
+        return self._publish_messages(self.sampler.add(data))
+
+    def flush_sampled(self) -> int:
+        """Публікує зведення неповного вікна семплера"""
+        return self._publish_messages(self.sampler.flush())
+
+    def _publish_messages(self, messages) -> int:
+        RAW_MODE.set(1 if self.sampler.raw_mode else 0)
+        if not messages:
+            return 0
+        if not self.is_connected:
+            ERRORS.inc(len(messages))
+            self.report()
+            return 0
+
+        published = 0
+        for message in messages:
+            if isinstance(message, AggregatedWindow):
+                with SERIALIZE_LATENCY.time():
+                    json_data = dumps_window(message, self.user_id)
+                if self._publish(json_data, self.summary_topic):
+                    SUMMARIES_OUT.inc()
+                    published += 1
+            else:
+                with SERIALIZE_LATENCY.time():
+                    json_data = dumps_aggregated_data(message, self.user_id, self.next_sequence(message.time))
+                published += self._publish(json_data)
+        return published
+
+    def _publish(self, json_data: str, topic: str = None) -> bool:
         # Публікуємо дані в MQTT топік
-        result = self.mqtt_client.publish(self.topic, json_data)
-        if result.rc == mqtt.MQTT_ERR_SUCCESS:
-            print(f"Дані опубліковано в топік {self.topic}")
+        with PUBLISH_LATENCY.time():
+            published = self.mqtt_client.publish(topic or self.topic, json_data)
+        if published:
+            MESSAGES_OUT.inc()
+            self.report()
             return True
         else:
-            print(f"Помилка публікації даних: {result}")
+            # Черга клієнта заповнена або немає з'єднання (QoS 0)
+            ERRORS.inc()
+            self.report()
             return False
 
+    def report(self):
+        self.reporter.maybe_report(
+            lambda elapsed: (
+                f"Опубліковано в топік {self.topic}: {self.published_rate.delta():.0f} повідомлень "
+                f"за {elapsed:.0f} с, помилок: {self.errors_rate.delta():.0f}"
+            )
+        )
+
 
 def main():
     # Шляхи до файлів відносно робочої директорії
@@ -78,11 +197,26 @@ def main():
             print(f"Помилка: файл {file_path} не знайдено!")
             return
 
+    # Запускаємо HTTP сервер з метриками
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT)
+
     # Ініціалізуємо джерело даних
     data_source = FileDatasource(accelerometer_file, gps_file)
 
     # Ініціалізуємо агрегатор даних
-    aggregator = DataAggregator(MQTT_BROKER_HOST, MQTT_BROKER_PORT, MQTT_TOPIC)
+    sampler = None
+    if ADAPTIVE_SAMPLING:
+        sampler = AdaptiveSampler(
+            window_size=ADAPTIVE_WINDOW_SIZE,
+            variance_threshold=ADAPTIVE_VARIANCE_THRESHOLD,
+            anomaly_threshold=ADAPTIVE_ANOMALY_THRESHOLD,
+            hold_windows=ADAPTIVE_HOLD_WINDOWS,
+        )
+    aggregator = DataAggregator(
+        MQTT_BROKER_HOST, MQTT_BROKER_PORT, MQTT_TOPIC, sampler=sampler, summary_topic=MQTT_SUMMARY_TOPIC,
+        client_id=MQTT_CLIENT_ID, mqtt_settings=MQTT_CLIENT_SETTINGS, user_id=USER_ID,
+    )
 
     # Підключаємося до MQTT брокера
     aggregator.connect_to_broker()
@@ -94,10 +228,14 @@ def main():
         while True:
             try:
                 # Читаємо дані
-                data = data_source.read()
+                with READ_LATENCY.time():
+                    data = data_source.read()
 
                 # Публікуємо дані
-                aggregator.publish_data(data)
+                if sampler is not None:
+                    aggregator.publish_sampled(data)
+                else:
+                    aggregator.publish_data(data)
 
                 # Затримка між зчитуваннями
                 time.sleep(DELAY)
@@ -106,6 +244,7 @@ def main():
                 print("Досягнуто кінця файлів даних")
                 break
             except Exception as e:
+                ERRORS.inc()
                 print(f"Помилка обробки даних: {e}")
                 break
 
@@ -113,10 +252,13 @@ def main():
         # Завершуємо читання даних
         data_source.stopReading()
 
+        # Відправляємо зведення неповного вікна
+        if sampler is not None:
+            aggregator.flush_sampled()
+
         # Зупиняємо MQTT клієнт
         if aggregator.is_connected:
-            aggregator.mqtt_client.loop_stop()
-            aggregator.mqtt_client.disconnect()
+            aggregator.mqtt_client.stop()
 
 
 if __name__ == "__main__":
@@ -1,6 +0,0 @@
-from marshmallow import Schema, fields
-
-class AccelerometerSchema(Schema):
-    x = fields.Int()
-    y = fields.Int()
-    z = fields.Int()
\ No newline at end of file
@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import List
+
+from common.codecs import dumps_agent_data, json_number
+from lab1.src.domain.aggregated_data import AggregatedData
+from lab1.src.domain.aggregated_data_batch import AggregatedDataBatch
+from lab1.src.domain.aggregated_window import AggregatedWindow
+
+
+def dumps_aggregated_data(data: AggregatedData, user_id: int, sequence: int = 0) -> str:
+    """
+    Серіалізує показ у JSON спільної схеми AgentData (common.entities) напряму, без створення моделі.
+    Результат збігається з AgentData.model_dump_json(). sequence - номер показу серед показів з тим самим часом.
+    """
+    accelerometer = data.accelerometer
+    gps = data.gps
+    return dumps_agent_data(
+        user_id, accelerometer.x, accelerometer.y, accelerometer.z,
+        gps.latitude, gps.longitude, data.time.isoformat(), sequence,
+    )
+
+
+def dumps_batch(batch: AggregatedDataBatch, user_id: int) -> List[str]:
+    """
+    Серіалізує кожен показ пакета в окреме JSON повідомлення.
+    Покази пакета можуть мати однаковий час, тому sequence - номер показу в пакеті:
+    інакше всі вони отримали б однаковий reading_key і сховище залишило б лише перший.
+    """
+    return [
+        dumps_agent_data(
+            user_id, x, y, z, latitude, longitude, datetime.fromtimestamp(time).isoformat(), sequence,
+        )
+        for sequence, (x, y, z, longitude, latitude, time) in enumerate(zip(
+            batch.x, batch.y, batch.z, batch.longitude, batch.latitude, batch.time
+        ))
+    ]
+
+
+def _dumps_axes(accelerometer) -> str:
+    return (
+        f'{{"x": {json_number(accelerometer.x)}, "y": {json_number(accelerometer.y)}, '
+        f'"z": {json_number(accelerometer.z)}}}'
+    )
+
+
+def dumps_window(window: AggregatedWindow, user_id: int) -> str:
+    """Серіалізує зведення вікна спокійних показів в JSON."""
+    return (
+        f'{{"user_id": {int(user_id)}, '
+        f'"window": {{"start": "{window.start.isoformat()}", "end": "{window.end.isoformat()}", '
+        f'"count": {window.count}}}, '
+        f'"accelerometer": {{"min": {_dumps_axes(window.minimum)}, "max": {_dumps_axes(window.maximum)}, '
+        f'"mean": {_dumps_axes(window.mean)}}}, '
+        f'"gps": {{"longitude": {json_number(window.gps.longitude)}, '
+        f'"latitude": {json_number(window.gps.latitude)}}}, '
+        f'"time": "{window.end.isoformat()}"}}'
+    )
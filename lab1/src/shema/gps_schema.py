@@ -1,5 +0,0 @@
-from marshmallow import Schema, fields
-
-class GpsSchema(Schema):
-    longitude = fields.Number()
-    latitude = fields.Number()
\ No newline at end of file
@@ -0,0 +1,244 @@
+import logging
+import os
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Set, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Columns of processed_agent_data kept in the archive
+ARCHIVE_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("road_state", pa.string()),
+    ("x", pa.float64()),
+    ("y", pa.float64()),
+    ("z", pa.float64()),
+    ("latitude", pa.float64()),
+    ("longitude", pa.float64()),
+    ("timestamp", pa.timestamp("us")),
+])
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("date", pa.string()), ("geohash", pa.string())]),
+    flavor="hive",
+)
+
+SUCCESS_MARKER = "_SUCCESS"
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    result = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(result) < precision:
+        if even:
+            middle = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= middle:
+                bits = bits * 2 + 1
+                lon_range[0] = middle
+            else:
+                bits = bits * 2
+                lon_range[1] = middle
+        else:
+            middle = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= middle:
+                bits = bits * 2 + 1
+                lat_range[0] = middle
+            else:
+                bits = bits * 2
+                lat_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            result.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(result)
+
+
+def geohash_cell_size(precision: int):
+    """Height and width of a geohash cell in degrees."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def geohash_cover(min_lat: float, max_lat: float, min_lon: float, max_lon: float,
+                  precision: int, max_cells: int = 1024) -> Optional[Set[str]]:
+    """Geohash prefixes of the cells overlapping the bbox, or None if there are too many to enumerate."""
+    lat_step, lon_step = geohash_cell_size(precision)
+    rows = int((max_lat - min_lat) / lat_step) + 2
+    columns = int((max_lon - min_lon) / lon_step) + 2
+    if rows * columns > max_cells:
+        return None
+    cells = set()
+    for row in range(rows):
+        latitude = min(max_lat, min_lat + row * lat_step)
+        for column in range(columns):
+            longitude = min(max_lon, min_lon + column * lon_step)
+            cells.add(geohash_encode(latitude, longitude, precision))
+    return cells
+
+
+class ParquetArchive:
+    """
+    Archive of closed days of processed_agent_data in Parquet files:
+    <root>/date=YYYY-MM-DD/geohash=<prefix>/part-<id>.parquet
+
+    Rows in a file are sorted by timestamp, so the per row group min/max
+    statistics written by Parquet let readers skip most of a file.
+    """
+
+    def __init__(self, root: str, model, geohash_precision: int = 3, row_group_size: int = 64 * 1024,
+                 delete_after_export: bool = True):
+        self.root = root
+        self.model = model
+        self.geohash_precision = geohash_precision
+        self.row_group_size = row_group_size
+        self.delete_after_export = delete_after_export
+
+    def archive_closed_days(self, db: Session, before: date) -> List[str]:
+        """Export every day older than `before` that still has rows in the database."""
+        oldest = db.execute(select(func.min(self.model.timestamp))).scalar()
+        if oldest is None:
+            return []
+        written = []
+        day = oldest.date()
+        while day < before:
+            written.extend(self.archive_day(db, day))
+            day += timedelta(days=1)
+        return written
+
+    def archive_day(self, db: Session, day: date) -> List[str]:
+        day_dir = os.path.join(self.root, f"date={day.isoformat()}")
+        if not self.delete_after_export and os.path.exists(os.path.join(day_dir, SUCCESS_MARKER)):
+            # Rows stay in the database, the day was exported before
+            return []
+        start = datetime.combine(day, datetime.min.time())
+        condition = (self.model.timestamp >= start) & (self.model.timestamp < start + timedelta(days=1))
+        columns = [getattr(self.model, field.name) for field in ARCHIVE_SCHEMA]
+        rows = db.execute(select(*columns).where(condition).order_by(self.model.timestamp)).all()
+        if not rows:
+            return []
+
+        by_geohash = {}
+        for row in rows:
+            prefix = geohash_encode(row.latitude or 0.0, row.longitude or 0.0, self.geohash_precision)
+            by_geohash.setdefault(prefix, []).append(row)
+
+        written = []
+        for prefix, partition_rows in by_geohash.items():
+            table = pa.Table.from_pylist([row._asdict() for row in partition_rows], schema=ARCHIVE_SCHEMA)
+            partition_dir = os.path.join(day_dir, f"geohash={prefix}")
+            os.makedirs(partition_dir, exist_ok=True)
+            path = os.path.join(partition_dir, f"part-{partition_rows[0].id}-{partition_rows[-1].id}.parquet")
+            # Write to a temporary file first so readers never see a partial file
+            tmp_path = os.path.join(partition_dir, f".{uuid.uuid4().hex}.tmp")
+            pq.write_table(table, tmp_path, row_group_size=self.row_group_size,
+                           compression="zstd", write_statistics=True)
+            os.replace(tmp_path, path)
+            written.append(path)
+        open(os.path.join(day_dir, SUCCESS_MARKER), "w").close()
+
+        if self.delete_after_export:
+            db.query(self.model).filter(condition).delete(synchronize_session=False)
+            db.commit()
+        logging.info(f"Archived {len(rows)} rows of {day.isoformat()} into {len(written)} files")
+        return written
+
+    def query(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              road_state: Optional[str] = None, min_lat: Optional[float] = None, max_lat: Optional[float] = None,
+              min_lon: Optional[float] = None, max_lon: Optional[float] = None,
+              columns: Optional[Iterable[str]] = None, limit: Optional[int] = None) -> pa.Table:
+        """
+        Read archived rows. Filters on date and geohash prune whole directories,
+        filters on the remaining columns are pushed down to Parquet row group statistics.
+        """
+        if not os.path.isdir(self.root):
+            return ARCHIVE_SCHEMA.empty_table()
+        dataset = ds.dataset(self.root, format="parquet", partitioning=PARTITIONING,
+                             exclude_invalid_files=True)
+        expression = None
+
+        def add(condition):
+            nonlocal expression
+            expression = condition if expression is None else expression & condition
+
+        if start is not None:
+            add(ds.field("date") >= start.date().isoformat())
+            add(ds.field("timestamp") >= pa.scalar(start, pa.timestamp("us")))
+        if end is not None:
+            add(ds.field("date") <= end.date().isoformat())
+            add(ds.field("timestamp") < pa.scalar(end, pa.timestamp("us")))
+        if road_state is not None:
+            add(ds.field("road_state") == road_state)
+        if None not in (min_lat, max_lat, min_lon, max_lon):
+            cells = geohash_cover(min_lat, max_lat, min_lon, max_lon, self.geohash_precision)
+            if cells is not None:
+                add(ds.field("geohash").isin(sorted(cells)))
+        if min_lat is not None:
+            add(ds.field("latitude") >= min_lat)
+        if max_lat is not None:
+            add(ds.field("latitude") <= max_lat)
+        if min_lon is not None:
+            add(ds.field("longitude") >= min_lon)
+        if max_lon is not None:
+            add(ds.field("longitude") <= max_lon)
+
+        columns = list(columns) if columns else ARCHIVE_SCHEMA.names
+        if limit is not None:
+            return dataset.head(limit, columns=columns, filter=expression)
+        return dataset.to_table(columns=columns, filter=expression)
+
+    def days(self) -> List[date]:
+        """Days exported completely (their rows are gone from the database if delete_after_export)"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            date.fromisoformat(name[len("date="):])
+            for name in os.listdir(self.root)
+            if name.startswith("date=") and os.path.exists(os.path.join(self.root, name, SUCCESS_MARKER))
+        )
+
+    # Aggregates of archived rows with the row shapes of the SQL aggregations in stats.RoadStats,
+    # which adds them to the database's. `filters` is a stats.StatsFilter without user_id: the
+    # archive does not keep it
+
+    def _filtered(self, filters, columns: List[str]) -> pa.Table:
+        return self.query(start=filters.start, end=filters.end, min_lat=filters.min_lat, max_lat=filters.max_lat,
+                          min_lon=filters.min_lon, max_lon=filters.max_lon, columns=columns)
+
+    def road_state_counts(self, filters) -> List[Tuple[str, int]]:
+        counts = pc.value_counts(self._filtered(filters, ["road_state"])["road_state"])
+        return [(item["values"], item["counts"]) for item in counts.to_pylist()]
+
+    def z_histogram(self, filters, bin_width: float, bins: int) -> List[Tuple[int, int]]:
+        z = self._filtered(filters, ["z"])["z"].drop_null()
+        if len(z) == 0:
+            return []
+        index = pc.cast(pc.floor(pc.divide(pc.abs(z), float(bin_width))), pa.int64())
+        counts = pc.value_counts(pc.min_element_wise(index, bins - 1))
+        return [(item["values"], item["counts"]) for item in counts.to_pylist()]
+
+    def time_series(self, filters, interval: str) -> List[Tuple[datetime, str, int, float, int, float]]:
+        table = self._filtered(filters, ["id", "road_state", "z", "timestamp"])
+        if table.num_rows == 0:
+            return []
+        table = table.append_column("bucket", pc.floor_temporal(table["timestamp"], unit=interval))
+        table = table.append_column("abs_z", pc.abs(table["z"]))
+        grouped = table.group_by(["bucket", "road_state"]).aggregate([
+            ("id", "count"), ("abs_z", "sum"), ("abs_z", "count"), ("abs_z", "max"),
+        ])
+        return list(zip(*(grouped[name].to_pylist() for name in (
+            "bucket", "road_state", "id_count", "abs_z_sum", "abs_z_count", "abs_z_max",
+        ))))
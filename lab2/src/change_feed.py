@@ -0,0 +1,193 @@
+import asyncio
+import json
+import logging
+import select as select_module
+import threading
+from datetime import date, datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+# pg_advisory_xact_lock key of the change log writers
+LOCK_KEY = 0x6c616232
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def event_json(change) -> str:
+    """One change as JSON; the row is stored serialized and is not decoded again."""
+    return f'{{"seq":{change.seq},"op":"{change.op}","id":{change.row_id},"data":{change.data or "null"}}}'
+
+
+class ChangeFeed:
+    """
+    Change data capture for processed_agent_data: every insert, update and delete
+    adds an event to an append-only change log table in the same transaction, so
+    consumers read only the rows after the last sequence number they have seen.
+
+    The sequence is the change log's primary key. On Postgres writers serialize
+    on an advisory lock until commit, so events become visible in sequence order
+    and a consumer never skips a lower sequence number committed late.
+
+    Waiting consumers are woken by notify() after a local commit, and for writes
+    of other processes by Postgres LISTEN/NOTIFY or, on other databases, by
+    polling the latest sequence every poll_interval seconds.
+    """
+
+    def __init__(self, model, columns: Iterable[str], dialect: str, channel: str = "processed_agent_data_changes",
+                 poll_interval: float = 1.0):
+        self.model = model
+        # Columns of the data table kept in the events
+        self.columns = list(columns)
+        self.dialect = dialect
+        self.channel = channel
+        self.poll_interval = poll_interval
+        # Latest committed sequence number known to this process
+        self.last_seq = 0
+        # Created on the serving loop (start() or the first wait()): on Python < 3.10 an
+        # Event is bound to the loop current when it is created, not the one awaiting it
+        self._changed: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped = threading.Event()
+
+    def record(self, db: Session, op: str, rows: Iterable) -> int:
+        """Add events for rows (None data for deletes) to the session's transaction; returns the last sequence number"""
+        if self.dialect == "postgresql":
+            db.execute(select(func.pg_advisory_xact_lock(LOCK_KEY)))
+        now = datetime.now()
+        events = [
+            {
+                "op": op,
+                "row_id": row.id,
+                "data": None if op == "delete" else json.dumps(
+                    {column: getattr(row, column) for column in self.columns},
+                    separators=(",", ":"), default=_json_default,
+                ),
+                "created_at": now,
+            }
+            for row in rows
+        ]
+        if not events:
+            return 0
+        db.execute(insert(self.model), events)
+        # Writers are serialized until commit (SQLite's write lock, the advisory lock on
+        # Postgres), so the latest number is ours; cheaper than RETURNING per row
+        seq = self.latest(db)
+        if self.dialect == "postgresql":
+            # Delivered to the listeners on commit
+            db.execute(select(func.pg_notify(self.channel, str(seq))))
+        return seq
+
+    def notify(self, seq: int) -> None:
+        """Wake the waiters after a commit; safe to call from any thread"""
+        if self._loop is None or not self._loop.is_running():
+            self.last_seq = max(self.last_seq, seq)
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._advance(seq)
+        else:
+            self._loop.call_soon_threadsafe(self._advance, seq)
+
+    def _advance(self, seq: int) -> None:
+        if seq > self.last_seq:
+            self.last_seq = seq
+            # Every waiter holds the event of its generation
+            if self._changed is not None:
+                self._changed.set()
+            self._changed = asyncio.Event()
+
+    async def wait(self, since: int, timeout: float) -> bool:
+        """Wait until there are events after `since`; False on timeout"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.last_seq <= since:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            if self._changed is None:
+                self._changed = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def read(self, db: Session, since: int, limit: int) -> List:
+        return db.execute(
+            select(self.model).where(self.model.seq > since).order_by(self.model.seq).limit(limit)
+        ).scalars().all()
+
+    def latest(self, db: Session) -> int:
+        return db.execute(select(func.max(self.model.seq))).scalar() or 0
+
+    def is_gone(self, db: Session, since: int) -> bool:
+        """True if events after `since` were already pruned: the consumer has to start over"""
+        if since == 0:
+            return False
+        oldest = db.execute(select(func.min(self.model.seq))).scalar()
+        return oldest is not None and since < oldest - 1
+
+    def prune(self, db: Session, before: datetime) -> int:
+        deleted = db.query(self.model).filter(self.model.created_at < before).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+    async def start(self, engine) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self._stopped.clear()
+        with Session(engine) as db:
+            self._advance(await asyncio.to_thread(self.latest, db))
+        if self.dialect == "postgresql":
+            threading.Thread(target=self._listen, args=(engine,), name="change-feed-listener", daemon=True).start()
+        else:
+            asyncio.create_task(self._poll(engine))
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    async def _poll(self, engine) -> None:
+        while not self._stopped.is_set():
+            await asyncio.sleep(self.poll_interval)
+            try:
+                with Session(engine) as db:
+                    self._advance(await asyncio.to_thread(self.latest, db))
+            except Exception as e:
+                logging.error(f"Change feed poll failed: {e}")
+
+    def _listen(self, engine) -> None:
+        """LISTEN on a dedicated connection (reconnecting on errors) and pass the sequence numbers to notify()"""
+        while not self._stopped.is_set():
+            connection = None
+            try:
+                connection = engine.raw_connection()
+                # Kept out of the pool: it is switched to autocommit and stays busy listening
+                connection.detach()
+                driver_connection = connection.driver_connection
+                driver_connection.autocommit = True
+                with driver_connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                    # Writes committed before LISTEN took effect
+                    cursor.execute(f"SELECT max(seq) FROM {self.model.__tablename__}")
+                    self.notify(cursor.fetchone()[0] or 0)
+                while not self._stopped.is_set():
+                    if select_module.select([driver_connection], [], [], 5.0) == ([], [], []):
+                        continue
+                    driver_connection.poll()
+                    while driver_connection.notifies:
+                        self.notify(int(driver_connection.notifies.pop(0).payload))
+            except Exception as e:
+                logging.error(f"Change feed listener failed, reconnecting: {e}")
+                self._stopped.wait(self.poll_interval)
+            finally:
+                if connection is not None:
+                    connection.close()
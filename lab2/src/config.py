@@ -0,0 +1,68 @@
+"""
+Settings of the store, read from the environment. Kept apart from the app, so
+src.serve can read them without building the app (database engine, hot store).
+"""
+import logging
+import os
+
+# Database configurations
+DATABASE_USER = os.getenv("POSTGRES_USER", "postgres")
+DATABASE_PASSWORD = os.getenv("POSTGRES_PASSWORD", "postgres")
+DATABASE_HOST = os.getenv("POSTGRES_HOST", "db")
+DATABASE_PORT = os.getenv("POSTGRES_PORT", "5432")
+DATABASE_NAME = os.getenv("POSTGRES_DB", "postgres")
+
+# DATABASE_URL overrides the Postgres settings (e.g. sqlite:///store.db for local runs and benchmarks)
+DATABASE_URL = os.getenv("DATABASE_URL") or \
+    f"postgresql://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
+
+# Archive configurations: days older than ARCHIVE_AFTER_DAYS are moved to Parquet files in ARCHIVE_DIR
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "true").lower() == "true"
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", 7))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", 3600))
+ARCHIVE_GEOHASH_PRECISION = int(os.getenv("ARCHIVE_GEOHASH_PRECISION", 3))
+ARCHIVE_DELETE_AFTER_EXPORT = os.getenv("ARCHIVE_DELETE_AFTER_EXPORT", "true").lower() == "true"
+
+# In-memory store of recent readings
+HOT_STORE_ENABLED = os.getenv("HOT_STORE_ENABLED", "true").lower() == "true"
+HOT_STORE_CAPACITY = int(os.getenv("HOT_STORE_CAPACITY", 1_000_000))
+HOT_STORE_WINDOW_SECONDS = float(os.getenv("HOT_STORE_WINDOW_SECONDS", 15 * 60))
+
+# Aggregation results of time ranges that ended more than STATS_CLOSED_AFTER seconds ago are cached
+STATS_CACHE_SIZE = int(os.getenv("STATS_CACHE_SIZE", 256))
+STATS_CLOSED_AFTER = float(os.getenv("STATS_CLOSED_AFTER", 300))
+
+# Change feed (/changes/): writes of other processes are picked up by Postgres LISTEN/NOTIFY,
+# on SQLite by polling every CHANGE_FEED_POLL_INTERVAL seconds; events are kept for
+# CHANGE_FEED_RETENTION seconds
+CHANGE_FEED_ENABLED = os.getenv("CHANGE_FEED_ENABLED", "true").lower() == "true"
+CHANGE_FEED_POLL_INTERVAL = float(os.getenv("CHANGE_FEED_POLL_INTERVAL", 1.0))
+CHANGE_FEED_RETENTION = float(os.getenv("CHANGE_FEED_RETENTION", 7 * 24 * 3600))
+CHANGE_FEED_KEEPALIVE = float(os.getenv("CHANGE_FEED_KEEPALIVE", 15))
+
+# Deployment (src.serve): STORE_WORKERS processes serve the API; with more than one, each worker
+# follows the change feed to keep its hot store and stats cache in step with the writes of the others.
+# STORE_MAINTENANCE runs the archiver and the change feed pruner in this process (src.serve turns it
+# off in the workers and runs them once, in a process of their own: src.maintenance).
+# Workers add CPU for request handling, not write throughput: with the change feed every write holds
+# its advisory lock until commit, so commits are serialized across all workers (about 300-400
+# single-row commits/s on Postgres, bench_store_workers --write-path). Rows per commit
+# (WRITE_COALESCE_*) raise it instead. Hence one worker by default, more only up to the CPU count
+# when request handling, not the database, is the limit
+STORE_HOST = os.getenv("STORE_HOST", "0.0.0.0")
+STORE_PORT = int(os.getenv("STORE_PORT", 8000))
+STORE_WORKERS = int(os.getenv("STORE_WORKERS", 1))
+STORE_MAINTENANCE = os.getenv("STORE_MAINTENANCE", "true").lower() == "true"
+
+# Single-row POSTs arriving within WRITE_COALESCE_WINDOW seconds of the first are written with
+# one INSERT and one commit, up to WRITE_COALESCE_MAX_BATCH rows (window 0: a commit per request)
+WRITE_COALESCE_WINDOW = float(os.getenv("WRITE_COALESCE_WINDOW", 0.005))
+WRITE_COALESCE_MAX_BATCH = int(os.getenv("WRITE_COALESCE_MAX_BATCH", 500))
+
+# A worker sees the writes of the others only through the change feed
+FOLLOW_CHANGES = STORE_WORKERS > 1 and CHANGE_FEED_ENABLED
+if STORE_WORKERS > 1 and not CHANGE_FEED_ENABLED:
+    logging.warning("STORE_WORKERS > 1 without CHANGE_FEED_ENABLED: hot store and stats cache are disabled")
+    HOT_STORE_ENABLED = False
+    STATS_CACHE_SIZE = 0
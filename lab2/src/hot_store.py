@@ -0,0 +1,179 @@
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class HotReading:
+    __slots__ = ("id", "road_state", "x", "y", "z", "latitude", "longitude", "timestamp")
+
+    def __init__(self, id, road_state, x, y, z, latitude, longitude, timestamp):
+        self.id = id
+        self.road_state = road_state
+        self.x = x
+        self.y = y
+        self.z = z
+        self.latitude = latitude
+        self.longitude = longitude
+        self.timestamp = timestamp
+
+    def as_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class HotStore:
+    """
+    Ring buffer with the most recent readings kept as NumPy columns
+    (about 60 bytes per reading). Time window and bbox queries are answered
+    with vectorized masks; anything older than coverage_start must be read
+    from the database.
+
+    road_state is free-form, so it is stored as a code into a table of at
+    most max_road_states names. When the table is full, names no reading in
+    the ring uses any more are dropped; if it is still full, the reading is
+    not kept and coverage_start moves past it.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, window_seconds: float = 15 * 60,
+                 max_road_states: int = 1 << 16):
+        self.capacity = capacity
+        self.window_seconds = window_seconds
+        self.max_road_states = min(max_road_states, 1 << 16)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.z = np.zeros(capacity, dtype=np.float64)
+        self.latitude = np.zeros(capacity, dtype=np.float64)
+        self.longitude = np.zeros(capacity, dtype=np.float64)
+        self.road_state_codes = np.zeros(capacity, dtype=np.uint16)
+        self.valid = np.zeros(capacity, dtype=bool)
+        self.road_states: List[str] = []
+        self._road_state_index: Dict[str, int] = {}
+        self.size = 0
+        self._next = 0
+        # Readings with an older timestamp may be missing here: inserted before
+        # the process started or already overwritten in the ring
+        self.coverage_start = time.time()
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in (
+            self.ids, self.timestamps, self.x, self.y, self.z,
+            self.latitude, self.longitude, self.road_state_codes, self.valid,
+        ))
+
+    def _road_state_code(self, road_state: str) -> Optional[int]:
+        """Code of the name, None if the table is full"""
+        code = self._road_state_index.get(road_state)
+        if code is None:
+            if len(self.road_states) >= self.max_road_states:
+                self._compact_road_states()
+                if len(self.road_states) >= self.max_road_states:
+                    return None
+            code = len(self.road_states)
+            self.road_states.append(road_state)
+            self._road_state_index[road_state] = code
+        return code
+
+    def _compact_road_states(self) -> None:
+        """Drop the names no valid reading uses and renumber the rest"""
+        used = np.unique(self.road_state_codes[self.valid])
+        remap = np.zeros(len(self.road_states), dtype=self.road_state_codes.dtype)
+        remap[used] = np.arange(len(used))
+        self.road_state_codes[self.valid] = remap[self.road_state_codes[self.valid]]
+        self.road_states = [self.road_states[code] for code in used.tolist()]
+        self._road_state_index = {name: code for code, name in enumerate(self.road_states)}
+
+    def mark_gap(self, timestamp: float) -> None:
+        """Readings up to `timestamp` may be missing: queries reaching before it go to the database"""
+        with self._lock:
+            self._mark_gap(timestamp)
+
+    def _mark_gap(self, timestamp: float) -> None:
+        self.coverage_start = max(self.coverage_start, float(np.nextafter(timestamp, np.inf)))
+
+    def append(self, id: int, road_state: str, x: float, y: float, z: float,
+               latitude: float, longitude: float, timestamp: datetime) -> None:
+        ts = timestamp.timestamp()
+        with self._lock:
+            code = self._road_state_code(road_state)
+            if code is None:
+                self._mark_gap(ts)
+                return
+            i = self._next
+            if self.valid[i]:
+                self.coverage_start = max(self.coverage_start, self.timestamps[i])
+            self.ids[i] = id
+            self.timestamps[i] = ts
+            self.x[i] = x
+            self.y[i] = y
+            self.z[i] = z
+            self.latitude[i] = latitude
+            self.longitude[i] = longitude
+            self.road_state_codes[i] = code
+            self.valid[i] = True
+            self._next = (i + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+    def update(self, id: int, **values) -> None:
+        with self._lock:
+            positions = np.flatnonzero(self.valid & (self.ids == id))
+            for name, value in values.items():
+                if name == "road_state":
+                    code = self._road_state_code(value)
+                    if code is None:
+                        # Not representable any more: dropped, the database has the row
+                        for ts in self.timestamps[positions].tolist():
+                            self._mark_gap(ts)
+                        self.valid[positions] = False
+                        return
+                    self.road_state_codes[positions] = code
+                elif name == "timestamp":
+                    self.timestamps[positions] = value.timestamp()
+                elif name in ("x", "y", "z", "latitude", "longitude"):
+                    getattr(self, name)[positions] = value
+
+    def remove(self, id: int) -> None:
+        with self._lock:
+            self.valid[self.valid & (self.ids == id)] = False
+
+    def covers(self, start: datetime) -> bool:
+        return start.timestamp() >= self.coverage_start
+
+    def query(self, start: datetime, end: Optional[datetime] = None, road_state: Optional[str] = None,
+              min_lat: Optional[float] = None, max_lat: Optional[float] = None,
+              min_lon: Optional[float] = None, max_lon: Optional[float] = None) -> List[HotReading]:
+        with self._lock:
+            mask = self.valid & (self.timestamps >= start.timestamp())
+            if end is not None:
+                mask &= self.timestamps < end.timestamp()
+            if road_state is not None:
+                code = self._road_state_index.get(road_state)
+                if code is None:
+                    return []
+                mask &= self.road_state_codes == code
+            if min_lat is not None:
+                mask &= self.latitude >= min_lat
+            if max_lat is not None:
+                mask &= self.latitude <= max_lat
+            if min_lon is not None:
+                mask &= self.longitude >= min_lon
+            if max_lon is not None:
+                mask &= self.longitude <= max_lon
+            positions = np.flatnonzero(mask)
+            positions = positions[np.argsort(self.timestamps[positions], kind="stable")]
+            columns = (
+                self.ids[positions].tolist(),
+                [self.road_states[code] for code in self.road_state_codes[positions].tolist()],
+                self.x[positions].tolist(),
+                self.y[positions].tolist(),
+                self.z[positions].tolist(),
+                self.latitude[positions].tolist(),
+                self.longitude[positions].tolist(),
+                [datetime.fromtimestamp(ts) for ts in self.timestamps[positions].tolist()],
+            )
+        return [HotReading(*row) for row in zip(*columns)]
@@ -1,30 +1,44 @@
-from fastapi import FastAPI, Depends, HTTPException, WebSocket, WebSocketDisconnect, Path
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, BigInteger
+from fastapi import FastAPI, Depends, HTTPException, WebSocket, WebSocketDisconnect, Path, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, BigInteger, Index, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from contextlib import contextmanager
+import asyncio
 import json
+import logging
 import os
-
-# Database configurations
-DATABASE_USER = os.getenv("POSTGRES_USER", "postgres")
-DATABASE_PASSWORD = os.getenv("POSTGRES_PASSWORD", "postgres")
-DATABASE_HOST = os.getenv("POSTGRES_HOST", "db")
-DATABASE_PORT = os.getenv("POSTGRES_PORT", "5432")
-DATABASE_NAME = os.getenv("POSTGRES_DB", "postgres")
-
-DATABASE_URL = f"postgresql://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
+import time
+
+from common.codecs import to_local_naive, to_row
+from common.entities import ProcessedAgentData
+from common.metrics import REGISTRY, CONTENT_TYPE
+from .change_feed import ChangeFeed, event_json
+from .config import DATABASE_URL, ARCHIVE_ENABLED, ARCHIVE_DIR, ARCHIVE_AFTER_DAYS, ARCHIVE_INTERVAL, \
+    ARCHIVE_GEOHASH_PRECISION, ARCHIVE_DELETE_AFTER_EXPORT, HOT_STORE_ENABLED, HOT_STORE_CAPACITY, \
+    HOT_STORE_WINDOW_SECONDS, STATS_CACHE_SIZE, STATS_CLOSED_AFTER, CHANGE_FEED_ENABLED, CHANGE_FEED_POLL_INTERVAL, \
+    CHANGE_FEED_RETENTION, CHANGE_FEED_KEEPALIVE, STORE_MAINTENANCE, WRITE_COALESCE_WINDOW, \
+    WRITE_COALESCE_MAX_BATCH, FOLLOW_CHANGES
+from .stats import INTERVALS, ResultCache, RoadStats, StatsFilter
+from .write_coalescer import WriteCoalescer
 
 # Database setup
-engine = create_engine(DATABASE_URL)
+connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+engine = create_engine(DATABASE_URL, connect_args=connect_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
 class ProcessedAgentDataInDB(Base):
     __tablename__ = "processed_agent_data"
+    __table_args__ = (
+        # Aggregations: GROUP BY road_state over a time range and per-vehicle time ranges
+        Index("ix_processed_agent_data_timestamp_road_state", "timestamp", "road_state"),
+        Index("ix_processed_agent_data_user_id_timestamp", "user_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     road_state = Column(String, nullable=False)
@@ -33,10 +47,96 @@ class ProcessedAgentDataInDB(Base):
     z = Column(Float)
     latitude = Column(Float)
     longitude = Column(Float)
-    timestamp = Column(DateTime)
+    timestamp = Column(DateTime, index=True)
+    user_id = Column(Integer)
+    # Deterministic key of the reading (common.reading_key); the unique index makes retried inserts no-ops
+    reading_key = Column(String(64), index=True, unique=True)
+
+
+class ProcessedAgentDataChangeInDB(Base):
+    """Append-only change log of processed_agent_data, read by sequence number"""
+    __tablename__ = "processed_agent_data_changes"
+    # AUTOINCREMENT: SQLite would reuse the numbers of pruned events otherwise
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True)
+    op = Column(String(8), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    # The row after the change as JSON, NULL for deletes
+    data = Column(Text)
+    created_at = Column(DateTime, nullable=False, index=True)
+
+
+def init_db():
+    """Create missing tables and indexes; run by the startup hook, not on import"""
+    Base.metadata.create_all(bind=engine)
+
+
+# INSERT ... ON CONFLICT (reading_key) DO NOTHING RETURNING *: readings that are already
+# stored are skipped, and only the rows actually inserted come back.
+# Postgres in Docker, SQLite for local runs and benchmarks; both support it.
+if engine.dialect.name == "postgresql":
+    from sqlalchemy.dialects.postgresql import insert as dialect_insert
+else:
+    from sqlalchemy.dialects.sqlite import insert as dialect_insert
+INSERT_NEW_READINGS = dialect_insert(ProcessedAgentDataInDB.__table__) \
+    .on_conflict_do_nothing(index_elements=["reading_key"]) \
+    .returning(*ProcessedAgentDataInDB.__table__.c)
+
+# The Parquet archive (and pyarrow) is loaded on first use: most runs never touch it
+# before the archiver's first pass, and the request path does not need it
+archive = None
+
+
+def get_archive():
+    global archive
+    if archive is None:
+        from .archive import ParquetArchive
+        archive = ParquetArchive(
+            ARCHIVE_DIR,
+            ProcessedAgentDataInDB,
+            geohash_precision=ARCHIVE_GEOHASH_PRECISION,
+            delete_after_export=ARCHIVE_DELETE_AFTER_EXPORT,
+        )
+    return archive
+
+
+hot_store = None
+if HOT_STORE_ENABLED:
+    from .hot_store import HotStore
+    hot_store = HotStore(HOT_STORE_CAPACITY, HOT_STORE_WINDOW_SECONDS)
+
+
+@contextmanager
+def maintaining_hot_store():
+    """Hot store updates after a commit: a failure is logged and never fails the request"""
+    try:
+        yield
+    except Exception as e:
+        logging.error(f"Hot store update failed, recent readings are read from the database for now: {e}")
+        hot_store.mark_gap(time.time())
+
+
+change_feed = ChangeFeed(
+    ProcessedAgentDataChangeInDB,
+    [column.name for column in ProcessedAgentDataInDB.__table__.columns],
+    engine.dialect.name,
+    poll_interval=CHANGE_FEED_POLL_INTERVAL,
+) if CHANGE_FEED_ENABLED else None
 
 
-Base.metadata.create_all(bind=engine)
+def get_stats_archive():
+    """Archive the statistics add in; None while nothing is archived, so pyarrow is not loaded for it"""
+    return get_archive() if os.path.isdir(ARCHIVE_DIR) else None
+
+
+stats = RoadStats(
+    ProcessedAgentDataInDB,
+    engine.dialect.name,
+    ResultCache(capacity=STATS_CACHE_SIZE, closed_after=STATS_CLOSED_AFTER),
+    # Archived days stay in the database too unless ARCHIVE_DELETE_AFTER_EXPORT
+    archive=get_stats_archive if ARCHIVE_DELETE_AFTER_EXPORT else None,
+)
 
 
 def get_db():
@@ -47,61 +147,139 @@ def get_db():
         db.close()
 
 
-# Pydantic models
-class Accelerometer(BaseModel):
-    x: float
-    y: float
-    z: float
+# Pydantic models (the reading schema itself is shared: common.entities)
+class ProcessedAgentDataUpdate(BaseModel):
+    road_state: Optional[str] = None
+    x: Optional[float] = None
+    y: Optional[float] = None
+    z: Optional[float] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    timestamp: Optional[datetime] = None
+
+
+# Metrics
+MESSAGES_IN = REGISTRY.counter("store_messages_in_total", "Rows received by POST /processed_agent_data/")
+ROWS_WRITTEN = REGISTRY.counter("store_rows_written_total", "Rows committed to the database")
+ERRORS = REGISTRY.counter("store_errors_total", "Failed database writes")
+DUPLICATES = REGISTRY.counter("store_duplicates_total", "Rows skipped because their reading key is already stored")
+WEBSOCKET_CONNECTIONS = REGISTRY.gauge("store_websocket_connections", "Open WebSocket connections")
+REQUEST_LATENCY = REGISTRY.histogram(
+    "store_stage_latency_seconds", "Latency of a pipeline stage", labels={"stage": "request"}
+)
+COMMIT_LATENCY = REGISTRY.histogram(
+    "store_stage_latency_seconds", "Latency of a pipeline stage", labels={"stage": "db_commit"}
+)
 
+app = FastAPI()
 
-class GPS(BaseModel):
-    latitude: float
-    longitude: float
 
+# Registered first: the other startup hooks read the tables
+@app.on_event("startup")
+async def create_tables():
+    await asyncio.to_thread(init_db)
 
-class AgentData(BaseModel):
-    accelerometer: Accelerometer
-    gps: GPS
-    timestamp: int
 
+@app.middleware("http")
+async def measure_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    REQUEST_LATENCY.observe(time.perf_counter() - start)
+    return response
 
-class ProcessedAgentData(BaseModel):
-    road_state: str
-    agent_data: AgentData
 
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
 
-class ProcessedAgentDataUpdate(BaseModel):
-    road_state: Optional[str] = None
-    x: Optional[float] = None
-    y: Optional[float] = None
-    z: Optional[float] = None
-    latitude: Optional[float] = None
-    longitude: Optional[float] = None
-    timestamp: Optional[int] = None
 
+def insert_readings(db: Session, rows: List[Dict[str, Any]]) -> list:
+    """Insert rows in one statement, skipping already stored reading keys; returns the inserted rows"""
+    try:
+        with COMMIT_LATENCY.time():
+            inserted = db.execute(INSERT_NEW_READINGS, rows).all()
+            seq = change_feed.record(db, "insert", inserted) if change_feed is not None else 0
+            db.commit()
+    except Exception:
+        ERRORS.inc()
+        raise
+    if seq:
+        change_feed.notify(seq)
+    ROWS_WRITTEN.inc(len(inserted))
+    DUPLICATES.inc(len(rows) - len(inserted))
+    if inserted:
+        # Late readings change the statistics of closed ranges
+        stats.cache.invalidate(row.timestamp for row in inserted)
+    if hot_store is not None and not FOLLOW_CHANGES:
+        with maintaining_hot_store():
+            for row in inserted:
+                hot_store.append(row.id, row.road_state, row.x, row.y, row.z, row.latitude, row.longitude,
+                                 row.timestamp)
+    return inserted
+
+
+def write_readings(rows: List[Dict[str, Any]]) -> list:
+    """insert_readings in a session of its own (the write coalescer runs it in a worker thread)"""
+    db = SessionLocal()
+    try:
+        return insert_readings(db, rows)
+    finally:
+        db.close()
 
-app = FastAPI()
 
+coalescer = WriteCoalescer(
+    write_readings, window=WRITE_COALESCE_WINDOW, max_batch=WRITE_COALESCE_MAX_BATCH,
+) if WRITE_COALESCE_WINDOW > 0 else None
 
-@app.post("/processed_agent_data/")
-async def create_data(data: ProcessedAgentData, db: Session = Depends(get_db)):
-    # Перетворення Unix timestamp у datetime
-    timestamp = datetime.fromtimestamp(data.agent_data.timestamp)
-
-    db_item = ProcessedAgentDataInDB(
-        road_state=data.road_state,
-        x=data.agent_data.accelerometer.x,
-        y=data.agent_data.accelerometer.y,
-        z=data.agent_data.accelerometer.z,
-        latitude=data.agent_data.gps.latitude,
-        longitude=data.agent_data.gps.longitude,
-        timestamp=timestamp
-    )
 
-    db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
-    return {"id": db_item.id, "message": "Data successfully stored"}
+@app.on_event("shutdown")
+async def flush_coalesced_writes():
+    if coalescer is not None:
+        await coalescer.close()
+
+
+def find_stored_id(db: Session, reading_key: str) -> Optional[int]:
+    return db.query(ProcessedAgentDataInDB.id) \
+        .filter(ProcessedAgentDataInDB.reading_key == reading_key) \
+        .scalar()
+
+
+def find_stored_id_in_session(reading_key: str) -> Optional[int]:
+    db = SessionLocal()
+    try:
+        return find_stored_id(db, reading_key)
+    finally:
+        db.close()
+
+
+# The writes below run in a worker thread with a session of their own: a commit may wait
+# for the change feed's lock, which would stall every request of the worker on the event loop
+@app.post("/processed_agent_data/")
+async def create_data(data: ProcessedAgentData):
+    MESSAGES_IN.inc()
+    row = to_row(data)
+    if coalescer is not None:
+        stored = await coalescer.submit(row)
+        if stored is not None:
+            return {"id": stored.id, "message": "Data successfully stored"}
+        # Off the event loop: requests waiting for their batch may hold every pooled connection
+        stored_id = await asyncio.to_thread(find_stored_id_in_session, row["reading_key"])
+        return {"id": stored_id, "message": "Duplicate, data already stored"}
+    inserted = await asyncio.to_thread(write_readings, [row])
+    if inserted:
+        return {"id": inserted[0].id, "message": "Data successfully stored"}
+    # Повторна доставка: повертаємо вже збережений запис
+    stored_id = await asyncio.to_thread(find_stored_id_in_session, row["reading_key"])
+    return {"id": stored_id, "message": "Duplicate, data already stored"}
+
+
+@app.post("/processed_agent_data/batch")
+async def create_data_batch(data: List[ProcessedAgentData]):
+    MESSAGES_IN.inc(len(data))
+    if not data:
+        return {"stored": 0, "duplicates": 0, "ids": []}
+    inserted = await asyncio.to_thread(write_readings, [to_row(item) for item in data])
+    return {"stored": len(inserted), "duplicates": len(data) - len(inserted), "ids": [row.id for row in inserted]}
 
 
 @app.get("/processed_agent_data/")
@@ -110,6 +288,125 @@ async def get_all_data(db: Session = Depends(get_db)):
     return data
 
 
+def load_hot_store():
+    """Fill the hot store with the last window of readings from the database"""
+    since = datetime.now() - timedelta(seconds=HOT_STORE_WINDOW_SECONDS)
+    db = SessionLocal()
+    try:
+        rows = db.query(ProcessedAgentDataInDB) \
+            .filter(ProcessedAgentDataInDB.timestamp >= since) \
+            .order_by(ProcessedAgentDataInDB.id) \
+            .limit(hot_store.capacity) \
+            .all()
+    finally:
+        db.close()
+    for row in rows:
+        hot_store.append(row.id, row.road_state, row.x, row.y, row.z, row.latitude, row.longitude, row.timestamp)
+    if len(rows) < hot_store.capacity:
+        hot_store.coverage_start = min(hot_store.coverage_start, since.timestamp())
+
+
+@app.on_event("startup")
+async def warm_up_hot_store():
+    if hot_store is not None:
+        await asyncio.to_thread(load_hot_store)
+
+
+@app.get("/processed_agent_data/recent")
+async def get_recent_data(
+        response: Response,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        road_state: Optional[str] = None,
+        min_lat: Optional[float] = None,
+        max_lat: Optional[float] = None,
+        min_lon: Optional[float] = None,
+        max_lon: Optional[float] = None,
+        db: Session = Depends(get_db),
+):
+    # За замовчуванням - останні HOT_STORE_WINDOW_SECONDS секунд
+    start = to_local_naive(start) if start else datetime.now() - timedelta(seconds=HOT_STORE_WINDOW_SECONDS)
+    end = to_local_naive(end) if end else None
+    if hot_store is not None and hot_store.covers(start):
+        response.headers["X-Data-Source"] = "memory"
+        readings = hot_store.query(start, end, road_state, min_lat, max_lat, min_lon, max_lon)
+        return [reading.as_dict() for reading in readings]
+
+    # Старіші дані читаємо з бази даних
+    response.headers["X-Data-Source"] = "database"
+    query = db.query(ProcessedAgentDataInDB).filter(ProcessedAgentDataInDB.timestamp >= start)
+    if end is not None:
+        query = query.filter(ProcessedAgentDataInDB.timestamp < end)
+    if road_state is not None:
+        query = query.filter(ProcessedAgentDataInDB.road_state == road_state)
+    if min_lat is not None:
+        query = query.filter(ProcessedAgentDataInDB.latitude >= min_lat)
+    if max_lat is not None:
+        query = query.filter(ProcessedAgentDataInDB.latitude <= max_lat)
+    if min_lon is not None:
+        query = query.filter(ProcessedAgentDataInDB.longitude >= min_lon)
+    if max_lon is not None:
+        query = query.filter(ProcessedAgentDataInDB.longitude <= max_lon)
+    return query.order_by(ProcessedAgentDataInDB.timestamp).all()
+
+
+# Statistics
+def stats_filter(
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        min_lat: Optional[float] = None,
+        max_lat: Optional[float] = None,
+        min_lon: Optional[float] = None,
+        max_lon: Optional[float] = None,
+        user_id: Optional[int] = None,
+) -> StatsFilter:
+    return StatsFilter(
+        start=to_local_naive(start) if start else None,
+        end=to_local_naive(end) if end else None,
+        min_lat=min_lat, max_lat=max_lat, min_lon=min_lon, max_lon=max_lon,
+        user_id=user_id,
+    )
+
+
+def flag_excluded_archive(response: Response, filters: StatsFilter) -> None:
+    # The archive has no user_id: per-vehicle statistics of archived days are not available
+    if stats.excludes_archived(filters):
+        response.headers["X-Stats-Partial"] = "archived days are not included with user_id"
+
+
+@app.get("/stats/road_state")
+async def get_road_state_counts(
+        response: Response,
+        filters: StatsFilter = Depends(stats_filter),
+        db: Session = Depends(get_db),
+):
+    flag_excluded_archive(response, filters)
+    return await asyncio.to_thread(stats.road_state_counts, db, filters)
+
+
+@app.get("/stats/z_histogram")
+async def get_z_histogram(
+        response: Response,
+        bin_width: float = Query(0.1, gt=0),
+        bins: int = Query(50, ge=1, le=1000),
+        filters: StatsFilter = Depends(stats_filter),
+        db: Session = Depends(get_db),
+):
+    flag_excluded_archive(response, filters)
+    return await asyncio.to_thread(stats.z_histogram, db, filters, bin_width, bins)
+
+
+@app.get("/stats/timeseries")
+async def get_time_series(
+        response: Response,
+        interval: str = Query("hour", pattern=f"^({'|'.join(INTERVALS)})$"),
+        filters: StatsFilter = Depends(stats_filter),
+        db: Session = Depends(get_db),
+):
+    flag_excluded_archive(response, filters)
+    return await asyncio.to_thread(stats.time_series, db, filters, interval)
+
+
 @app.get("/processed_agent_data/{item_id}")
 async def get_data_by_id(item_id: int = Path(..., description="ID запису для отримання"),
                          db: Session = Depends(get_db)):
@@ -131,15 +428,22 @@ async def update_data(
 
     update_data_dict = data.dict(exclude_unset=True)
 
-    # Обробка timestamp, якщо він присутній у запиті
-    if "timestamp" in update_data_dict:
-        update_data_dict["timestamp"] = datetime.fromtimestamp(update_data_dict["timestamp"])
+    # Обробка timestamp, якщо він присутній у запиті (ISO 8601 або Unix timestamp)
+    if update_data_dict.get("timestamp") is not None:
+        update_data_dict["timestamp"] = to_local_naive(update_data_dict["timestamp"])
 
     for key, value in update_data_dict.items():
         setattr(db_item, key, value)
 
+    seq = change_feed.record(db, "update", [db_item]) if change_feed is not None else 0
     db.commit()
     db.refresh(db_item)
+    if seq:
+        change_feed.notify(seq)
+    stats.cache.invalidate()
+    if hot_store is not None and not FOLLOW_CHANGES:
+        with maintaining_hot_store():
+            hot_store.update(item_id, **update_data_dict)
     return db_item
 
 
@@ -149,11 +453,158 @@ async def delete_data(item_id: int = Path(..., description="ID запису дл
     if db_item is None:
         raise HTTPException(status_code=404, detail=f"Запис з ID {item_id} не знайдено")
 
+    seq = change_feed.record(db, "delete", [db_item]) if change_feed is not None else 0
     db.delete(db_item)
     db.commit()
+    if seq:
+        change_feed.notify(seq)
+    stats.cache.invalidate()
+    if hot_store is not None and not FOLLOW_CHANGES:
+        with maintaining_hot_store():
+            hot_store.remove(item_id)
     return {"message": f"Запис з ID {item_id} успішно видалено"}
 
 
+# Archive
+def archive_closed_days():
+    db = SessionLocal()
+    try:
+        files = get_archive().archive_closed_days(db, before=date.today() - timedelta(days=ARCHIVE_AFTER_DAYS))
+    finally:
+        db.close()
+    if files and ARCHIVE_DELETE_AFTER_EXPORT:
+        stats.cache.invalidate()
+    return files
+
+
+async def run_archiver():
+    while True:
+        try:
+            await asyncio.to_thread(archive_closed_days)
+        except Exception as e:
+            logging.error(f"Archiving failed: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+
+@app.on_event("startup")
+async def start_archiver():
+    if ARCHIVE_ENABLED and STORE_MAINTENANCE:
+        asyncio.create_task(run_archiver())
+
+
+@app.post("/archive/run")
+async def run_archive():
+    files = await asyncio.to_thread(archive_closed_days)
+    return {"files": files}
+
+
+@app.get("/archive/processed_agent_data/")
+async def query_archive(
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        road_state: Optional[str] = None,
+        min_lat: Optional[float] = None,
+        max_lat: Optional[float] = None,
+        min_lon: Optional[float] = None,
+        max_lon: Optional[float] = None,
+        limit: Optional[int] = Query(None, ge=1),
+        format: str = Query("json", pattern="^(json|arrow)$"),
+):
+    table = await asyncio.to_thread(
+        get_archive().query, start=start, end=end, road_state=road_state,
+        min_lat=min_lat, max_lat=max_lat, min_lon=min_lon, max_lon=max_lon, limit=limit,
+    )
+    if format == "arrow":
+        # Arrow IPC stream, readable with pyarrow.ipc.open_stream
+        import pyarrow as pa
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(content=sink.getvalue().to_pybytes(), media_type="application/vnd.apache.arrow.stream")
+    return table.to_pylist()
+
+
+# Change feed
+def require_change_feed():
+    if change_feed is None:
+        raise HTTPException(status_code=404, detail="Change feed is disabled (CHANGE_FEED_ENABLED)")
+    return change_feed
+
+
+def read_changes(since: int, limit: int) -> list:
+    db = SessionLocal()
+    try:
+        if change_feed.is_gone(db, since):
+            raise HTTPException(status_code=410, detail=f"Changes after {since} are no longer kept, start from since=0")
+        return change_feed.read(db, since, limit)
+    finally:
+        db.close()
+
+
+@app.get("/changes/")
+async def get_changes(
+        since: int = Query(0, ge=0, description="Last sequence number seen, 0 for the whole log"),
+        limit: int = Query(1000, ge=1, le=10000),
+        timeout: float = Query(0, ge=0, le=60, description="Seconds to wait for new changes (long poll)"),
+        feed: ChangeFeed = Depends(require_change_feed),
+):
+    if timeout:
+        await feed.wait(since, timeout)
+    changes = await asyncio.to_thread(read_changes, since, limit)
+    last_seq = changes[-1].seq if changes else since
+    # The rows are stored as JSON, so the response is assembled without decoding them
+    content = f'{{"changes":[{",".join(event_json(change) for change in changes)}],"last_seq":{last_seq}}}'
+    return Response(content=content, media_type="application/json")
+
+
+@app.get("/changes/stream")
+async def stream_changes(
+        request: Request,
+        since: int = Query(0, ge=0, description="Last sequence number seen; the Last-Event-ID header takes precedence"),
+        feed: ChangeFeed = Depends(require_change_feed),
+):
+    """Server-sent events: one event per change, id is the sequence number"""
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    # Checked before the stream starts, while an error status can still be sent
+    await asyncio.to_thread(read_changes, since, 1)
+
+    async def events():
+        cursor = since
+        while not await request.is_disconnected():
+            if not await feed.wait(cursor, CHANGE_FEED_KEEPALIVE):
+                yield ": keep-alive\n\n"
+                continue
+            known = feed.last_seq
+            changes = await asyncio.to_thread(read_changes, cursor, 1000)
+            for change in changes:
+                yield f"id: {change.seq}\nevent: {change.op}\ndata: {event_json(change)}\n\n"
+            # Numbers up to `known` that are not in the log belong to rolled back transactions
+            cursor = changes[-1].seq if changes else max(cursor, known)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def prune_changes():
+    db = SessionLocal()
+    try:
+        deleted = change_feed.prune(db, before=datetime.now() - timedelta(seconds=CHANGE_FEED_RETENTION))
+    finally:
+        db.close()
+    if deleted:
+        logging.info(f"Pruned {deleted} change feed events")
+
+
+async def run_change_feed_pruner():
+    while True:
+        try:
+            await asyncio.to_thread(prune_changes)
+        except Exception as e:
+            logging.error(f"Pruning the change feed failed: {e}")
+        await asyncio.sleep(3600)
+
+
 # WebSocket Support
 class ConnectionManager:
     def __init__(self):
@@ -162,18 +613,111 @@ class ConnectionManager:
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.append(websocket)
+        WEBSOCKET_CONNECTIONS.set(len(self.active_connections))
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+        WEBSOCKET_CONNECTIONS.set(len(self.active_connections))
 
     async def broadcast(self, data: Dict[str, Any]):
-        for connection in self.active_connections:
-            await connection.send_text(json.dumps(data))
+        await self.broadcast_text(json.dumps(data))
+
+    async def broadcast_text(self, text: str):
+        for connection in list(self.active_connections):
+            try:
+                await connection.send_text(text)
+            except Exception:
+                # Closed in the meantime; its receive loop sees the disconnect too
+                self.disconnect(connection)
 
 
 manager = ConnectionManager()
 
 
+async def push_changes():
+    """Broadcast change feed events to the WebSocket clients connected at the time"""
+    cursor = change_feed.last_seq
+    while True:
+        # Nothing may end the task: it would stop pushing for the life of the process
+        try:
+            if not await change_feed.wait(cursor, 60):
+                continue
+            if not manager.active_connections:
+                cursor = change_feed.last_seq
+                continue
+            known = change_feed.last_seq
+            changes = await asyncio.to_thread(read_changes, cursor, 1000)
+            for change in changes:
+                await manager.broadcast_text(event_json(change))
+            cursor = changes[-1].seq if changes else max(cursor, known)
+        except Exception as e:
+            logging.error(f"Pushing change feed events failed: {e}")
+            await asyncio.sleep(1)
+
+
+def apply_change(change) -> None:
+    """Bring the hot store and the stats cache of this worker up to date with a change of any worker"""
+    data = json.loads(change.data) if change.data else None
+    if data is not None and data.get("timestamp"):
+        data["timestamp"] = datetime.fromisoformat(data["timestamp"])
+    if change.op == "insert":
+        timestamp = data.get("timestamp")
+        stats.cache.invalidate([timestamp] if timestamp is not None else None)
+        if hot_store is not None and timestamp is not None:
+            with maintaining_hot_store():
+                hot_store.append(data["id"], data["road_state"], data["x"], data["y"], data["z"],
+                                 data["latitude"], data["longitude"], timestamp)
+        return
+    stats.cache.invalidate()
+    if hot_store is None:
+        return
+    with maintaining_hot_store():
+        if change.op == "update":
+            hot_store.update(change.row_id, **{
+                key: value for key, value in data.items() if key in ProcessedAgentDataUpdate.model_fields
+            })
+        else:
+            hot_store.remove(change.row_id)
+
+
+async def follow_changes():
+    cursor = change_feed.last_seq
+    while True:
+        try:
+            if not await change_feed.wait(cursor, 60):
+                continue
+            known = change_feed.last_seq
+            changes = await asyncio.to_thread(read_changes, cursor, 1000)
+            for change in changes:
+                try:
+                    apply_change(change)
+                except Exception as e:
+                    # Skipped: a change that cannot be applied must not stop the ones after it
+                    logging.error(f"Applying change {change.seq} failed: {e}")
+            cursor = changes[-1].seq if changes else max(cursor, known)
+        except Exception as e:
+            logging.error(f"Following the change feed failed: {e}")
+            await asyncio.sleep(1)
+
+
+@app.on_event("startup")
+async def start_change_feed():
+    if change_feed is not None:
+        await change_feed.start(engine)
+        asyncio.create_task(push_changes())
+        if FOLLOW_CHANGES:
+            asyncio.create_task(follow_changes())
+        if STORE_MAINTENANCE:
+            asyncio.create_task(run_change_feed_pruner())
+
+
+@app.on_event("shutdown")
+def stop_change_feed():
+    if change_feed is not None:
+        change_feed.stop()
+
+
 @app.websocket("/ws/")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
@@ -0,0 +1,35 @@
+"""
+Maintenance process of the store: python -m src.maintenance [--init-only]
+
+Creates the tables, then runs the periodic maintenance (archiver, change feed
+pruner) until stopped. src.serve starts it next to the workers when there is
+more than one, so the maintenance runs once and the supervisor never imports
+the app. This process serves no requests: the hot store, the stats cache and
+the write coalescer are turned off in it.
+"""
+import asyncio
+import os
+import sys
+
+
+async def run_maintenance(store) -> None:
+    tasks = []
+    if store.ARCHIVE_ENABLED:
+        tasks.append(store.run_archiver())
+    if store.change_feed is not None:
+        tasks.append(store.run_change_feed_pruner())
+    await asyncio.gather(*tasks)
+
+
+def main():
+    # Read by the app when it is imported
+    os.environ.update(HOT_STORE_ENABLED="false", STATS_CACHE_SIZE="0", WRITE_COALESCE_WINDOW="0")
+    from . import main as store
+
+    store.init_db()
+    if "--init-only" not in sys.argv[1:]:
+        asyncio.run(run_maintenance(store))
+
+
+if __name__ == "__main__":
+    main()
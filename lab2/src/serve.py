@@ -0,0 +1,42 @@
+"""
+Production launch of the store API: python -m src.serve
+
+Serves the API with STORE_WORKERS uvicorn worker processes on
+STORE_HOST:STORE_PORT. Only the workers import the app; this process reads the
+settings alone. With one worker the app creates the tables and runs the
+periodic maintenance itself. With more, the tables are created once before the
+workers start, and the maintenance (archiver, change feed pruner) runs once, in
+a src.maintenance process, instead of once per worker. Writes of all workers
+still go through one commit at a time (the change feed's lock), so workers help
+only while requests, not the database, are the limit.
+"""
+import os
+import subprocess
+import sys
+
+import uvicorn
+
+from .config import STORE_HOST, STORE_PORT, STORE_WORKERS, STORE_MAINTENANCE
+
+
+def main():
+    app = f"{__package__}.main:app"
+    if STORE_WORKERS <= 1:
+        uvicorn.run(app, host=STORE_HOST, port=STORE_PORT)
+        return
+    maintenance = [sys.executable, "-m", f"{__package__}.maintenance"]
+    # Workers starting together would race to create the tables
+    subprocess.run(maintenance + ["--init-only"], check=True)
+    # Read by the workers when they import the app
+    os.environ["STORE_MAINTENANCE"] = "false"
+    process = subprocess.Popen(maintenance) if STORE_MAINTENANCE else None
+    try:
+        uvicorn.run(app, host=STORE_HOST, port=STORE_PORT, workers=STORE_WORKERS)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
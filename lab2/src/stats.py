@@ -0,0 +1,268 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+from sqlalchemy import Integer, case, cast, func, literal_column, select
+from sqlalchemy.orm import Session
+
+INTERVALS = ("hour", "day")
+
+
+@dataclass(frozen=True)
+class StatsFilter:
+    """Filters shared by all aggregations; hashable, so it is part of the cache key."""
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    min_lat: Optional[float] = None
+    max_lat: Optional[float] = None
+    min_lon: Optional[float] = None
+    max_lon: Optional[float] = None
+    user_id: Optional[int] = None
+
+    def conditions(self, model) -> List:
+        conditions = []
+        if self.start is not None:
+            conditions.append(model.timestamp >= self.start)
+        if self.end is not None:
+            conditions.append(model.timestamp < self.end)
+        if self.min_lat is not None:
+            conditions.append(model.latitude >= self.min_lat)
+        if self.max_lat is not None:
+            conditions.append(model.latitude <= self.max_lat)
+        if self.min_lon is not None:
+            conditions.append(model.longitude >= self.min_lon)
+        if self.max_lon is not None:
+            conditions.append(model.longitude <= self.max_lon)
+        if self.user_id is not None:
+            conditions.append(model.user_id == self.user_id)
+        return conditions
+
+
+class ResultCache:
+    """
+    LRU cache of aggregation results for closed time ranges (end older than
+    closed_after seconds), which do not change unless older rows are written.
+    A result is stored with the generation read before it was computed and is
+    dropped if an invalidation that may cover it came in meanwhile.
+    """
+
+    def __init__(self, capacity: int = 256, closed_after: float = 300.0, clock=time.time):
+        self.capacity = capacity
+        self.closed_after = closed_after
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._results: OrderedDict = OrderedDict()
+        # Latest `end` of a cached range: writes before it invalidate the cache
+        self._latest_end: Optional[datetime] = None
+        # Bumped by invalidations that may change results being computed
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def is_closed(self, filters: StatsFilter) -> bool:
+        if self.capacity == 0 or filters.end is None:
+            return False
+        return filters.end <= datetime.fromtimestamp(self.clock() - self.closed_after)
+
+    def get(self, key: Hashable):
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._results.move_to_end(key)
+            self.hits += 1
+            return result
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def put(self, key: Hashable, end: datetime, result, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._results[key] = result
+            self._results.move_to_end(key)
+            if len(self._results) > self.capacity:
+                self._results.popitem(last=False)
+            if self._latest_end is None or end > self._latest_end:
+                self._latest_end = end
+
+    def invalidate(self, timestamps: Optional[Iterable[datetime]] = None) -> None:
+        """Drop cached results that may include rows with these timestamps (all of them if not given)."""
+        if self.capacity == 0:
+            return
+        oldest = None
+        if timestamps is not None:
+            oldest = min(timestamps, default=None)
+            if oldest is None:
+                return
+        with self._lock:
+            # Rows in a range that is closed now may be in a result being computed
+            if oldest is None or oldest < datetime.fromtimestamp(self.clock() - self.closed_after):
+                self._generation += 1
+            if self._latest_end is None:
+                return
+            if oldest is not None and oldest >= self._latest_end:
+                return
+            self._results.clear()
+            self._latest_end = None
+
+
+class RoadStats:
+    """
+    Road quality aggregations computed in the database with GROUP BY, so that
+    clients get a few rows instead of every reading. Timestamps are bucketed
+    with date_trunc on Postgres and strftime on SQLite.
+
+    Days moved to the Parquet archive (and deleted from the database) are
+    aggregated there and added in, if `archive` returns the archive. It has
+    no user_id: per-vehicle statistics cover the database only, see
+    excludes_archived().
+    """
+
+    def __init__(self, model, dialect_name: str, cache: Optional[ResultCache] = None,
+                 archive: Optional[Callable[[], Any]] = None):
+        self.model = model
+        self.dialect_name = dialect_name
+        self.cache = cache if cache is not None else ResultCache(capacity=0)
+        self.archive = archive
+
+    def _archived_days(self, filters: StatsFilter) -> List:
+        archive = self.archive() if self.archive is not None else None
+        if archive is None:
+            return []
+        return [
+            day for day in archive.days()
+            if (filters.start is None or day >= filters.start.date())
+            and (filters.end is None or datetime.combine(day, datetime.min.time()) < filters.end)
+        ]
+
+    def _archive_for(self, filters: StatsFilter):
+        """The archive if it has days in the range and the filters can be applied to it"""
+        if filters.user_id is not None or not self._archived_days(filters):
+            return None
+        return self.archive()
+
+    def excludes_archived(self, filters: StatsFilter) -> bool:
+        """True if archived days in the range are left out (user_id filter)"""
+        return filters.user_id is not None and bool(self._archived_days(filters))
+
+    def _cached(self, name: str, filters: StatsFilter, params: tuple, compute):
+        if not self.cache.is_closed(filters):
+            return compute()
+        key = (name, filters, params)
+        generation = self.cache.generation
+        result = self.cache.get(key)
+        if result is None:
+            result = compute()
+            self.cache.put(key, filters.end, result, generation)
+        return result
+
+    def road_state_counts(self, db: Session, filters: StatsFilter) -> List[Dict[str, Any]]:
+        def compute():
+            model = self.model
+            query = select(model.road_state, func.count()) \
+                .where(*filters.conditions(model)) \
+                .group_by(model.road_state)
+            counts: Dict[str, int] = {}
+            for road_state, count in self._with_archived(db.execute(query).all(), filters,
+                                                         lambda archive: archive.road_state_counts(filters)):
+                counts[road_state] = counts.get(road_state, 0) + count
+            return [{"road_state": road_state, "count": counts[road_state]} for road_state in sorted(counts)]
+
+        return self._cached("road_state", filters, (), compute)
+
+    def z_histogram(self, db: Session, filters: StatsFilter, bin_width: float, bins: int) -> List[Dict[str, Any]]:
+        """Counts of |z| in bins of bin_width; the last bin also holds everything above it."""
+        def compute():
+            model = self.model
+            # Inline constants: Postgres only matches the GROUP BY expression to the selected one
+            # without bind parameters. |z| >= 0, so truncating to an integer is floor
+            last = literal_column(str(int(bins) - 1))
+            index = self._floor(func.abs(model.z) / literal_column(repr(float(bin_width))))
+            index = case((index >= last, last), else_=index).label("bin")
+            query = select(index, func.count()) \
+                .where(model.z.is_not(None), *filters.conditions(model)) \
+                .group_by(index)
+            counts: Dict[int, int] = {}
+            for bin_index, count in self._with_archived(db.execute(query).all(), filters,
+                                                        lambda archive: archive.z_histogram(filters, bin_width, bins)):
+                counts[bin_index] = counts.get(bin_index, 0) + count
+            return [
+                {
+                    "from": round(bin_index * bin_width, 9),
+                    "to": round((bin_index + 1) * bin_width, 9) if bin_index < bins - 1 else None,
+                    "count": counts[bin_index],
+                }
+                for bin_index in sorted(counts)
+            ]
+
+        return self._cached("z_histogram", filters, (bin_width, bins), compute)
+
+    def time_series(self, db: Session, filters: StatsFilter, interval: str) -> List[Dict[str, Any]]:
+        """Per hour or day: readings by road_state, mean and max |z|."""
+        if interval not in INTERVALS:
+            raise ValueError(f"Unknown interval {interval!r}, expected one of {INTERVALS}")
+
+        def compute():
+            model = self.model
+            bucket = self._truncate(model.timestamp, interval).label("bucket")
+            abs_z = func.abs(model.z)
+            query = select(bucket, model.road_state, func.count(), func.sum(abs_z), func.count(model.z),
+                           func.max(abs_z)) \
+                .where(*filters.conditions(model)) \
+                .group_by(bucket, model.road_state)
+            series: Dict[datetime, Dict[str, Any]] = {}
+            rows = self._with_archived(db.execute(query).all(), filters,
+                                       lambda archive: archive.time_series(filters, interval))
+            for start, road_state, count, sum_abs_z, count_z, max_abs_z in rows:
+                if isinstance(start, str):
+                    start = datetime.fromisoformat(start)
+                point = series.get(start)
+                if point is None:
+                    point = series[start] = {
+                        "start": start, "count": 0, "road_state": {},
+                        "sum_abs_z": 0.0, "count_z": 0, "max_abs_z": None,
+                    }
+                point["count"] += count
+                point["road_state"][road_state] = point["road_state"].get(road_state, 0) + count
+                point["sum_abs_z"] += sum_abs_z or 0.0
+                point["count_z"] += count_z
+                if max_abs_z is not None and (point["max_abs_z"] is None or max_abs_z > point["max_abs_z"]):
+                    point["max_abs_z"] = max_abs_z
+            step = timedelta(hours=1) if interval == "hour" else timedelta(days=1)
+            return [
+                {
+                    "start": point["start"],
+                    "end": point["start"] + step,
+                    "count": point["count"],
+                    "road_state": point["road_state"],
+                    "mean_abs_z": point["sum_abs_z"] / point["count_z"] if point["count_z"] else None,
+                    "max_abs_z": point["max_abs_z"],
+                }
+                for point in sorted(series.values(), key=lambda point: point["start"])
+            ]
+
+        return self._cached("time_series", filters, (interval,), compute)
+
+    def _with_archived(self, rows: List, filters: StatsFilter, aggregate) -> List:
+        archive = self._archive_for(filters)
+        return rows if archive is None else list(rows) + aggregate(archive)
+
+    def _floor(self, value):
+        if self.dialect_name == "postgresql":
+            return cast(func.floor(value), Integer)
+        return cast(value, Integer)
+
+    def _truncate(self, timestamp, interval: str):
+        if self.dialect_name == "postgresql":
+            return func.date_trunc(literal_column(f"'{interval}'"), timestamp)
+        return func.strftime("%Y-%m-%d %H:00:00" if interval == "hour" else "%Y-%m-%d 00:00:00", timestamp)
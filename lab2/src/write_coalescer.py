@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+
+class WriteCoalescer:
+    """
+    Group commit for single-row writes: rows submitted by concurrent requests
+    within `window` seconds of the first one (or until max_batch rows are
+    waiting) are written together by one call of `write`, i.e. one multi-row
+    INSERT and one commit instead of one per request. One write is in flight
+    at a time; rows that arrive meanwhile go into the next one, written as
+    soon as it finishes.
+
+    `write` runs in a worker thread and returns the rows actually inserted;
+    each caller gets back its own row, matched by `key` (by id order for rows
+    without one), or None if the row was not inserted (a duplicate). If a
+    batch fails, its rows are retried one by one so that only the callers of
+    the failing rows see the error.
+    """
+
+    def __init__(self, write: Callable[[List[Dict[str, Any]]], list], window: float = 0.005,
+                 max_batch: int = 500, key: str = "reading_key"):
+        self.write = write
+        self.window = window
+        self.max_batch = max_batch
+        self.key = key
+        self._rows: List[Dict[str, Any]] = []
+        self._futures: List[asyncio.Future] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The task writing batches, None when idle
+        self._writer: Optional[asyncio.Task] = None
+
+    async def submit(self, row: Dict[str, Any]):
+        """Queue the row for the next write; returns the inserted row or None"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._rows.append(row)
+        self._futures.append(future)
+        if self._writer is None:
+            if len(self._rows) >= self.max_batch:
+                self.flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self) -> None:
+        """Start writing the waiting rows now, unless a write is in flight (it takes them next)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._writer is None and self._rows:
+            self._writer = asyncio.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        try:
+            while self._rows:
+                rows, futures = self._rows[:self.max_batch], self._futures[:self.max_batch]
+                del self._rows[:self.max_batch], self._futures[:self.max_batch]
+                await self._write(rows, futures)
+        finally:
+            self._writer = None
+
+    async def _write(self, rows: List[Dict[str, Any]], futures: List[asyncio.Future]) -> None:
+        try:
+            inserted = await asyncio.to_thread(self.write, rows)
+        except Exception as e:
+            if len(rows) == 1:
+                self._resolve(futures[0], exception=e)
+                return
+            logging.warning(f"Coalesced write of {len(rows)} rows failed, writing them one by one: {e}")
+            for row, future in zip(rows, futures):
+                await self._write([row], [future])
+            return
+        by_key = {}
+        unkeyed = []
+        for row in inserted:
+            if getattr(row, self.key) is None:
+                unkeyed.append(row)
+            else:
+                by_key[getattr(row, self.key)] = row
+        # Rows without a key are never duplicates; ids are assigned in the order of the rows
+        unkeyed = iter(sorted(unkeyed, key=lambda row: row.id))
+        for row, future in zip(rows, futures):
+            if row.get(self.key) is None:
+                self._resolve(future, result=next(unkeyed, None))
+            else:
+                # The same key twice in a batch: the first caller gets the row, the rest see a duplicate
+                self._resolve(future, result=by_key.pop(row[self.key], None))
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result=None, exception: Optional[Exception] = None) -> None:
+        # The request may have been cancelled (client gone) while its row was written
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    async def close(self) -> None:
+        """Write the waiting rows and wait for the write in flight"""
+        self.flush()
+        if self._writer is not None:
+            await self._writer
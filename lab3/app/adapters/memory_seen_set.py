@@ -0,0 +1,29 @@
+from collections import OrderedDict
+
+from app.interfaces.seen_set_gateway import SeenSetGateway
+
+
+class MemorySeenSet(SeenSetGateway):
+    """Last `capacity` keys seen by this process; the least recently seen are forgotten first."""
+
+    def __init__(self, capacity: int = 100_000):
+        self.capacity = capacity
+        self._keys: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add_local(self, key: str) -> bool:
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return False
+        self._keys[key] = None
+        if len(self._keys) > self.capacity:
+            self._keys.popitem(last=False)
+        return True
+
+    async def add(self, key: str) -> bool:
+        return self.add_local(key)
+
+    async def discard(self, key: str) -> None:
+        self._keys.pop(key, None)
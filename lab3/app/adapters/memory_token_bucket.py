@@ -0,0 +1,47 @@
+import time
+from collections import OrderedDict
+
+from app.interfaces.rate_limiter_gateway import RateLimiterGateway
+
+
+class MemoryTokenBucket(RateLimiterGateway):
+    """
+    Token buckets of this process: `rate` tokens per second per key, at most `burst`
+    saved up. Buckets of the `capacity` most recently seen keys are kept; a
+    forgotten key starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: float, capacity: int = 100_000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.capacity = capacity
+        self.clock = clock
+        # key -> [tokens, time of the last refill]
+        self._buckets: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire_local(self, key: str) -> bool:
+        now = self.clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            if len(self._buckets) > self.capacity:
+                self._buckets.popitem(last=False)
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    async def acquire(self, key: str) -> bool:
+        return self.acquire_local(key)
+
+    async def refund(self, key: str) -> None:
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket[0] = min(self.burst, bucket[0] + 1)
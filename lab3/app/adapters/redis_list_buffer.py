@@ -0,0 +1,56 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from redis.asyncio import Redis
+
+from common import codecs
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.interfaces.buffer_gateway import BufferGateway
+
+
+class RedisListBuffer(BufferGateway):
+    """
+    Buffer on a plain Redis list. Items are removed as soon as they are popped,
+    so there is nothing to acknowledge; a batch that could not be delivered is
+    pushed back to the end that is read first. Items are stored as JSON or, if binary,
+    in the binary format of common.codecs.
+    """
+
+    def __init__(self, redis_client: Redis, key: str = "processed_agent_data", binary: bool = False):
+        self.redis_client = redis_client
+        self.key = key
+        self.encode = codecs.pack if binary else ProcessedAgentData.model_dump_json
+
+    async def push(self, processed_agent_data: ProcessedAgentData) -> None:
+        await self.redis_client.lpush(self.key, self.encode(processed_agent_data))
+
+    async def read_batch(self, batch_size: int) -> List[Tuple[Optional[str], ProcessedAgentData]]:
+        if await self.redis_client.llen(self.key) < batch_size:
+            return []
+        # One round trip for the whole batch (LPOP with a count, Redis >= 6.2)
+        raw_items = await self.redis_client.lpop(self.key, batch_size) or []
+        return self._parse(raw_items)
+
+    def _parse(self, raw_items) -> List[Tuple[Optional[str], ProcessedAgentData]]:
+        # The items are already popped: a malformed one is dropped, the rest of the batch goes on
+        entries = []
+        for raw in raw_items:
+            try:
+                entries.append((None, codecs.unpack(raw)))
+            except ValueError as e:
+                logging.error(f"Dropping malformed list item from {self.key}: {e}")
+        return entries
+
+    async def ack(self, entry_ids: List[Optional[str]]) -> None:
+        pass
+
+    async def release(self, batch: List[Tuple[Optional[str], ProcessedAgentData]]) -> None:
+        # LPUSH of the reversed batch puts it back in the order LPOP returned it
+        if batch:
+            await self.redis_client.lpush(self.key, *(self.encode(item) for _, item in reversed(batch)))
+
+    async def length(self) -> int:
+        return await self.redis_client.llen(self.key)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {"backend": "list", "length": await self.redis_client.llen(self.key)}
@@ -0,0 +1,36 @@
+from typing import Optional
+
+from redis.asyncio import Redis
+
+from app.adapters.memory_seen_set import MemorySeenSet
+from app.interfaces.seen_set_gateway import SeenSetGateway
+
+
+class RedisSeenSet(SeenSetGateway):
+    """
+    Keys seen by any hub instance in the last `ttl` seconds: one SET NX EX per key.
+    A MemorySeenSet in front answers repeats seen by this instance without a round trip.
+    """
+
+    def __init__(self, redis_client: Redis, ttl: int = 3600, prefix: str = "seen",
+                 local: Optional[MemorySeenSet] = None):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.local = local
+
+    async def add(self, key: str) -> bool:
+        if self.local is not None and not self.local.add_local(key):
+            return False
+        try:
+            return bool(await self.redis_client.set(f"{self.prefix}:{key}", 1, nx=True, ex=self.ttl))
+        except BaseException:
+            # Not recorded in Redis (error or cancelled): forget it here too, so that a retry is accepted
+            if self.local is not None:
+                await self.local.discard(key)
+            raise
+
+    async def discard(self, key: str) -> None:
+        if self.local is not None:
+            await self.local.discard(key)
+        await self.redis_client.delete(f"{self.prefix}:{key}")
@@ -0,0 +1,217 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from common import codecs
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.interfaces.buffer_gateway import BufferGateway
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class RedisStreamBuffer(BufferGateway):
+    """
+    Buffer on a Redis Stream with a consumer group.
+
+    Entries are delivered with XREADGROUP and stay in the pending entries list
+    until they are acknowledged with XACK, so a failed store call does not lose
+    data. The consumer reads its own pending entries again (XREADGROUP from id 0)
+    when it starts and after a batch is released, so a failed batch is retried
+    on the next flush. Entries left pending by a dead worker are taken over with
+    XAUTOCLAIM once they have been idle for claim_idle_ms. Several hub workers may share
+    the same group; each of them must use a unique consumer name. Items are
+    stored as JSON or, if binary, in the binary format of common.codecs.
+    """
+
+    DATA_FIELD = "data"
+
+    def __init__(
+        self,
+        redis_client: Redis,
+        stream: str = "processed_agent_data_stream",
+        group: str = "hub",
+        consumer: str = "hub-1",
+        maxlen: Optional[int] = 100000,
+        claim_idle_ms: int = 60000,
+        binary: bool = False,
+    ):
+        self.redis_client = redis_client
+        self.encode = codecs.pack if binary else ProcessedAgentData.model_dump_json
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer
+        self.maxlen = maxlen
+        self.claim_idle_ms = claim_idle_ms
+        # Entries delivered to this consumer but not yet forming a full batch
+        self._held: List[Tuple[str, ProcessedAgentData]] = []
+        # Entries returned by read_batch and neither acknowledged nor released yet
+        self._in_flight: Set[str] = set()
+        # This consumer has pending entries to read again: left by a previous run under
+        # the same name, or released after a failed delivery
+        self._read_own_pending = True
+        self._claim_cursor = "0-0"
+        self._lock = asyncio.Lock()
+        self._group_created = False
+
+    async def _ensure_group(self):
+        if self._group_created:
+            return
+        try:
+            await self.redis_client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_created = True
+
+    async def push(self, processed_agent_data: ProcessedAgentData) -> None:
+        await self.redis_client.xadd(
+            self.stream,
+            {self.DATA_FIELD: self.encode(processed_agent_data)},
+            maxlen=self.maxlen,
+            approximate=True,
+        )
+
+    async def read_batch(self, batch_size: int) -> List[Tuple[Optional[str], ProcessedAgentData]]:
+        await self._ensure_group()
+        async with self._lock:
+            missing = batch_size - len(self._held)
+            if missing > 0 and self._read_own_pending:
+                self._held.extend(await self._read_pending(missing))
+                missing = batch_size - len(self._held)
+            if missing > 0:
+                self._held.extend(await self._reclaim(missing))
+                missing = batch_size - len(self._held)
+            if missing > 0:
+                self._held.extend(await self._read_new(missing))
+            if len(self._held) < batch_size:
+                await self._touch_held()
+                return []
+            batch, self._held = self._held[:batch_size], self._held[batch_size:]
+            self._in_flight.update(entry_id for entry_id, _ in batch)
+            return batch
+
+    async def ack(self, entry_ids: List[Optional[str]]) -> None:
+        ids = [entry_id for entry_id in entry_ids if entry_id is not None]
+        self._in_flight.difference_update(ids)
+        if ids:
+            await self.redis_client.xack(self.stream, self.group, *ids)
+
+    async def release(self, batch: List[Tuple[Optional[str], ProcessedAgentData]]) -> None:
+        # The entries are still pending for this consumer; the next read_batch reads them again
+        self._in_flight.difference_update(entry_id for entry_id, _ in batch)
+        self._read_own_pending = True
+
+    async def length(self) -> int:
+        # Acknowledged entries stay in the stream until it is trimmed: count the pending
+        # ones and the group's lag instead; Redis < 7 reports no lag, then the whole stream
+        await self._ensure_group()
+        for group in await self.redis_client.xinfo_groups(self.stream):
+            if _decode(group["name"]) == self.group and group.get("lag") is not None:
+                return group["pending"] + group["lag"]
+        return await self.redis_client.xlen(self.stream)
+
+    async def stats(self) -> Dict[str, Any]:
+        await self._ensure_group()
+        groups = {
+            _decode(group["name"]): group
+            for group in await self.redis_client.xinfo_groups(self.stream)
+        }
+        group = groups.get(self.group, {})
+        consumers = await self.redis_client.xinfo_consumers(self.stream, self.group)
+        return {
+            "backend": "stream",
+            "length": await self.redis_client.xlen(self.stream),
+            "group": self.group,
+            "pending": group.get("pending", 0),
+            # Reported by Redis >= 7.0 only
+            "lag": group.get("lag"),
+            "consumers": [
+                {
+                    "name": _decode(consumer["name"]),
+                    "pending": consumer["pending"],
+                    "idle_ms": consumer["idle"],
+                }
+                for consumer in consumers
+            ],
+        }
+
+    async def _read_new(self, count: int) -> List[Tuple[str, ProcessedAgentData]]:
+        response = await self.redis_client.xreadgroup(
+            self.group, self.consumer, {self.stream: ">"}, count=count
+        )
+        entries = []
+        for _, messages in response or []:
+            entries.extend(await self._parse(messages))
+        return entries
+
+    async def _read_pending(self, count: int) -> List[Tuple[str, ProcessedAgentData]]:
+        """Up to count of this consumer's pending entries, except the held and in-flight ones"""
+        skip = self._in_flight.union(entry_id for entry_id, _ in self._held)
+        cursor = "0-0"
+        entries = []
+        while len(entries) < count:
+            response = await self.redis_client.xreadgroup(
+                self.group, self.consumer, {self.stream: cursor}, count=count
+            )
+            messages = [message for _, stream_messages in response or [] for message in stream_messages]
+            if not messages:
+                # Read to the end of the pending list
+                self._read_own_pending = False
+                break
+            cursor = _decode(messages[-1][0])
+            entries.extend(await self._parse(
+                [message for message in messages if _decode(message[0]) not in skip]
+            ))
+        if entries:
+            logging.info(f"Re-reading {len(entries)} pending entries from stream {self.stream}")
+        return entries
+
+    async def _reclaim(self, count: int) -> List[Tuple[str, ProcessedAgentData]]:
+        response = await self.redis_client.xautoclaim(
+            self.stream,
+            self.group,
+            self.consumer,
+            min_idle_time=self.claim_idle_ms,
+            start_id=self._claim_cursor,
+            count=count,
+        )
+        self._claim_cursor = _decode(response[0])
+        entries = await self._parse(response[1])
+        if entries:
+            logging.info(f"Reclaimed {len(entries)} pending entries from stream {self.stream}")
+        return entries
+
+    async def _touch_held(self):
+        # Reset the idle time of held entries so other workers do not reclaim them
+        if self._held:
+            await self.redis_client.xclaim(
+                self.stream,
+                self.group,
+                self.consumer,
+                0,
+                [entry_id for entry_id, _ in self._held],
+                justid=True,
+            )
+
+    async def _parse(self, messages) -> List[Tuple[str, ProcessedAgentData]]:
+        entries = []
+        for entry_id, fields in messages:
+            entry_id = _decode(entry_id)
+            raw = None
+            if fields:
+                raw = fields.get(self.DATA_FIELD.encode()) or fields.get(self.DATA_FIELD)
+            if raw is None:
+                # The entry was trimmed away (MAXLEN) while it was pending
+                await self.ack([entry_id])
+                continue
+            try:
+                entries.append((entry_id, codecs.unpack(raw)))
+            except ValueError as e:
+                logging.error(f"Dropping malformed stream entry {entry_id}: {e}")
+                await self.ack([entry_id])
+        return entries
@@ -0,0 +1,62 @@
+import math
+
+from redis.asyncio import Redis
+
+from app.interfaces.rate_limiter_gateway import RateLimiterGateway
+
+# Refill and take in one step on the server, with the server's clock, so every hub
+# instance shares the same buckets. Returns 1 if a token was taken.
+ACQUIRE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+if tokens == nil then
+    tokens = burst
+else
+    tokens = math.min(burst, tokens + math.max(0, now - tonumber(bucket[2])) * rate)
+end
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[3]))
+return allowed
+"""
+
+# Give back one token, up to the burst; a bucket that has expired meanwhile is full anyway
+REFUND_SCRIPT = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens ~= nil then
+    redis.call('HSET', KEYS[1], 'tokens', tostring(math.min(tonumber(ARGV[1]), tokens + 1)))
+end
+return 0
+"""
+
+
+class RedisTokenBucket(RateLimiterGateway):
+    """
+    Token buckets shared by all hub instances: one hash per key with the tokens
+    left and the time of the last refill, updated by a Lua script (one round trip
+    per reading). A bucket expires once it would be full again.
+    """
+
+    def __init__(self, redis_client: Redis, rate: float, burst: float, prefix: str = "rate"):
+        self.redis_client = redis_client
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.prefix = prefix
+        self.ttl_ms = math.ceil(self.burst / rate * 1000) + 1000
+        self.script = redis_client.register_script(ACQUIRE_SCRIPT)
+        self.refund_script = redis_client.register_script(REFUND_SCRIPT)
+
+    async def acquire(self, key: str) -> bool:
+        allowed = await self.script(keys=[f"{self.prefix}:{key}"], args=[self.rate, self.burst, self.ttl_ms])
+        return allowed == 1
+
+    async def refund(self, key: str) -> None:
+        await self.refund_script(keys=[f"{self.prefix}:{key}"], args=[self.burst])
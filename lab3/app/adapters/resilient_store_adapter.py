@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from redis.asyncio import Redis
+
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.interfaces.store_gateway import StoreGateway, StoreRejected
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for calls to a remote service.
+
+    closed    - calls go through, consecutive failures are counted;
+    open      - calls are rejected until reset_timeout seconds have passed;
+    half_open - a single trial call is let through, its result closes or reopens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = self.CLOSED
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._trial_in_progress = False
+            return self._state
+
+    def allow_request(self) -> bool:
+        state = self.state
+        with self._lock:
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._state = self.CLOSED
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logging.error(f"Circuit opened after {self.failures} consecutive failures")
+                self._state = self.OPEN
+                self.opened_at = self.clock()
+                self._trial_in_progress = False
+
+    def release_trial(self):
+        """End a half-open trial that neither succeeded nor failed, so the next call becomes the trial"""
+        with self._lock:
+            self._trial_in_progress = False
+
+
+class RedisDeadLetterQueue:
+    """
+    Redis list with batches that could not be delivered to the store.
+    Every entry keeps the failed batch together with the failure reason and time.
+    """
+
+    def __init__(self, redis_client: Redis, key: str = "processed_agent_data:dead_letter"):
+        self.redis_client = redis_client
+        self.key = key
+
+    async def push(self, processed_agent_data_batch: List[ProcessedAgentData], reason: str) -> None:
+        entry = {
+            "reason": reason,
+            "failed_at": datetime.now(timezone.utc).isoformat(),
+            "items": [item.model_dump(mode="json") for item in processed_agent_data_batch],
+        }
+        await self.redis_client.rpush(self.key, json.dumps(entry))
+
+    async def peek(self) -> Optional[List[ProcessedAgentData]]:
+        raw = await self.redis_client.lindex(self.key, 0)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return [ProcessedAgentData.model_validate(item) for item in entry["items"]]
+
+    async def drop_head(self) -> None:
+        await self.redis_client.lpop(self.key)
+
+    async def size(self) -> int:
+        return await self.redis_client.llen(self.key)
+
+
+class ResilientStoreAdapter(StoreGateway):
+    """
+    Store gateway decorator that retries failed saves with jittered exponential
+    backoff, stops calling a failing store through a circuit breaker and parks
+    batches that still could not be saved in a dead-letter queue. A batch the
+    store rejects as invalid is dead-lettered at once and is not counted as a
+    store failure.
+
+    save_data returns True when the batch was either saved or dead-lettered,
+    i.e. when it is safe to drop it from the ingest buffer.
+    """
+
+    def __init__(
+        self,
+        store_gateway: StoreGateway,
+        dead_letter_queue: RedisDeadLetterQueue,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        max_attempts: int = 3,
+        base_delay: float = 0.2,
+        max_delay: float = 5.0,
+        sleep=asyncio.sleep,
+    ):
+        self.store_gateway = store_gateway
+        self.dead_letter_queue = dead_letter_queue
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self._replay_lock = asyncio.Lock()
+
+    async def save_data(self, processed_agent_data_batch: List[ProcessedAgentData]) -> bool:
+        try:
+            if await self._deliver(processed_agent_data_batch):
+                return True
+            reason = "circuit open" if self.circuit_breaker.state == CircuitBreaker.OPEN else "retries exhausted"
+        except StoreRejected as e:
+            reason = f"rejected: {e}"
+        try:
+            await self.dead_letter_queue.push(processed_agent_data_batch, reason)
+            logging.error(f"Moved batch of {len(processed_agent_data_batch)} items to dead-letter queue: {reason}")
+            return True
+        except Exception as e:
+            logging.error(f"Failed to write batch to dead-letter queue: {e}")
+            return False
+
+    async def replay_dead_letters(self, limit: int = 100) -> Dict[str, Any]:
+        """
+        Re-send up to limit dead-lettered batches in FIFO order.
+        Stops at the first batch that still can not be saved; a batch the store
+        rejects is moved to the tail, so it does not block the ones behind it.
+        """
+        replayed = 0
+        rejected = 0
+        async with self._replay_lock:
+            # One pass at most: rejected batches come back around at the tail
+            limit = min(limit, await self.dead_letter_queue.size())
+            while replayed + rejected < limit:
+                batch = await self.dead_letter_queue.peek()
+                if batch is None:
+                    break
+                try:
+                    if not await self._deliver(batch):
+                        break
+                except StoreRejected as e:
+                    await self.dead_letter_queue.push(batch, f"rejected: {e}")
+                    await self.dead_letter_queue.drop_head()
+                    rejected += 1
+                    continue
+                await self.dead_letter_queue.drop_head()
+                replayed += 1
+        return {
+            "replayed": replayed,
+            "rejected": rejected,
+            "remaining": await self.dead_letter_queue.size(),
+            "circuit": self.circuit_breaker.state,
+        }
+
+    async def _deliver(self, processed_agent_data_batch: List[ProcessedAgentData]) -> bool:
+        for attempt in range(self.max_attempts):
+            if not self.circuit_breaker.allow_request():
+                return False
+            trial = self.circuit_breaker.state == CircuitBreaker.HALF_OPEN
+            try:
+                try:
+                    saved = await self.store_gateway.save_data(processed_agent_data_batch)
+                except StoreRejected:
+                    # The store is up and answered; only this batch is bad
+                    raise
+                except Exception as e:
+                    logging.error(f"Store call failed: {e}")
+                    saved = False
+                if saved:
+                    self.circuit_breaker.record_success()
+                    return True
+                self.circuit_breaker.record_failure()
+            finally:
+                # A rejected or cancelled trial must not keep the circuit half-open forever
+                if trial:
+                    self.circuit_breaker.release_trial()
+            if attempt + 1 < self.max_attempts:
+                await self.sleep(self._backoff(attempt))
+        return False
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": uniformly random delay up to the exponential cap
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
@@ -1,48 +1,62 @@
-import json
 import logging
 from typing import List
-from datetime import datetime
-
-import pydantic_core
-import requests
 
+from common.codecs import dumps_batch_json
 from app.entities.processed_agent_data import ProcessedAgentData
-from app.interfaces.store_gateway import StoreGateway
+from app.interfaces.store_gateway import StoreGateway, StoreRejected
 
 
 class StoreApiAdapter(StoreGateway):
-    def __init__(self, api_base_url):
+    """
+    Store API client on one shared httpx.AsyncClient (keep-alive connection pool).
+    A batch is sent in one request to the bulk endpoint, which skips readings whose
+    key is already stored, so a retried batch never creates duplicate rows. The
+    store accepts the shared schema as is, so the batch is serialized in one call.
+    The client is created by the first batch: httpx and httpcore are a large share
+    of the hub's import time and are not needed to accept readings.
+    """
+
+    HEADERS = {"Content-Type": "application/json"}
+    # Client errors that are worth retrying: the batch itself may be fine
+    RETRYABLE_CLIENT_ERRORS = {408, 429}
+
+    def __init__(self, api_base_url, timeout: float = 10.0, max_connections: int = 10, client=None):
         self.api_base_url = api_base_url
-
-    def save_data(self, processed_agent_data_batch: List[ProcessedAgentData]):
-        endpoint = f"{self.api_base_url}/processed_agent_data"
-        success = True
-
-        for item in processed_agent_data_batch:
-            try:
-                # Перетворюємо модель в словник
-                data = item.model_dump(mode='json')
-
-                # Перетворюємо timestamp з рядка в ціле число
-                if isinstance(data["agent_data"]["timestamp"], str):
-                    timestamp_str = data["agent_data"]["timestamp"]
-                    dt = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                    data["agent_data"]["timestamp"] = int(dt.timestamp() * 1000)
-
-                # Відправка даних
-                response = requests.post(endpoint, json=data)
-
-                if response.status_code != 200:
-                    logging.error(f"Failed to save item to Store API: {response.status_code}, {response.text}")
-                    success = False
-                else:
-                    logging.info(f"Successfully saved item to Store API")
-
-            except Exception as e:
-                logging.error(f"Failed to save item to Store API: {str(e)}")
-                success = False
-
-        return success
-
-
-
+        self.timeout = timeout
+        self.max_connections = max_connections
+        # httpx.AsyncClient
+        self.client = client
+
+    def get_client(self):
+        if self.client is None:
+            import httpx
+            self.client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self.client
+
+    async def save_data(self, processed_agent_data_batch: List[ProcessedAgentData]):
+        endpoint = f"{self.api_base_url}/processed_agent_data/batch"
+        try:
+            content = dumps_batch_json(processed_agent_data_batch)
+
+            # Відправка даних
+            response = await self.get_client().post(endpoint, content=content, headers=self.HEADERS)
+
+        except Exception as e:
+            logging.error(f"Failed to save batch to Store API: {str(e)}")
+            return False
+
+        if response.status_code != 200:
+            if 400 <= response.status_code < 500 and response.status_code not in self.RETRYABLE_CLIENT_ERRORS:
+                raise StoreRejected(f"Store API rejected batch: {response.status_code}, {response.text}")
+            logging.error(f"Failed to save batch to Store API: {response.status_code}, {response.text}")
+            return False
+
+        return True
+
+    async def aclose(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
@@ -1,8 +1,4 @@
-from pydantic import BaseModel
+# The reading schema is shared by all services and defined once in common.entities
+from common.entities import ProcessedAgentData
 
-from app.entities.agent_data import AgentData
-
-
-class ProcessedAgentData(BaseModel):
-    road_state: str
-    agent_data: AgentData
\ No newline at end of file
+__all__ = ["ProcessedAgentData"]
@@ -0,0 +1,68 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.entities.processed_agent_data import ProcessedAgentData
+
+
+class BufferGateway(ABC):
+    """
+    Abstract class representing the ingest buffer between MQTT and the Store API.
+    All buffer adapters must implement these methods; they run on the hub's event loop.
+    """
+
+    @abstractmethod
+    async def push(self, processed_agent_data: ProcessedAgentData) -> None:
+        """
+        Method to append the processed agent data to the buffer.
+        Parameters:
+            processed_agent_data (ProcessedAgentData): The processed agent data to be buffered.
+        """
+        pass
+
+    @abstractmethod
+    async def read_batch(self, batch_size: int) -> List[Tuple[Optional[str], ProcessedAgentData]]:
+        """
+        Method to take a full batch from the buffer.
+        Parameters:
+            batch_size (int): Number of items that forms a full batch.
+        Returns:
+            List[Tuple[Optional[str], ProcessedAgentData]]: Entry ids with the buffered data,
+            or an empty list if a full batch is not available yet.
+        """
+        pass
+
+    @abstractmethod
+    async def ack(self, entry_ids: List[Optional[str]]) -> None:
+        """
+        Method to confirm that the entries were saved and can be dropped from the buffer.
+        Parameters:
+            entry_ids (List[Optional[str]]): Entry ids returned by read_batch.
+        """
+        pass
+
+    @abstractmethod
+    async def release(self, batch: List[Tuple[Optional[str], ProcessedAgentData]]) -> None:
+        """
+        Method to give back a batch whose delivery failed, so that read_batch returns it again.
+        Parameters:
+            batch (List[Tuple[Optional[str], ProcessedAgentData]]): The batch returned by read_batch.
+        """
+        pass
+
+    @abstractmethod
+    async def length(self) -> int:
+        """
+        Method to count the items in the buffer, including ones read but not acknowledged yet.
+        Returns:
+            int: Number of items.
+        """
+        pass
+
+    @abstractmethod
+    async def stats(self) -> Dict[str, Any]:
+        """
+        Method to describe the buffer state (length, pending entries, lag).
+        Returns:
+            Dict[str, Any]: Buffer statistics.
+        """
+        pass
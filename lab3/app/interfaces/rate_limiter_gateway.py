@@ -0,0 +1,29 @@
+from abc import ABC, abstractmethod
+
+
+class RateLimiterGateway(ABC):
+    """
+    Abstract class representing token buckets keyed by name (a vehicle, or one
+    key for the whole hub), used to admit readings before they are buffered.
+    All rate limiter adapters must implement these methods.
+    """
+
+    @abstractmethod
+    async def acquire(self, key: str) -> bool:
+        """
+        Method to take one token from the bucket of the key.
+        Parameters:
+            key (str): Bucket key.
+        Returns:
+            bool: True if a token was available, False if the key is over its rate.
+        """
+        pass
+
+    @abstractmethod
+    async def refund(self, key: str) -> None:
+        """
+        Method to give back a token taken by acquire, when the reading was refused after all.
+        Parameters:
+            key (str): Bucket key.
+        """
+        pass
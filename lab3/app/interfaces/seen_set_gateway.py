@@ -0,0 +1,29 @@
+from abc import ABC, abstractmethod
+
+
+class SeenSetGateway(ABC):
+    """
+    Abstract class representing a bounded set of recently seen reading keys,
+    used to drop duplicate readings before they reach the buffer.
+    All seen set adapters must implement these methods.
+    """
+
+    @abstractmethod
+    async def add(self, key: str) -> bool:
+        """
+        Method to remember a reading key.
+        Parameters:
+            key (str): Reading key.
+        Returns:
+            bool: True if the key was not seen before, False for a duplicate.
+        """
+        pass
+
+    @abstractmethod
+    async def discard(self, key: str) -> None:
+        """
+        Method to forget a reading key, e.g. when buffering the reading failed and it must be accepted again.
+        Parameters:
+            key (str): Reading key.
+        """
+        pass
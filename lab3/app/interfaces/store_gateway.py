@@ -4,6 +4,13 @@ from typing import List
 from app.entities.processed_agent_data import ProcessedAgentData
 
 
+class StoreRejected(Exception):
+    """
+    The store answered and refused the batch itself (a 4xx other than 408/429),
+    so sending the same batch again can not succeed.
+    """
+
+
 class StoreGateway(ABC):
     """
     Abstract class representing the Store Gateway interface.
@@ -11,12 +18,14 @@ class StoreGateway(ABC):
     """
 
     @abstractmethod
-    def save_data(self, processed_agent_data_batch: List[ProcessedAgentData]) -> bool:
+    async def save_data(self, processed_agent_data_batch: List[ProcessedAgentData]) -> bool:
         """
         Method to save the processed agent data in the database.
         Parameters:
             processed_agent_data_batch (ProcessedAgentData): The processed agent data to be saved.
         Returns:
             bool: True if the data is successfully saved, False otherwise.
+        Raises:
+            StoreRejected: The store refused the batch as invalid.
         """
         pass
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+import socket
 
 
 def try_parse_int(value: str):
@@ -12,15 +13,108 @@ def try_parse_int(value: str):
 STORE_API_HOST = os.environ.get("STORE_API_HOST") or "localhost"
 STORE_API_PORT = try_parse_int(os.environ.get("STORE_API_PORT")) or 8000
 STORE_API_BASE_URL = f"http://{STORE_API_HOST}:{STORE_API_PORT}"
+# Connection pool of the async Store API client: concurrent requests and request timeout, seconds
+STORE_MAX_CONNECTIONS = try_parse_int(os.environ.get("STORE_MAX_CONNECTIONS")) or 10
+STORE_TIMEOUT = float(os.environ.get("STORE_TIMEOUT") or 10.0)
 
 # Configure for Redis
 REDIS_HOST = os.environ.get("REDIS_HOST") or "localhost"
 REDIS_PORT = try_parse_int(os.environ.get("REDIS_PORT")) or 6379
+# Connections shared by all requests on the event loop; further calls wait for a free one
+REDIS_MAX_CONNECTIONS = try_parse_int(os.environ.get("REDIS_MAX_CONNECTIONS")) or 10
+
+# Configure for the ingest buffer: "list" (Redis list) or "stream" (Redis Streams)
+BUFFER_BACKEND = os.environ.get("BUFFER_BACKEND") or "list"
+REDIS_STREAM_NAME = os.environ.get("REDIS_STREAM_NAME") or "processed_agent_data_stream"
+REDIS_STREAM_GROUP = os.environ.get("REDIS_STREAM_GROUP") or "hub"
+REDIS_STREAM_CONSUMER = os.environ.get("REDIS_STREAM_CONSUMER") or f"{socket.gethostname()}-{os.getpid()}"
+REDIS_STREAM_MAXLEN = try_parse_int(os.environ.get("REDIS_STREAM_MAXLEN")) or 100000
+REDIS_STREAM_CLAIM_IDLE_MS = try_parse_int(os.environ.get("REDIS_STREAM_CLAIM_IDLE_MS")) or 60000
+# Format of buffered items: "json" or "binary" (common.codecs, about half the Redis memory);
+# both formats are read back, so it can be switched with items in the buffer
+BUFFER_CODEC = os.environ.get("BUFFER_CODEC") or "json"
+
+# Configure for resilient delivery to the Store API
+STORE_RETRY_ATTEMPTS = try_parse_int(os.environ.get("STORE_RETRY_ATTEMPTS")) or 3
+STORE_RETRY_BASE_DELAY = float(os.environ.get("STORE_RETRY_BASE_DELAY") or 0.2)
+STORE_RETRY_MAX_DELAY = float(os.environ.get("STORE_RETRY_MAX_DELAY") or 5.0)
+CIRCUIT_FAILURE_THRESHOLD = try_parse_int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD")) or 5
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get("CIRCUIT_RESET_TIMEOUT") or 30.0)
+DEAD_LETTER_KEY = os.environ.get("DEAD_LETTER_KEY") or "processed_agent_data:dead_letter"
 
 # Configure for hub logic
-BATCH_SIZE = 10
+BATCH_SIZE = try_parse_int(os.environ.get("BATCH_SIZE")) or 10
+# Batches delivered to the Store API at the same time
+FLUSH_CONCURRENCY = try_parse_int(os.environ.get("FLUSH_CONCURRENCY")) or 4
+
+# Drop duplicate readings (same reading key) before buffering: the last DEDUP_CAPACITY keys
+# seen by this hub in memory and, unless DEDUP_TTL is 0, keys seen by any hub in the last
+# DEDUP_TTL seconds in Redis
+DEDUP_ENABLED = (os.environ.get("DEDUP_ENABLED") or "true").lower() == "true"
+DEDUP_CAPACITY = try_parse_int(os.environ.get("DEDUP_CAPACITY")) or 100000
+DEDUP_TTL = try_parse_int(os.environ.get("DEDUP_TTL"))
+DEDUP_TTL = 3600 if DEDUP_TTL is None else DEDUP_TTL
+DEDUP_KEY_PREFIX = os.environ.get("DEDUP_KEY_PREFIX") or "processed_agent_data:seen"
+
+# Admission control: token buckets of RATE_LIMIT_PER_VEHICLE readings per second per user_id
+# and RATE_LIMIT_GLOBAL for the whole hub (0 disables a limit), with bursts of *_BURST readings.
+# Buckets are kept in memory per hub instance ("memory") or shared in Redis ("redis").
+# Readings over a limit are dropped ("shed") or, with "sample", 1 of every
+# RATE_LIMIT_SAMPLE_EVERY is still admitted (chosen by reading key, the same on every retry).
+RATE_LIMIT_PER_VEHICLE = float(os.environ.get("RATE_LIMIT_PER_VEHICLE") or 0)
+RATE_LIMIT_PER_VEHICLE_BURST = float(os.environ.get("RATE_LIMIT_PER_VEHICLE_BURST") or 2 * RATE_LIMIT_PER_VEHICLE)
+RATE_LIMIT_GLOBAL = float(os.environ.get("RATE_LIMIT_GLOBAL") or 0)
+RATE_LIMIT_GLOBAL_BURST = float(os.environ.get("RATE_LIMIT_GLOBAL_BURST") or 2 * RATE_LIMIT_GLOBAL)
+RATE_LIMIT_BACKEND = (os.environ.get("RATE_LIMIT_BACKEND") or "memory").lower()
+RATE_LIMIT_POLICY = (os.environ.get("RATE_LIMIT_POLICY") or "shed").lower()
+RATE_LIMIT_SAMPLE_EVERY = try_parse_int(os.environ.get("RATE_LIMIT_SAMPLE_EVERY")) or 10
+RATE_LIMIT_KEY_PREFIX = os.environ.get("RATE_LIMIT_KEY_PREFIX") or "processed_agent_data:rate"
+
+# Backpressure: readings are refused (HTTP 429) while the buffer holds BUFFER_MAX_LENGTH items
+# (0 disables it); the length is read from Redis at most every BUFFER_LENGTH_CHECK_INTERVAL seconds
+BUFFER_MAX_LENGTH = try_parse_int(os.environ.get("BUFFER_MAX_LENGTH"))
+BUFFER_MAX_LENGTH = 100000 if BUFFER_MAX_LENGTH is None else BUFFER_MAX_LENGTH
+BUFFER_LENGTH_CHECK_INTERVAL = float(os.environ.get("BUFFER_LENGTH_CHECK_INTERVAL") or 0.1)
+
+# Interval of the rate-limited summary log, seconds
+REPORT_INTERVAL = float(os.environ.get("REPORT_INTERVAL") or 10.0)
 
 # MQTT
 MQTT_BROKER_HOST = os.environ.get("MQTT_BROKER_HOST") or "mqtt"
 MQTT_BROKER_PORT = try_parse_int(os.environ.get("MQTT_BROKER_PORT")) or 1883
-MQTT_TOPIC = os.environ.get("MQTT_TOPIC") or "processed_data_topic"
\ No newline at end of file
+MQTT_TOPIC = os.environ.get("MQTT_TOPIC") or "processed_data_topic"
+# A non-empty client id gives a persistent session: the broker keeps QoS>0 messages while the hub is away
+MQTT_CLIENT_ID = os.environ.get("MQTT_CLIENT_ID") or ""
+
+# MQTT client tuning (common.mqtt.MqttClient): QoS per topic filter as "topic=1,other/#=0"
+# (MQTT_DEFAULT_QOS for other topics), limits of inflight and queued QoS>0 messages and
+# reconnect backoff in seconds
+MQTT_KEEPALIVE = try_parse_int(os.environ.get("MQTT_KEEPALIVE")) or 60
+MQTT_DEFAULT_QOS = try_parse_int(os.environ.get("MQTT_DEFAULT_QOS"))
+MQTT_DEFAULT_QOS = 1 if MQTT_DEFAULT_QOS is None else MQTT_DEFAULT_QOS
+MQTT_QOS = os.environ.get("MQTT_QOS") or ""
+MQTT_MAX_INFLIGHT = try_parse_int(os.environ.get("MQTT_MAX_INFLIGHT")) or 20
+MQTT_MAX_QUEUED = try_parse_int(os.environ.get("MQTT_MAX_QUEUED")) or 10000
+MQTT_RECONNECT_MIN_DELAY = float(os.environ.get("MQTT_RECONNECT_MIN_DELAY") or 1.0)
+MQTT_RECONNECT_MAX_DELAY = float(os.environ.get("MQTT_RECONNECT_MAX_DELAY") or 60.0)
+MQTT_CLIENT_SETTINGS = dict(
+    keepalive=MQTT_KEEPALIVE,
+    default_qos=MQTT_DEFAULT_QOS,
+    qos=MQTT_QOS,
+    max_inflight=MQTT_MAX_INFLIGHT,
+    max_queued=MQTT_MAX_QUEUED,
+    reconnect_min_delay=MQTT_RECONNECT_MIN_DELAY,
+    reconnect_max_delay=MQTT_RECONNECT_MAX_DELAY,
+)
+
+# Configuration for logging
+LOG_LEVEL = os.environ.get("LOG_LEVEL") or "INFO"
+LOG_FILE = os.environ.get("LOG_FILE") or "app.log"
+LOG_JSON = (os.environ.get("LOG_JSON") or "false").lower() == "true"
+LOG_ASYNC = (os.environ.get("LOG_ASYNC") or "true").lower() == "true"
+LOG_MAX_BYTES = try_parse_int(os.environ.get("LOG_MAX_BYTES")) or 10 * 1024 * 1024
+LOG_BACKUP_COUNT = try_parse_int(os.environ.get("LOG_BACKUP_COUNT")) or 5
+# Records per call site per LOG_RATE_INTERVAL seconds, 0 disables the limit
+LOG_RATE_LIMIT = try_parse_int(os.environ.get("LOG_RATE_LIMIT"))
+LOG_RATE_LIMIT = 10 if LOG_RATE_LIMIT is None else LOG_RATE_LIMIT
+LOG_RATE_INTERVAL = float(os.environ.get("LOG_RATE_INTERVAL") or 1.0)
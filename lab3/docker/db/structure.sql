@@ -6,5 +6,34 @@ y FLOAT,
 z FLOAT,
 latitude FLOAT,
 longitude FLOAT,
-timestamp TIMESTAMP
-);
\ No newline at end of file
+timestamp TIMESTAMP,
+user_id INTEGER,
+reading_key VARCHAR(64)
+);
+
+CREATE INDEX ix_processed_agent_data_timestamp ON processed_agent_data (timestamp);
+
+-- Aggregations (/stats/*): GROUP BY road_state over a time range and per-vehicle time ranges
+CREATE INDEX ix_processed_agent_data_timestamp_road_state ON processed_agent_data (timestamp, road_state);
+CREATE INDEX ix_processed_agent_data_user_id_timestamp ON processed_agent_data (user_id, timestamp);
+
+-- Retried deliveries of a reading are skipped with INSERT ... ON CONFLICT (reading_key) DO NOTHING
+CREATE UNIQUE INDEX ix_processed_agent_data_reading_key ON processed_agent_data (reading_key);
+
+-- Change feed (/changes/): append-only log of inserts, updates and deletes, read by sequence number
+CREATE TABLE processed_agent_data_changes (
+seq SERIAL PRIMARY KEY,
+op VARCHAR(8) NOT NULL,
+row_id INTEGER NOT NULL,
+data TEXT,
+created_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX ix_processed_agent_data_changes_created_at ON processed_agent_data_changes (created_at);
+
+-- Existing databases:
+-- ALTER TABLE processed_agent_data ADD COLUMN reading_key VARCHAR(64);
+-- CREATE UNIQUE INDEX ix_processed_agent_data_reading_key ON processed_agent_data (reading_key);
+-- ALTER TABLE processed_agent_data ADD COLUMN user_id INTEGER;
+-- CREATE INDEX ix_processed_agent_data_timestamp_road_state ON processed_agent_data (timestamp, road_state);
+-- CREATE INDEX ix_processed_agent_data_user_id_timestamp ON processed_agent_data (user_id, timestamp);
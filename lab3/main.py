@@ -1,98 +1,378 @@
+import asyncio
 import logging
-from typing import List
-from fastapi import FastAPI
-from redis import Redis
-import paho.mqtt.client as mqtt
-from app.adapters.store_api_adapter import StoreApiAdapter
+import time
+import zlib
+from contextlib import asynccontextmanager
+from typing import List, Optional, Set
+from fastapi import FastAPI, HTTPException, Response
+from common.logging_config import setup_logging
+from common.metrics import REGISTRY, CONTENT_TYPE, CounterRate, RateLimitedReporter, DEFAULT_SIZE_BUCKETS
+from common.reading_key import reading_key
 from app.entities.processed_agent_data import ProcessedAgentData
+from app.interfaces.buffer_gateway import BufferGateway
+from app.interfaces.rate_limiter_gateway import RateLimiterGateway
+from app.interfaces.seen_set_gateway import SeenSetGateway
 from config import STORE_API_BASE_URL, REDIS_HOST, REDIS_PORT, BATCH_SIZE, MQTT_TOPIC, MQTT_BROKER_HOST, \
-    MQTT_BROKER_PORT
-
-# Configure logging settings
-logging.basicConfig(
-    level=logging.INFO,  # Set the log level to INFO (you can use logging.DEBUG for more detailed logs)
-    format="[%(asctime)s] [%(levelname)s] [%(module)s] %(message)s",
-    handlers=[
-        logging.StreamHandler(),  # Output log messages to the console
-        logging.FileHandler("app.log"),  # Save log messages to a file
-    ],
+    MQTT_BROKER_PORT, BUFFER_BACKEND, BUFFER_CODEC, REDIS_STREAM_NAME, REDIS_STREAM_GROUP, REDIS_STREAM_CONSUMER, \
+    REDIS_STREAM_MAXLEN, REDIS_STREAM_CLAIM_IDLE_MS, STORE_RETRY_ATTEMPTS, STORE_RETRY_BASE_DELAY, \
+    STORE_RETRY_MAX_DELAY, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, DEAD_LETTER_KEY, REPORT_INTERVAL, \
+    LOG_LEVEL, LOG_FILE, LOG_JSON, LOG_ASYNC, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_RATE_LIMIT, LOG_RATE_INTERVAL, \
+    MQTT_CLIENT_ID, MQTT_CLIENT_SETTINGS, STORE_MAX_CONNECTIONS, STORE_TIMEOUT, REDIS_MAX_CONNECTIONS, \
+    FLUSH_CONCURRENCY, DEDUP_ENABLED, DEDUP_CAPACITY, DEDUP_TTL, DEDUP_KEY_PREFIX, RATE_LIMIT_PER_VEHICLE, \
+    RATE_LIMIT_PER_VEHICLE_BURST, RATE_LIMIT_GLOBAL, RATE_LIMIT_GLOBAL_BURST, RATE_LIMIT_BACKEND, RATE_LIMIT_POLICY, \
+    RATE_LIMIT_SAMPLE_EVERY, RATE_LIMIT_KEY_PREFIX, BUFFER_MAX_LENGTH, BUFFER_LENGTH_CHECK_INTERVAL
+
+# Connections and adapters are created by startup() from the lifespan, not on import:
+# importing the module opens nothing, and only the configured backends are loaded
+redis_client = None
+buffer: Optional[BufferGateway] = None
+seen_set: Optional[SeenSetGateway] = None
+vehicle_limiter: Optional[RateLimiterGateway] = None
+global_limiter: Optional[RateLimiterGateway] = None
+store_api_adapter = None
+store_adapter = None
+client = None
+
+
+def create_buffer() -> BufferGateway:
+    if BUFFER_BACKEND == "stream":
+        from app.adapters.redis_stream_buffer import RedisStreamBuffer
+        return RedisStreamBuffer(
+            redis_client,
+            stream=REDIS_STREAM_NAME,
+            group=REDIS_STREAM_GROUP,
+            consumer=REDIS_STREAM_CONSUMER,
+            maxlen=REDIS_STREAM_MAXLEN,
+            claim_idle_ms=REDIS_STREAM_CLAIM_IDLE_MS,
+            binary=BUFFER_CODEC == "binary",
+        )
+    from app.adapters.redis_list_buffer import RedisListBuffer
+    return RedisListBuffer(redis_client, key="processed_agent_data", binary=BUFFER_CODEC == "binary")
+
+
+def create_seen_set() -> Optional[SeenSetGateway]:
+    if not DEDUP_ENABLED:
+        return None
+    from app.adapters.memory_seen_set import MemorySeenSet
+    local = MemorySeenSet(DEDUP_CAPACITY)
+    if DEDUP_TTL == 0:
+        return local
+    from app.adapters.redis_seen_set import RedisSeenSet
+    return RedisSeenSet(redis_client, ttl=DEDUP_TTL, prefix=DEDUP_KEY_PREFIX, local=local)
+
+
+def create_rate_limiter(rate: float, burst: float, name: str) -> Optional[RateLimiterGateway]:
+    if rate <= 0:
+        return None
+    if RATE_LIMIT_BACKEND == "redis":
+        from app.adapters.redis_token_bucket import RedisTokenBucket
+        return RedisTokenBucket(redis_client, rate, burst, prefix=f"{RATE_LIMIT_KEY_PREFIX}:{name}")
+    from app.adapters.memory_token_bucket import MemoryTokenBucket
+    return MemoryTokenBucket(rate, burst)
+
+
+def startup():
+    global redis_client, buffer, seen_set, vehicle_limiter, global_limiter, store_api_adapter, store_adapter, client
+    from redis.asyncio import BlockingConnectionPool, Redis
+    from common.mqtt_async import AsyncMqttClient
+    from app.adapters.resilient_store_adapter import CircuitBreaker, RedisDeadLetterQueue, ResilientStoreAdapter
+    from app.adapters.store_api_adapter import StoreApiAdapter
+
+    # Configure logging settings: records are written by a background listener thread,
+    # per call site output is rate limited and app.log is rotated
+    setup_logging(
+        level=LOG_LEVEL,
+        log_file=LOG_FILE,
+        json_format=LOG_JSON,
+        async_mode=LOG_ASYNC,
+        max_bytes=LOG_MAX_BYTES,
+        backup_count=LOG_BACKUP_COUNT,
+        rate_limit=LOG_RATE_LIMIT,
+        rate_interval=LOG_RATE_INTERVAL,
+    )
+    # Create an instance of the Redis using the configuration; FastAPI, MQTT and Redis
+    # all run on one event loop, so every I/O call is awaited instead of blocking a thread.
+    # Connections are opened by the first command.
+    redis_client = Redis(
+        connection_pool=BlockingConnectionPool(host=REDIS_HOST, port=REDIS_PORT, max_connections=REDIS_MAX_CONNECTIONS)
+    )
+    # Create an instance of the ingest buffer using the configuration
+    buffer = create_buffer()
+    # Recently seen reading keys, to drop duplicates before they are buffered
+    seen_set = create_seen_set()
+    # Admission control per vehicle and for the whole hub
+    vehicle_limiter = create_rate_limiter(RATE_LIMIT_PER_VEHICLE, RATE_LIMIT_PER_VEHICLE_BURST, "vehicle")
+    global_limiter = create_rate_limiter(RATE_LIMIT_GLOBAL, RATE_LIMIT_GLOBAL_BURST, "global")
+    # Create an instance of the StoreApiAdapter using the configuration (its HTTP client
+    # is created by the first batch) wrapped with retries, a circuit breaker and a dead-letter queue
+    store_api_adapter = StoreApiAdapter(
+        api_base_url=STORE_API_BASE_URL,
+        timeout=STORE_TIMEOUT,
+        max_connections=STORE_MAX_CONNECTIONS,
+    )
+    store_adapter = ResilientStoreAdapter(
+        store_api_adapter,
+        dead_letter_queue=RedisDeadLetterQueue(redis_client, key=DEAD_LETTER_KEY),
+        circuit_breaker=CircuitBreaker(
+            failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=CIRCUIT_RESET_TIMEOUT,
+        ),
+        max_attempts=STORE_RETRY_ATTEMPTS,
+        base_delay=STORE_RETRY_BASE_DELAY,
+        max_delay=STORE_RETRY_MAX_DELAY,
+    )
+    # MQTT on the event loop: QoS, queue limits, reconnect with backoff and re-subscribe
+    client = AsyncMqttClient(
+        MQTT_BROKER_HOST, MQTT_BROKER_PORT, name="hub", client_id=MQTT_CLIENT_ID, **MQTT_CLIENT_SETTINGS
+    )
+    client.on_message = on_message
+    client.subscribe(MQTT_TOPIC)
+
+
+async def shutdown():
+    await client.stop()
+    await asyncio.gather(*flush_tasks, return_exceptions=True)
+    await store_api_adapter.aclose()
+    await redis_client.aclose(close_connection_pool=True)
+
+
+# Metrics
+MQTT_MESSAGES_IN = REGISTRY.counter("hub_messages_in_total", "Messages received by the hub", labels={"source": "mqtt"})
+HTTP_MESSAGES_IN = REGISTRY.counter("hub_messages_in_total", "Messages received by the hub", labels={"source": "http"})
+MESSAGES_OUT = REGISTRY.counter("hub_messages_out_total", "Items delivered to the Store API")
+ERRORS = REGISTRY.counter("hub_errors_total", "Failed messages and batches")
+DUPLICATES = REGISTRY.counter("hub_duplicates_total", "Readings dropped because their key was already seen")
+SHED = {
+    reason: REGISTRY.counter("hub_shed_total", "Readings refused by admission control", labels={"reason": reason})
+    for reason in ("vehicle_rate", "global_rate", "buffer_full")
+}
+SAMPLED = REGISTRY.counter("hub_sampled_total", "Readings over a rate limit admitted by the sample policy")
+# Set before every /metrics render: reading it needs an awaited Redis call
+BUFFER_DEPTH = REGISTRY.gauge("hub_buffer_depth", "Items in the ingest buffer")
+BATCH_SIZES = REGISTRY.histogram("hub_batch_size", "Items per batch sent to the Store API", buckets=DEFAULT_SIZE_BUCKETS)
+VALIDATE_LATENCY = REGISTRY.histogram(
+    "hub_stage_latency_seconds", "Latency of a pipeline stage", labels={"stage": "validate"}
 )
-# Create an instance of the Redis using the configuration
-redis_client = Redis(host=REDIS_HOST, port=REDIS_PORT)
-# Create an instance of the StoreApiAdapter using the configuration
-store_adapter = StoreApiAdapter(api_base_url=STORE_API_BASE_URL)
-# Create an instance of the AgentMQTTAdapter using the configuration
-# FastAPI
-app = FastAPI()
+BUFFER_LATENCY = REGISTRY.histogram(
+    "hub_stage_latency_seconds", "Latency of a pipeline stage", labels={"stage": "buffer"}
+)
+STORE_LATENCY = REGISTRY.histogram(
+    "hub_stage_latency_seconds", "Latency of a pipeline stage", labels={"stage": "store"}
+)
+# Rate-limited summary instead of a log line per message
+reporter = RateLimitedReporter(REPORT_INTERVAL, emit=logging.info)
+messages_in_rate = CounterRate(MQTT_MESSAGES_IN)
+messages_out_rate = CounterRate(MESSAGES_OUT)
+errors_rate = CounterRate(ERRORS)
+shed_rates = [CounterRate(counter) for counter in SHED.values()]
+
+
+def report():
+    reporter.maybe_report(
+        lambda elapsed: (
+            f"Last {elapsed:.0f}s: received {messages_in_rate.delta():.0f} MQTT messages, "
+            f"stored {messages_out_rate.delta():.0f} items, errors {errors_rate.delta():.0f}, "
+            f"shed {sum(rate.delta() for rate in shed_rates):.0f}"
+        )
+    )
+
+
+async def flush_buffer():
+    """Send full batches from the buffer to the Store API and acknowledge them on success"""
+    while True:
+        batch = await buffer.read_batch(BATCH_SIZE)
+        if not batch:
+            return
+        BATCH_SIZES.observe(len(batch))
+        processed_agent_data_batch: List[ProcessedAgentData] = [item for _, item in batch]
+        with STORE_LATENCY.time():
+            saved = await store_adapter.save_data(processed_agent_data_batch=processed_agent_data_batch)
+        if saved:
+            await buffer.ack([entry_id for entry_id, _ in batch])
+            MESSAGES_OUT.inc(len(batch))
+        else:
+            ERRORS.inc()
+            logging.error(f"Failed to save batch of {len(batch)} items, leaving it pending in the buffer")
+            await buffer.release(batch)
+            return
+
+
+# Running flush_buffer tasks. Messages are acknowledged as soon as they are buffered;
+# at most FLUSH_CONCURRENCY tasks deliver batches in the background and each keeps
+# going while full batches are available, so a skipped schedule loses nothing.
+flush_tasks: Set[asyncio.Task] = set()
 
-# MQTT
-client = mqtt.Client()
 
+def schedule_flush():
+    if len(flush_tasks) >= FLUSH_CONCURRENCY:
+        return
+    task = asyncio.create_task(flush_buffer())
+    flush_tasks.add(task)
+    task.add_done_callback(flush_tasks.discard)
 
-def on_connect(client, userdata, flags, rc):
-    if rc == 0:
-        logging.info("Connected to MQTT broker")
-        client.subscribe(MQTT_TOPIC)
-    else:
-        logging.info(f"Failed to connect to MQTT broker with code: {rc}")
 
+class Refused(Exception):
+    """A reading was not admitted: over a rate limit or the buffer is full"""
 
-def on_message(client, userdata, msg):
-    batch_data = None
+    def __init__(self, reason: str):
+        super().__init__(f"Reading refused: {reason}")
+        self.reason = reason
+
+
+# Backpressure: whether the buffer was full when its length was last read
+buffer_full = False
+buffer_length_checked_at = float("-inf")
+
+
+async def buffer_is_full() -> bool:
+    global buffer_full, buffer_length_checked_at
+    if not BUFFER_MAX_LENGTH:
+        return False
+    now = time.monotonic()
+    if now - buffer_length_checked_at >= BUFFER_LENGTH_CHECK_INTERVAL:
+        # Set before the await, so that concurrent readings do not all ask Redis
+        buffer_length_checked_at = now
+        buffer_full = await buffer.length() >= BUFFER_MAX_LENGTH
+    return buffer_full
+
+
+def over_limit(reason: str, key: str) -> None:
+    # The sample is chosen by reading key, so a retry of a shed reading is shed again
+    if RATE_LIMIT_POLICY == "sample" and zlib.crc32(key.encode()) % RATE_LIMIT_SAMPLE_EVERY == 0:
+        SAMPLED.inc()
+        return
+    SHED[reason].inc()
+    raise Refused(reason)
+
+
+async def admit(processed_agent_data: ProcessedAgentData) -> None:
+    """
+    Take the reading's tokens per vehicle and for the hub; raises Refused if over a limit.
+    The vehicle's bucket is checked first, so that a flooding vehicle does not use up the
+    hub's tokens; a reading refused by the hub's bucket gets the vehicle's token back.
+    """
+    key = processed_agent_data.reading_key
+    vehicle = str(processed_agent_data.agent_data.user_id)
+    vehicle_token = False
+    if vehicle_limiter is not None:
+        vehicle_token = await vehicle_limiter.acquire(vehicle)
+        if not vehicle_token:
+            over_limit("vehicle_rate", key)
+    if global_limiter is not None and not await global_limiter.acquire("hub"):
+        try:
+            over_limit("global_rate", key)
+        except Refused:
+            if vehicle_token:
+                await vehicle_limiter.refund(vehicle)
+            raise
+
+
+async def buffer_reading(processed_agent_data: ProcessedAgentData) -> bool:
+    """
+    Buffer a reading unless its key was already seen; returns False for a duplicate.
+    Raises Refused while the buffer is full or if the reading is over a rate limit.
+    """
+    if await buffer_is_full():
+        SHED["buffer_full"].inc()
+        raise Refused("buffer_full")
+    if processed_agent_data.reading_key is None:
+        agent_data = processed_agent_data.agent_data
+        processed_agent_data.reading_key = reading_key(agent_data.user_id, agent_data.timestamp, agent_data.sequence)
+    # Duplicates (including the hub's own MQTT copy of HTTP readings) take no tokens
+    if seen_set is not None and not await seen_set.add(processed_agent_data.reading_key):
+        DUPLICATES.inc()
+        return False
+    try:
+        await admit(processed_agent_data)
+        with BUFFER_LATENCY.time():
+            await buffer.push(processed_agent_data)
+    except BaseException:
+        # Not buffered (refused, failed or cancelled): a retry of this reading must be accepted
+        if seen_set is not None:
+            try:
+                await seen_set.discard(processed_agent_data.reading_key)
+            except Exception as e:
+                logging.error(f"Failed to forget reading key {processed_agent_data.reading_key}: {e}")
+        raise
+    schedule_flush()
+    return True
+
+
+async def on_message(msg):
+    MQTT_MESSAGES_IN.inc()
     try:
         payload: str = msg.payload.decode("utf-8")
         # Create ProcessedAgentData instance with the received data
-        processed_agent_data = ProcessedAgentData.model_validate_json(payload, strict=True)
-        redis_client.lpush(
-            "processed_agent_data",
-            processed_agent_data.model_dump_json()
-        )
-        processed_agent_data_batch: List[ProcessedAgentData] = []
-        if redis_client.llen("processed_agent_data") >= BATCH_SIZE:
-            for _ in range(BATCH_SIZE):
-                processed_agent_data = ProcessedAgentData.model_validate_json(
-                    redis_client.lpop("processed_agent_data")
-                )
-                processed_agent_data_batch.append(processed_agent_data)
-            store_adapter.save_data(
-                processed_agent_data_batch=processed_agent_data_batch
-            )
+        with VALIDATE_LATENCY.time():
+            processed_agent_data = ProcessedAgentData.model_validate_json(payload, strict=True)
+        await buffer_reading(processed_agent_data)
+        report()
+    except Refused:
+        # Counted in hub_shed_total; MQTT has no way to push back
+        report()
     except Exception as e:
+        ERRORS.inc()
         logging.info(f"Error processing MQTT message: {e}")
 
 
-# Connect
-client.on_connect = on_connect
-client.on_message = on_message
-client.connect(MQTT_BROKER_HOST, MQTT_BROKER_PORT)
-# Start
-client.loop_start()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup()
+    # Connect in the background on the server's event loop and start
+    client.start()
+    yield
+    await shutdown()
+
+
+# FastAPI
+app = FastAPI(lifespan=lifespan)
 
 
 @app.post("/processed_agent_data/")
 async def save_processed_agent_data(processed_agent_data: ProcessedAgentData):
-    print(processed_agent_data)
+    HTTP_MESSAGES_IN.inc()
 
-    # Зберігаємо дані в Redis
-    redis_client.lpush("processed_agent_data", processed_agent_data.model_dump_json())
+    # Зберігаємо дані в буфер (пакет надсилається у фоні); повтор уже отриманих даних ігноруємо,
+    # щоб клієнт міг безпечно повторювати запити
+    try:
+        if not await buffer_reading(processed_agent_data):
+            return {"status": "duplicate", "reading_key": processed_agent_data.reading_key}
+    except Refused as e:
+        # Backpressure: the client retries later with the same reading key
+        raise HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": "1"})
 
-    # Публікуємо дані в MQTT
+    # Публікуємо дані в MQTT (разом з ключем, тож власна копія хаба відкидається як дублікат)
     try:
         mqtt_payload = processed_agent_data.model_dump_json()
-        result = client.publish(MQTT_TOPIC, mqtt_payload)
-        if result.rc == mqtt.MQTT_ERR_SUCCESS:
-            logging.info(f"Successfully published data to MQTT topic: {MQTT_TOPIC}")
-        else:
-            logging.error(f"Failed to publish to MQTT, error code: {result.rc}")
+        if not await client.publish(MQTT_TOPIC, mqtt_payload):
+            ERRORS.inc()
+            logging.error("Failed to publish to MQTT: not connected or queue is full")
     except Exception as e:
+        ERRORS.inc()
         logging.error(f"Error publishing to MQTT: {e}")
 
-    # Перевіряємо чи потрібно надіслати пакет даних
-    processed_agent_data_batch: List[ProcessedAgentData] = []
-    if redis_client.llen("processed_agent_data") >= BATCH_SIZE:
-        for _ in range(BATCH_SIZE):
-            data = ProcessedAgentData.model_validate_json(redis_client.lpop("processed_agent_data"))
-            processed_agent_data_batch.append(data)
-        store_adapter.save_data(processed_agent_data_batch=processed_agent_data_batch)
+    return {"status": "ok", "reading_key": processed_agent_data.reading_key}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    BUFFER_DEPTH.set((await buffer.stats())["length"])
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/buffer/stats")
+async def get_buffer_stats():
+    return await buffer.stats()
+
+
+@app.get("/dead_letter")
+async def get_dead_letter_stats():
+    return {
+        "size": await store_adapter.dead_letter_queue.size(),
+        "circuit": store_adapter.circuit_breaker.state,
+    }
+
 
-    return {"status": "ok"}
+@app.post("/dead_letter/replay")
+async def replay_dead_letter(limit: int = 100):
+    return await store_adapter.replay_dead_letters(limit=limit)
@@ -1,11 +1,32 @@
 import logging
-import paho.mqtt.client as mqtt
+import threading
+import time
+from common.metrics import REGISTRY, CounterRate, RateLimitedReporter
+from common.mqtt import MqttClient
 from app.interfaces.agent_gateway import AgentGateway
-from app.entities.agent_data import AgentData, GpsData
-from app.usecases.data_processing import process_agent_data
+from app.entities.agent_data import AgentData, AgentWindow, GpsData
+from app.usecases.data_processing import process_agent_data_batch
 from app.interfaces.hub_gateway import HubGateway
 
 
+MESSAGES_IN = REGISTRY.counter("edge_messages_in_total", "Agent messages received over MQTT")
+MESSAGES_OUT = REGISTRY.counter("edge_messages_out_total", "Processed messages sent to the hub")
+SUMMARIES_IN = REGISTRY.counter("edge_summaries_in_total", "Window summaries of quiet readings received over MQTT")
+ERRORS = REGISTRY.counter("edge_errors_total", "Messages that failed validation, processing or delivery")
+VALIDATE_LATENCY = REGISTRY.histogram(
+    "edge_stage_latency_seconds", "Latency of a pipeline stage", labels={"stage": "validate"}
+)
+CALIBRATE_LATENCY = REGISTRY.histogram(
+    "edge_stage_latency_seconds", "Latency of a pipeline stage", labels={"stage": "calibrate"}
+)
+CLASSIFY_LATENCY = REGISTRY.histogram(
+    "edge_stage_latency_seconds", "Latency of a pipeline stage", labels={"stage": "classify"}
+)
+PUBLISH_LATENCY = REGISTRY.histogram(
+    "edge_stage_latency_seconds", "Latency of a pipeline stage", labels={"stage": "publish"}
+)
+
+
 class AgentMQTTAdapter(AgentGateway):
     def __init__(
         self,
@@ -14,47 +35,131 @@ class AgentMQTTAdapter(AgentGateway):
         topic,
         hub_gateway: HubGateway,
         batch_size=10,
+        report_interval=10.0,
+        classifier_registry=None,
+        calibrator=None,
+        batch_timeout=0.5,
+        client_id="",
+        mqtt_settings=None,
+        summary_topic=None,
     ):
+        # Readings are calibrated and classified in micro-batches of batch_size;
+        # a partial batch is flushed after batch_timeout seconds (0 disables the timer)
         self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.pending = []
+        self.pending_since = 0.0
+        self.lock = threading.Lock()
+        self.flush_stopped = threading.Event()
+        self.flush_thread = None
+        # Raw counts -> acceleration in g, readings are passed as is if not given
+        self.calibrator = calibrator
+        # Road classifiers per vehicle, the default thresholds if not given
+        self.classifier_registry = classifier_registry
+        # Rate-limited summary instead of a log line per message
+        self.reporter = RateLimitedReporter(report_interval, emit=logging.info)
+        self.messages_in_rate = CounterRate(MESSAGES_IN)
+        self.messages_out_rate = CounterRate(MESSAGES_OUT)
+        self.errors_rate = CounterRate(ERRORS)
         # MQTT
         self.broker_host = broker_host
         self.broker_port = broker_port
         self.topic = topic
-        self.client = mqtt.Client()
+        # Summaries of quiet windows from agents with adaptive sampling; each one
+        # goes on as a single reading (AgentWindow.to_agent_data)
+        self.summary_topic = summary_topic or f"{topic}/summary"
+        self.client = MqttClient(
+            broker_host, broker_port, name="edge-agent", client_id=client_id, **(mqtt_settings or {})
+        )
         # Hub
         self.hub_gateway = hub_gateway
 
-    def on_connect(self, client, userdata, flags, rc):
-        if rc == 0:
-            logging.info("Connected to MQTT broker")
-            self.client.subscribe(self.topic)
-        else:
-            logging.info(f"Failed to connect to MQTT broker with code: {rc}")
-
     def on_message(self, client, userdata, msg):
         """Processing agent data and sent it to hub gateway"""
+        MESSAGES_IN.inc()
         try:
             payload: str = msg.payload.decode("utf-8")
             # Create AgentData instance with the received data
-            agent_data = AgentData.model_validate_json(payload, strict=True)
+            with VALIDATE_LATENCY.time():
+                if msg.topic == self.summary_topic:
+                    SUMMARIES_IN.inc()
+                    agent_data = AgentWindow.model_validate_json(payload, strict=True).to_agent_data()
+                else:
+                    agent_data = AgentData.model_validate_json(payload, strict=True)
+            with self.lock:
+                if not self.pending:
+                    self.pending_since = time.monotonic()
+                self.pending.append(agent_data)
+                if len(self.pending) >= self.batch_size:
+                    self.flush_locked()
+        except Exception as e:
+            ERRORS.inc()
+            logging.info(f"Error processing MQTT message: {e}")
+        self.report()
+
+    def flush(self):
+        with self.lock:
+            self.flush_locked()
+
+    def flush_locked(self):
+        """Calibrate, classify and send the pending readings; the caller holds self.lock"""
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        try:
+            if self.calibrator is not None:
+                with CALIBRATE_LATENCY.time():
+                    batch = self.calibrator.calibrate_batch(batch)
             # Process the received data (you can call a use case here if needed)
-            processed_data = process_agent_data(agent_data)
+            with CLASSIFY_LATENCY.time():
+                processed_batch = process_agent_data_batch(batch, self.classifier_registry)
+        except Exception as e:
+            ERRORS.inc(len(batch))
+            logging.info(f"Error processing MQTT messages: {e}")
+            return
+        for processed_data in processed_batch:
             # Store the agent_data in the database (you can send it to the data processing module)
-            if not self.hub_gateway.save_data(processed_data):
+            with PUBLISH_LATENCY.time():
+                saved = self.hub_gateway.save_data(processed_data)
+            if saved:
+                MESSAGES_OUT.inc()
+            else:
+                ERRORS.inc()
                 logging.error("Hub is not available")
-        except Exception as e:
-            logging.info(f"Error processing MQTT message: {e}")
+
+    def flush_periodically(self):
+        while not self.flush_stopped.wait(self.batch_timeout / 2):
+            with self.lock:
+                if self.pending and time.monotonic() - self.pending_since >= self.batch_timeout:
+                    self.flush_locked()
+
+    def report(self):
+        self.reporter.maybe_report(
+            lambda elapsed: (
+                f"Last {elapsed:.0f}s: received {self.messages_in_rate.delta():.0f} messages, "
+                f"sent {self.messages_out_rate.delta():.0f} to hub, errors {self.errors_rate.delta():.0f}"
+            )
+        )
 
     def connect(self):
-        self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
-        self.client.connect(self.broker_host, self.broker_port, 60)
+        # Subscribed again after every reconnect
+        self.client.subscribe(self.topic)
+        self.client.subscribe(self.summary_topic)
+        self.client.connect()
 
     def start(self):
-        self.client.loop_start()
+        if self.batch_timeout > 0:
+            self.flush_stopped.clear()
+            self.flush_thread = threading.Thread(target=self.flush_periodically, name="edge-flush", daemon=True)
+            self.flush_thread.start()
 
     def stop(self):
-        self.client.loop_stop()
+        self.client.stop()
+        self.flush_stopped.set()
+        if self.flush_thread is not None:
+            self.flush_thread.join()
+        self.flush()
 
 
 # Usage example:
@@ -1,18 +1,25 @@
 import logging
 
-import requests as requests
-from paho.mqtt import client as mqtt_client
+from common.mqtt import MqttClient
 
 from app.entities.processed_agent_data import ProcessedAgentData
 from app.interfaces.hub_gateway import HubGateway
 
 
 class HubMqttAdapter(HubGateway):
-    def __init__(self, broker, port, topic):
+    def __init__(self, broker, port, topic, client_id="", mqtt_settings=None):
         self.broker = broker
         self.port = port
         self.topic = topic
-        self.mqtt_client = self._connect_mqtt(broker, port)
+        # QoS, queue limits and reconnect with backoff; a broker that is down does not stop the edge
+        self.mqtt_client = MqttClient(broker, port, name="edge-hub", client_id=client_id, **(mqtt_settings or {}))
+
+    def connect(self):
+        # Connects in the background; messages published before that are queued
+        self.mqtt_client.connect()
+
+    def stop(self):
+        self.mqtt_client.stop()
 
     def save_data(self, processed_data: ProcessedAgentData):
         """
@@ -20,31 +27,11 @@ class HubMqttAdapter(HubGateway):
         Parameters:
             processed_data (ProcessedAgentData): Processed road data to be saved.
         Returns:
-            bool: True if the data is successfully saved, False otherwise.
+            bool: True if the data is successfully sent or queued, False otherwise.
         """
         msg = processed_data.model_dump_json()
-        result = self.mqtt_client.publish(self.topic, msg)
-        status = result[0]
-        if status == 0:
+        if self.mqtt_client.publish(self.topic, msg):
             return True
         else:
-            print(f"Failed to send message to topic {self.topic}")
+            logging.error(f"Failed to send message to topic {self.topic}")
             return False
-
-    @staticmethod
-    def _connect_mqtt(broker, port):
-        """Create MQTT client"""
-        print(f"CONNECT TO {broker}:{port}")
-
-        def on_connect(client, userdata, flags, rc):
-            if rc == 0:
-                print(f"Connected to MQTT Broker ({broker}:{port})!")
-            else:
-                print("Failed to connect {broker}:{port}, return code %d\n", rc)
-                exit(rc)  # Stop execution
-
-        client = mqtt_client.Client()
-        client.on_connect = on_connect
-        client.connect(broker, port)
-        client.loop_start()
-        return client
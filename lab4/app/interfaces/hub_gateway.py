@@ -18,3 +18,15 @@ class HubGateway(ABC):
             bool: True if the data is successfully saved, False otherwise.
         """
         pass
+
+    def connect(self):
+        """
+        Method to establish a connection to the Hub, called once before the first save_data.
+        """
+        pass
+
+    def stop(self):
+        """
+        Method to stop the gateway and clean up resources.
+        """
+        pass
@@ -0,0 +1,21 @@
+from abc import ABC, abstractmethod
+
+from app.entities.agent_data import AgentData
+
+
+class RoadClassifier(ABC):
+    """
+    Abstract class representing a road surface classifier.
+    All classifiers must implement these methods.
+    """
+
+    @abstractmethod
+    def classify(self, agent_data: AgentData) -> str:
+        """
+        Method to classify the state of the road surface.
+        Parameters:
+            agent_data (AgentData): Agent data that containing accelerometer, GPS, and timestamp.
+        Returns:
+            str: Road state ("normal", "pothole", "bump", ...).
+        """
+        pass
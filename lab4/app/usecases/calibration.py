@@ -0,0 +1,165 @@
+import json
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.entities.agent_data import AccelerometerData, AgentData
+
+# Raw counts per 1g of an MPU-6050 in the ±2g range (lab1's accelerometer.csv has z ≈ 16500 at rest)
+COUNTS_PER_G = 16384.0
+# Weight of a new reading in the low-pass gravity estimate
+GRAVITY_ALPHA = 0.1
+
+
+class DeviceCalibration:
+    """
+    Calibration of one device: g = rotation @ ((raw - offset) * scale), where
+    rotation is the fixed mount orientation of the sensor in the vehicle.
+    """
+
+    def __init__(self, scale=None, offset=None, rotation=None):
+        self.scale = np.full(3, 1.0 / COUNTS_PER_G) if scale is None else np.asarray(scale, dtype=np.float64)
+        self.offset = np.zeros(3) if offset is None else np.asarray(offset, dtype=np.float64)
+        self.rotation = None if rotation is None else np.asarray(rotation, dtype=np.float64)
+        if self.scale.shape != (3,) or self.offset.shape != (3,):
+            raise ValueError("scale and offset must have 3 values (x, y, z)")
+        if self.rotation is not None and self.rotation.shape != (3, 3):
+            raise ValueError("rotation must be a 3x3 matrix")
+
+    @classmethod
+    def from_config(cls, spec: Dict[str, Any]) -> "DeviceCalibration":
+        scale = spec.get("scale")
+        if scale is None and "counts_per_g" in spec:
+            scale = [1.0 / float(spec["counts_per_g"])] * 3
+        return cls(scale=scale, offset=spec.get("offset"), rotation=spec.get("rotation"))
+
+
+def exponential_moving_average(values: np.ndarray, alpha: float, initial: np.ndarray) -> np.ndarray:
+    """
+    Rows of y[k] = (1 - alpha) * y[k - 1] + alpha * values[k] with y[-1] = initial,
+    computed without a Python loop over rows as beta^k * (initial + alpha * cumsum(beta^-j * values[j])).
+    The rows are processed in chunks short enough for beta^-j to stay finite.
+    """
+    beta = 1.0 - alpha
+    if beta <= 0.0:
+        return values.copy()
+    chunk = max(1, int(250 * math.log(10) / -math.log(beta))) if beta < 1.0 else len(values)
+    result = np.empty_like(values)
+    state = initial
+    for start in range(0, len(values), chunk):
+        block = values[start:start + chunk]
+        powers = beta ** np.arange(1, len(block) + 1, dtype=np.float64)[:, None]
+        result[start:start + len(block)] = powers * (state + alpha * np.cumsum(block / powers, axis=0))
+        state = result[start + len(block) - 1]
+    return result
+
+
+def level(vectors: np.ndarray, gravity: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rotate each row so that its gravity estimate points along +z (Rodrigues' formula
+    for the rotation taking the unit gravity u onto e_z). Returns the rotated rows and |gravity|.
+    """
+    norm = np.linalg.norm(gravity, axis=1)
+    u = gravity / np.where(norm > 0, norm, 1.0)[:, None]
+    # v = u x e_z, c = u . e_z
+    v = np.stack((u[:, 1], -u[:, 0], np.zeros(len(u))), axis=1)
+    c = u[:, 2]
+    v_cross = np.cross(v, vectors)
+    denominator = 1.0 + c
+    upside_down = denominator < 1e-9
+    rotated = vectors + v_cross + np.cross(v, v_cross) / np.where(upside_down, 1.0, denominator)[:, None]
+    # Gravity along -z: rotate by pi around x instead
+    if upside_down.any():
+        flipped = vectors[upside_down] * np.array([1.0, -1.0, -1.0])
+        rotated[upside_down] = flipped
+    return rotated, norm
+
+
+class Calibrator:
+    """
+    Converts raw accelerometer counts into acceleration in g per device (user_id):
+    scale and offset, fixed mount rotation, low-pass gravity estimate, levelling
+    so gravity points along +z and, if remove_gravity, subtraction of gravity.
+    Works on micro-batches with NumPy; the gravity estimate of every device is
+    carried over between batches.
+
+    {
+        "gravity_alpha": 0.1,
+        "remove_gravity": true,
+        "default": {"counts_per_g": 16384},
+        "devices": {"<user_id>": {"scale": [sx, sy, sz], "offset": [ox, oy, oz], "rotation": [[...], [...], [...]]}}
+    }
+    """
+
+    def __init__(
+        self,
+        devices: Optional[Dict[int, DeviceCalibration]] = None,
+        default: Optional[DeviceCalibration] = None,
+        gravity_alpha: float = GRAVITY_ALPHA,
+        remove_gravity: bool = True,
+    ):
+        self.devices = devices or {}
+        self.default = default or DeviceCalibration()
+        self.gravity_alpha = gravity_alpha
+        self.remove_gravity = remove_gravity
+        self.gravity: Dict[int, np.ndarray] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "Calibrator":
+        return cls(
+            devices={
+                int(user_id): DeviceCalibration.from_config(spec)
+                for user_id, spec in config.get("devices", {}).items()
+            },
+            default=DeviceCalibration.from_config(config["default"]) if "default" in config else None,
+            gravity_alpha=float(config.get("gravity_alpha", GRAVITY_ALPHA)),
+            remove_gravity=bool(config.get("remove_gravity", True)),
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "Calibrator":
+        with open(path) as config_file:
+            return cls.from_config(json.load(config_file))
+
+    def calibrate_device(self, user_id: int, raw: np.ndarray) -> np.ndarray:
+        """Calibrate rows (n, 3) of raw readings of one device, in arrival order."""
+        calibration = self.devices.get(user_id, self.default)
+        vectors = (raw - calibration.offset) * calibration.scale
+        if calibration.rotation is not None:
+            vectors = vectors @ calibration.rotation.T
+        initial = self.gravity.get(user_id)
+        gravity = exponential_moving_average(vectors, self.gravity_alpha, vectors[0] if initial is None else initial)
+        self.gravity[user_id] = gravity[-1]
+        vectors, magnitude = level(vectors, gravity)
+        if self.remove_gravity:
+            vectors[:, 2] -= magnitude
+        return vectors
+
+    def calibrate(self, user_ids: np.ndarray, raw: np.ndarray) -> np.ndarray:
+        """Calibrate rows (n, 3) of raw readings from any devices."""
+        if len(raw) == 0:
+            return raw.astype(np.float64)
+        devices, inverse = np.unique(user_ids, return_inverse=True)
+        if len(devices) == 1:
+            return self.calibrate_device(int(devices[0]), raw)
+        result = np.empty(raw.shape, dtype=np.float64)
+        for index, user_id in enumerate(devices.tolist()):
+            rows = np.flatnonzero(inverse == index)
+            result[rows] = self.calibrate_device(user_id, raw[rows])
+        return result
+
+    def calibrate_batch(self, agent_data_batch: List[AgentData]) -> List[AgentData]:
+        """Calibrate the accelerometer data of the readings in place and return them."""
+        if not agent_data_batch:
+            return []
+        user_ids = np.fromiter((item.user_id for item in agent_data_batch), dtype=np.int64, count=len(agent_data_batch))
+        raw = np.array(
+            [(item.accelerometer.x, item.accelerometer.y, item.accelerometer.z) for item in agent_data_batch],
+            dtype=np.float64,
+        )
+        calibrated = self.calibrate(user_ids, raw).tolist()
+        for item, (x, y, z) in zip(agent_data_batch, calibrated):
+            # The validating constructor (pydantic-core) is cheaper here than model_construct
+            item.accelerometer = AccelerometerData(x=x, y=y, z=z)
+        return agent_data_batch
@@ -0,0 +1,210 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional
+
+from app.entities.agent_data import AgentData
+from app.interfaces.road_classifier import RoadClassifier
+
+# Default thresholds for road condition classification
+POTHOLE_THRESHOLD = 1.8  # Threshold for y-axis acceleration to detect potholes
+BUMP_THRESHOLD = 1.5  # Threshold for z-axis acceleration to detect bumps
+
+
+class ThresholdClassifier(RoadClassifier):
+    def __init__(self, pothole_threshold: float = POTHOLE_THRESHOLD, bump_threshold: float = BUMP_THRESHOLD):
+        self.pothole_threshold = pothole_threshold
+        self.bump_threshold = bump_threshold
+
+    def classify(self, agent_data: AgentData) -> str:
+        accelerometer = agent_data.accelerometer
+        # Check for pothole (significant negative y-axis acceleration)
+        if abs(accelerometer.y) > self.pothole_threshold:
+            return "pothole"
+        # Check for bump (significant positive z-axis acceleration)
+        if abs(accelerometer.z) > self.bump_threshold:
+            return "bump"
+        return "normal"
+
+
+class DecisionTreeClassifier(RoadClassifier):
+    """
+    Decision tree over features of the current reading and a sliding window of
+    the vehicle's previous readings. The tree is given as nested nodes
+    {"feature": ..., "threshold": ..., "left": node, "right": node} or {"label": ...}
+    (left if feature <= threshold) and compiled into flat lists. Windows of the
+    `capacity` most recently seen vehicles are kept; a forgotten vehicle starts
+    again with an empty window.
+    """
+
+    FEATURES = ("x", "y", "z", "abs_y", "abs_z", "z_mean", "z_std", "z_range", "y_range")
+
+    def __init__(self, tree: Dict[str, Any], window_size: int = 10, capacity: int = 100_000):
+        self.window_size = window_size
+        self.capacity = capacity
+        self._windows: OrderedDict = OrderedDict()
+        self.feature = []
+        self.threshold = []
+        self.left = []
+        self.right = []
+        self.label = []
+        self._compile(tree)
+
+    def _compile(self, node: Dict[str, Any]) -> int:
+        index = len(self.label)
+        self.feature.append(-1)
+        self.threshold.append(0.0)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.label.append(None)
+        if "label" in node:
+            self.label[index] = node["label"]
+            return index
+        if node["feature"] not in self.FEATURES:
+            raise ValueError(f"Unknown feature {node['feature']!r}, expected one of {self.FEATURES}")
+        self.feature[index] = self.FEATURES.index(node["feature"])
+        self.threshold[index] = float(node["threshold"])
+        self.left[index] = self._compile(node["left"])
+        self.right[index] = self._compile(node["right"])
+        return index
+
+    def features(self, agent_data: AgentData):
+        accelerometer = agent_data.accelerometer
+        window = self._windows.get(agent_data.user_id)
+        if window is None:
+            window = self._windows[agent_data.user_id] = deque(maxlen=self.window_size)
+            if len(self._windows) > self.capacity:
+                self._windows.popitem(last=False)
+        else:
+            self._windows.move_to_end(agent_data.user_id)
+        window.append((accelerometer.y, accelerometer.z))
+        ys = [y for y, _ in window]
+        zs = [z for _, z in window]
+        z_mean = sum(zs) / len(zs)
+        z_std = (sum((z - z_mean) ** 2 for z in zs) / len(zs)) ** 0.5
+        return (
+            accelerometer.x, accelerometer.y, accelerometer.z,
+            abs(accelerometer.y), abs(accelerometer.z),
+            z_mean, z_std, max(zs) - min(zs), max(ys) - min(ys),
+        )
+
+    def classify(self, agent_data: AgentData) -> str:
+        values = self.features(agent_data)
+        node = 0
+        label = self.label
+        while label[node] is None:
+            if values[self.feature[node]] <= self.threshold[node]:
+                node = self.left[node]
+            else:
+                node = self.right[node]
+        return label[node]
+
+
+def build_classifier(spec: Dict[str, Any]) -> RoadClassifier:
+    kind = spec.get("type", "threshold")
+    if kind == "threshold":
+        return ThresholdClassifier(
+            pothole_threshold=float(spec.get("pothole_threshold", POTHOLE_THRESHOLD)),
+            bump_threshold=float(spec.get("bump_threshold", BUMP_THRESHOLD)),
+        )
+    if kind == "decision_tree":
+        return DecisionTreeClassifier(
+            spec["tree"],
+            window_size=int(spec.get("window_size", 10)),
+            capacity=int(spec.get("capacity", 100_000)),
+        )
+    raise ValueError(f"Unknown classifier type {kind!r}")
+
+
+class ClassifierRegistry:
+    """
+    Classifier per vehicle (user_id). The configuration names classifiers per
+    sensor model and maps vehicles to a model or to their own classifier; it is
+    compiled into one dict, so the lookup per message is a single dict access.
+
+    {
+        "default": {"type": "threshold", "pothole_threshold": 1.8, "bump_threshold": 1.5},
+        "models": {"<model>": {classifier}},
+        "vehicles": {"<user_id>": "<model>" | {classifier}}
+    }
+    """
+
+    def __init__(self, default: Optional[RoadClassifier] = None, vehicles: Optional[Dict[int, RoadClassifier]] = None):
+        self.default = default or ThresholdClassifier()
+        self.vehicles = vehicles or {}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ClassifierRegistry":
+        models = {name: build_classifier(spec) for name, spec in config.get("models", {}).items()}
+        default = build_classifier(config["default"]) if "default" in config else None
+        vehicles = {}
+        for user_id, spec in config.get("vehicles", {}).items():
+            if isinstance(spec, str):
+                if spec not in models:
+                    raise ValueError(f"Vehicle {user_id} refers to unknown model {spec!r}")
+                vehicles[int(user_id)] = models[spec]
+            else:
+                vehicles[int(user_id)] = build_classifier(spec)
+        return cls(default=default, vehicles=vehicles)
+
+    @classmethod
+    def from_file(cls, path: str) -> "ClassifierRegistry":
+        with open(path) as config_file:
+            return cls.from_config(json.load(config_file))
+
+    def get(self, user_id: int) -> RoadClassifier:
+        return self.vehicles.get(user_id, self.default)
+
+
+class ReloadingClassifierRegistry:
+    """
+    ClassifierRegistry loaded from a JSON file and reloaded when the file changes.
+    The file is checked at most every reload_interval seconds; a broken or missing
+    file is logged (a missing one once until it appears) and the previous registry
+    stays in use.
+    """
+
+    def __init__(self, path: str, reload_interval: float = 5.0, clock=time.monotonic):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.clock = clock
+        self.registry = ClassifierRegistry()
+        self._mtime = None
+        self._next_check = 0.0
+        self._missing_logged = False
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self) -> bool:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            if not self._missing_logged:
+                self._missing_logged = True
+                logging.warning(f"Classifier file {self.path} not found, keeping the current classifiers")
+            return False
+        self._missing_logged = False
+        if mtime == self._mtime:
+            return False
+        with self._lock:
+            try:
+                registry = ClassifierRegistry.from_file(self.path)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logging.error(f"Failed to load classifiers from {self.path}: {e}")
+                self._mtime = mtime
+                return False
+            # Swapping one reference is atomic for readers
+            self.registry = registry
+            self._mtime = mtime
+        logging.info(f"Loaded classifiers from {self.path}")
+        return True
+
+    def get(self, user_id: int) -> RoadClassifier:
+        now = self.clock()
+        if now >= self._next_check:
+            self._next_check = now + self.reload_interval
+            self.reload()
+        return self.registry.get(user_id)
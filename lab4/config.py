@@ -12,13 +12,72 @@ def try_parse_int(value: str):
 MQTT_BROKER_HOST = os.environ.get("MQTT_BROKER_HOST") or "localhost"
 MQTT_BROKER_PORT = try_parse_int(os.environ.get("MQTT_BROKER_PORT")) or 1883
 MQTT_TOPIC = os.environ.get("MQTT_TOPIC") or "agent_data_topic"
+# Window summaries published by agents with adaptive sampling (lab1 ADAPTIVE_SAMPLING)
+MQTT_SUMMARY_TOPIC = os.environ.get("MQTT_SUMMARY_TOPIC") or f"{MQTT_TOPIC}/summary"
 
 # Configuration for hub MQTT
 HUB_MQTT_BROKER_HOST = os.environ.get("HUB_MQTT_BROKER_HOST") or "localhost"
 HUB_MQTT_BROKER_PORT = try_parse_int(os.environ.get("HUB_MQTT_BROKER_PORT")) or 1883
 HUB_MQTT_TOPIC = os.environ.get("HUB_MQTT_TOPIC") or "processed_agent_data_topic"
 
-# Configuration for the Hub
+# Client ids of the agent (subscribing) and hub (publishing) MQTT clients; a non-empty
+# id gives a persistent session: the broker keeps QoS>0 messages while the edge is away
+MQTT_CLIENT_ID = os.environ.get("MQTT_CLIENT_ID") or ""
+HUB_MQTT_CLIENT_ID = os.environ.get("HUB_MQTT_CLIENT_ID") or ""
+
+# MQTT client tuning (common.mqtt.MqttClient): QoS per topic filter as "topic=1,other/#=0"
+# (MQTT_DEFAULT_QOS for other topics), limits of inflight and queued QoS>0 messages and
+# reconnect backoff in seconds
+MQTT_KEEPALIVE = try_parse_int(os.environ.get("MQTT_KEEPALIVE")) or 60
+MQTT_DEFAULT_QOS = try_parse_int(os.environ.get("MQTT_DEFAULT_QOS"))
+MQTT_DEFAULT_QOS = 1 if MQTT_DEFAULT_QOS is None else MQTT_DEFAULT_QOS
+MQTT_QOS = os.environ.get("MQTT_QOS") or ""
+MQTT_MAX_INFLIGHT = try_parse_int(os.environ.get("MQTT_MAX_INFLIGHT")) or 20
+MQTT_MAX_QUEUED = try_parse_int(os.environ.get("MQTT_MAX_QUEUED")) or 10000
+MQTT_RECONNECT_MIN_DELAY = float(os.environ.get("MQTT_RECONNECT_MIN_DELAY") or 1.0)
+MQTT_RECONNECT_MAX_DELAY = float(os.environ.get("MQTT_RECONNECT_MAX_DELAY") or 60.0)
+MQTT_CLIENT_SETTINGS = dict(
+    keepalive=MQTT_KEEPALIVE,
+    default_qos=MQTT_DEFAULT_QOS,
+    qos=MQTT_QOS,
+    max_inflight=MQTT_MAX_INFLIGHT,
+    max_queued=MQTT_MAX_QUEUED,
+    reconnect_min_delay=MQTT_RECONNECT_MIN_DELAY,
+    reconnect_max_delay=MQTT_RECONNECT_MAX_DELAY,
+)
+
+# Configuration for the Hub: processed readings are sent over MQTT ("mqtt") or HTTP ("http")
+HUB_TRANSPORT = (os.environ.get("HUB_TRANSPORT") or "mqtt").lower()
 HUB_HOST = os.environ.get("HUB_HOST") or "localhost"
 HUB_PORT = try_parse_int(os.environ.get("HUB_PORT")) or 12000
 HUB_URL = f"http://{HUB_HOST}:{HUB_PORT}"
+
+# Configuration for the micro-batches calibrated and classified together
+EDGE_BATCH_SIZE = try_parse_int(os.environ.get("EDGE_BATCH_SIZE")) or 100
+EDGE_BATCH_TIMEOUT = float(os.environ.get("EDGE_BATCH_TIMEOUT") or 0.5)
+
+# Configuration for sensor calibration (raw counts -> g, gravity removal): JSON file per device
+CALIBRATION_ENABLED = (os.environ.get("CALIBRATION_ENABLED") or "true").lower() == "true"
+CALIBRATION_CONFIG = os.environ.get("CALIBRATION_CONFIG") or "calibration.json"
+
+# Configuration for road classifiers per vehicle: JSON file, re-read when it changes
+# (checked at most every CLASSIFIER_RELOAD_INTERVAL seconds)
+CLASSIFIER_CONFIG = os.environ.get("CLASSIFIER_CONFIG") or "classifiers.json"
+CLASSIFIER_RELOAD_INTERVAL = float(os.environ.get("CLASSIFIER_RELOAD_INTERVAL") or 5.0)
+
+# Configuration for metrics (/metrics port, 0 disables it) and the summary log interval
+METRICS_PORT = try_parse_int(os.environ.get("METRICS_PORT"))
+METRICS_PORT = 9100 if METRICS_PORT is None else METRICS_PORT
+REPORT_INTERVAL = float(os.environ.get("REPORT_INTERVAL") or 10.0)
+
+# Configuration for logging
+LOG_LEVEL = os.environ.get("LOG_LEVEL") or "INFO"
+LOG_FILE = os.environ.get("LOG_FILE") or "app.log"
+LOG_JSON = (os.environ.get("LOG_JSON") or "false").lower() == "true"
+LOG_ASYNC = (os.environ.get("LOG_ASYNC") or "true").lower() == "true"
+LOG_MAX_BYTES = try_parse_int(os.environ.get("LOG_MAX_BYTES")) or 10 * 1024 * 1024
+LOG_BACKUP_COUNT = try_parse_int(os.environ.get("LOG_BACKUP_COUNT")) or 5
+# Records per call site per LOG_RATE_INTERVAL seconds, 0 disables the limit
+LOG_RATE_LIMIT = try_parse_int(os.environ.get("LOG_RATE_LIMIT"))
+LOG_RATE_LIMIT = 10 if LOG_RATE_LIMIT is None else LOG_RATE_LIMIT
+LOG_RATE_INTERVAL = float(os.environ.get("LOG_RATE_INTERVAL") or 1.0)
@@ -1,51 +1,132 @@
 import logging
+import os
+import signal
+import threading
+from common.logging_config import setup_logging
+from common.metrics import start_http_server
 from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter
-from app.adapters.hub_http_adapter import HubHttpAdapter
-from app.adapters.hub_mqtt_adapter import HubMqttAdapter
+from app.interfaces.hub_gateway import HubGateway
+from app.usecases.road_classifiers import ReloadingClassifierRegistry
 from config import (
     MQTT_BROKER_HOST,
     MQTT_BROKER_PORT,
     MQTT_TOPIC,
+    MQTT_SUMMARY_TOPIC,
+    HUB_TRANSPORT,
     HUB_URL,
     HUB_MQTT_BROKER_HOST,
     HUB_MQTT_BROKER_PORT,
     HUB_MQTT_TOPIC,
+    MQTT_CLIENT_ID,
+    HUB_MQTT_CLIENT_ID,
+    MQTT_CLIENT_SETTINGS,
+    EDGE_BATCH_SIZE,
+    EDGE_BATCH_TIMEOUT,
+    CALIBRATION_ENABLED,
+    CALIBRATION_CONFIG,
+    CLASSIFIER_CONFIG,
+    CLASSIFIER_RELOAD_INTERVAL,
+    METRICS_PORT,
+    REPORT_INTERVAL,
+    LOG_LEVEL,
+    LOG_FILE,
+    LOG_JSON,
+    LOG_ASYNC,
+    LOG_MAX_BYTES,
+    LOG_BACKUP_COUNT,
+    LOG_RATE_LIMIT,
+    LOG_RATE_INTERVAL,
 )
 
-if __name__ == "__main__":
-    # Configure logging settings
-    logging.basicConfig(
-        level=logging.INFO,  # Set the log level to INFO (you can use logging.DEBUG for more detailed logs)
-        format="[%(asctime)s] [%(levelname)s] [%(module)s] %(message)s",
-        handlers=[
-            logging.StreamHandler(),  # Output log messages to the console
-            logging.FileHandler("app.log"),  # Save log messages to a file
-        ],
-    )
-    # Create an instance of the StoreApiAdapter using the configuration
-    # hub_adapter = HubHttpAdapter(
-    #     api_base_url=HUB_URL,
-    # )
-    hub_adapter = HubMqttAdapter(
+
+# Adapters and heavy dependencies (numpy for calibration, requests for the HTTP hub)
+# are imported only when the configuration uses them
+
+
+def create_hub_adapter() -> HubGateway:
+    if HUB_TRANSPORT == "http":
+        from app.adapters.hub_http_adapter import HubHttpAdapter
+        return HubHttpAdapter(api_base_url=HUB_URL)
+    from app.adapters.hub_mqtt_adapter import HubMqttAdapter
+    return HubMqttAdapter(
         broker=HUB_MQTT_BROKER_HOST,
         port=HUB_MQTT_BROKER_PORT,
         topic=HUB_MQTT_TOPIC,
+        client_id=HUB_MQTT_CLIENT_ID,
+        mqtt_settings=MQTT_CLIENT_SETTINGS,
+    )
+
+
+def create_calibrator():
+    # Raw accelerometer counts -> acceleration in g without gravity
+    if not CALIBRATION_ENABLED:
+        return None
+    from app.usecases.calibration import Calibrator
+    if os.path.exists(CALIBRATION_CONFIG):
+        return Calibrator.from_file(CALIBRATION_CONFIG)
+    return Calibrator()
+
+
+def create_agent_adapter(hub_adapter: HubGateway, calibrator=None) -> AgentMQTTAdapter:
+    # Road classifiers per vehicle, reloaded when the file changes
+    classifier_registry = ReloadingClassifierRegistry(
+        path=CLASSIFIER_CONFIG,
+        reload_interval=CLASSIFIER_RELOAD_INTERVAL,
     )
-    # Create an instance of the AgentMQTTAdapter using the configuration
-    agent_adapter = AgentMQTTAdapter(
+    return AgentMQTTAdapter(
         broker_host=MQTT_BROKER_HOST,
         broker_port=MQTT_BROKER_PORT,
         topic=MQTT_TOPIC,
+        summary_topic=MQTT_SUMMARY_TOPIC,
         hub_gateway=hub_adapter,
+        batch_size=EDGE_BATCH_SIZE,
+        batch_timeout=EDGE_BATCH_TIMEOUT,
+        calibrator=calibrator,
+        report_interval=REPORT_INTERVAL,
+        classifier_registry=classifier_registry,
+        client_id=MQTT_CLIENT_ID,
+        mqtt_settings=MQTT_CLIENT_SETTINGS,
+    )
+
+
+def main():
+    # Configure logging settings: records are written by a background listener thread,
+    # per call site output is rate limited and app.log is rotated
+    setup_logging(
+        level=LOG_LEVEL,
+        log_file=LOG_FILE,
+        json_format=LOG_JSON,
+        async_mode=LOG_ASYNC,
+        max_bytes=LOG_MAX_BYTES,
+        backup_count=LOG_BACKUP_COUNT,
+        rate_limit=LOG_RATE_LIMIT,
+        rate_interval=LOG_RATE_INTERVAL,
     )
+    # Serve /metrics for scraping
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT)
+    # The hub connection is started first, so that its handshake overlaps with
+    # loading the calibration; the agent subscription goes last, when every
+    # reading that arrives can be processed
+    hub_adapter = create_hub_adapter()
+    hub_adapter.connect()
+    agent_adapter = create_agent_adapter(hub_adapter, create_calibrator())
+    stopped = threading.Event()
+    # docker stop sends SIGTERM
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
     try:
         # Connect to the MQTT broker and start listening for messages
         agent_adapter.connect()
         agent_adapter.start()
-        # Keep the system running indefinitely (you can add other logic as needed)
-        while True:
-            pass
+        # The work is done by the MQTT and flush threads; wait without using the CPU
+        stopped.wait()
     except KeyboardInterrupt:
-        # Stop the MQTT adapter and exit gracefully if interrupted by the user
-        agent_adapter.stop()
-        logging.info("System stopped.")
+        pass
+    # Stop the MQTT adapters and exit gracefully
+    agent_adapter.stop()
+    hub_adapter.stop()
+    logging.info("System stopped.")
+
+
+if __name__ == "__main__":
+    main()
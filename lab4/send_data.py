@@ -1,53 +1,57 @@
-import paho.mqtt.client as mqtt
-import json
+from common.codecs import dumps_agent_data
+from common.mqtt import MqttClient
 import time
 import random
 from datetime import datetime
 
 
-# Функція для створення випадкових даних з датчиків
-def generate_random_data():
-    return {
-        'accelerometer_x': round(random.uniform(-2.0, 2.0), 2),
-        'accelerometer_y': round(random.uniform(-2.0, 2.0), 2),
-        'accelerometer_z': round(random.uniform(-2.0, 2.0), 2),
-        'gps_latitude': round(random.uniform(50.4000, 50.5000), 4),
-        'gps_longitude': round(random.uniform(30.5000, 30.6000), 4),
-        'timestamp': int(time.time())
-    }
+# Сирі відліки акселерометра на 1g (MPU-6050, діапазон ±2g), як у lab1 та calibration.json:
+# edge за замовчуванням калібрує покази, тобто ділить їх на counts_per_g
+COUNTS_PER_G = 16384
 
 
-def on_connect(client, userdata, flags, rc):
-    print(f"Connected with result code {rc}")
+# Функція для створення випадкових даних з датчиків у спільній схемі AgentData (common.entities):
+# відхилення до ±2g по кожній осі, по z ще й сила тяжіння, у сирих відліках
+def generate_random_data(user_id=1, timestamp=None, sequence=0):
+    return dumps_agent_data(
+        user_id,
+        x=float(round(random.uniform(-2.0, 2.0) * COUNTS_PER_G)),
+        y=float(round(random.uniform(-2.0, 2.0) * COUNTS_PER_G)),
+        z=float(round((1.0 + random.uniform(-2.0, 2.0)) * COUNTS_PER_G)),
+        latitude=round(random.uniform(50.4000, 50.5000), 4),
+        longitude=round(random.uniform(30.5000, 30.6000), 4),
+        timestamp=(timestamp or datetime.now()).isoformat(),
+        # Номер показу серед показів з тим самим часом (частина reading_key)
+        sequence=sequence,
+    )
 
 
-def on_publish(client, userdata, mid):
-    print(f"Message {mid} published. Time: {datetime.now().strftime('%H:%M:%S')}")
-
-
-def run_sender(broker_host='mqtt', broker_port=1883, topic='agent_data_topic', interval=2):
-    client = mqtt.Client(client_id=f"data_sender_{int(time.time())}")
-    client.on_connect = on_connect
-    client.on_publish = on_publish
+def run_sender(broker_host='mqtt', broker_port=1883, topic='agent_data_topic', interval=2, user_id=1):
+    # QoS 1 without retain: a retained message per reading made the broker replay
+    # the last one to every new subscriber
+    client = MqttClient(broker_host, broker_port, name="data_sender", default_qos=1)
 
     print(f"Connecting to {broker_host}:{broker_port}")
-    client.connect(broker_host, broker_port)
-    client.loop_start()
+    client.connect()
 
     message_count = 0
+    last_timestamp, sequence = None, 0
     try:
         while True:
             message_count += 1
-            data = generate_random_data()
-            print(f"Sending message #{message_count}: {json.dumps(data)}")
+            timestamp = datetime.now()
+            sequence = sequence + 1 if timestamp == last_timestamp else 0
+            last_timestamp = timestamp
+            data = generate_random_data(user_id, timestamp, sequence)
+            print(f"Sending message #{message_count}: {data}")
 
-            client.publish(topic, json.dumps(data), qos=1, retain=True)
+            if client.publish(topic, data):
+                print(f"Message #{message_count} published. Time: {datetime.now().strftime('%H:%M:%S')}")
             time.sleep(interval)
     except KeyboardInterrupt:
         print("Stopping sender...")
     finally:
-        client.loop_stop()
-        client.disconnect()
+        client.stop()
         print("Sender stopped")
 
 
@@ -58,6 +62,7 @@ if __name__ == "__main__":
     broker_port = int(os.environ.get('MQTT_BROKER_PORT', 1883))
     topic = os.environ.get('MQTT_TOPIC', 'agent_data_topic')
     interval = int(os.environ.get('SEND_INTERVAL', 2))
+    user_id = int(os.environ.get('USER_ID', 1))
 
     print(f"Starting sender to {broker_host}:{broker_port} on topic {topic}")
-    run_sender(broker_host, broker_port, topic, interval)
+    run_sender(broker_host, broker_port, topic, interval, user_id)